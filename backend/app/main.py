@@ -5,30 +5,50 @@ Created on Mon Sep 16 14:32:01 2024
 @author: 8778t
 """
 
+import asyncio
+import json
 from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import jwt
 from jwt.exceptions import InvalidTokenError
-from typing import Annotated, List
-from fastapi import Depends, FastAPI, Body, Response, HTTPException, status
+from typing import Annotated, List, Optional
+from fastapi import Depends, FastAPI, Body, Request, Response, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import dotenv_values
-from pymongo import MongoClient, errors
+from pymongo import errors
 from pydantic import BaseModel
 from collections import Counter
 import logging
 
-from models.diary_entry import DiaryEntry, DiaryEntryUpdate
-from models.user import User, UserUpdate, UserSummary, UserPwdReset
+from models.diary_entry import DiaryEntry, DiaryEntryUpdate, DiaryEntryPage
+from models.user import User, UserUpdate, UserSummary, UserSummaryPage, UserPwdReset
 
-from services.predict_service import predict_service
+from services.predict_batcher import predict_batcher, QueueFullError
+from services.prediction_cache import MongoPredictionCacheBackend
+from utils.content_digest import content_digest
+from utils.concurrency import run_blocking, run_periodically, shutdown_executors
+from utils.mongo_utils import create_mongo_client
 from services.diary_entry_service import DiaryEntryService
 from services.user_service import UserService
 from services.auth_service import AuthService
 from services.admin_service import AdminService
-from services.vectordb_service import VectoredService
+from services.index_service import IndexService
+from services.export_service import ExportService, EXPORT_FORMATS
+from services.import_service import DiaryImportService
+from services.advice_queue import AdviceJobQueue
+from services.predict_service import predict_service
+from utils.json_stream import iter_json_array, iter_ndjson, MAX_ROW_BYTES
+from services.daily_rollup_service import DailyRollupService, entry_day
+from services.streak_service import StreakService, current_streak, max_streak
+from services.vectordb_service import VectoredService, load_suggestion_documents, ADVICE_UNAVAILABLE
+from services.embedding_providers import create_embedding_provider
+from services.suggestion_store import SuggestionStore, DEFAULT_FALLBACK_PATH
+from services.advice_cache import SemanticAdviceCache
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
 
 class Token(BaseModel):
     access_token: str
@@ -38,6 +58,8 @@ config = dotenv_values(".env")
 
 console_error_template = "An exception of type {0} occurred. Arguments:\n{1!r}"
 
+PREDICTION_FIELDS = ("predicted_class_number", "prediction_class", "confidence", "confidence_scores", "sentiment")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Start Up
@@ -47,16 +69,82 @@ async def lifespan(app: FastAPI):
     db_name = config["DB_NAME"]
     if not db_name:
         raise ValueError("No db name is provided")
-    app.mongodb_client = MongoClient(atlas_uri)
+    app.mongodb_client = create_mongo_client(atlas_uri, config)
     app.database = app.mongodb_client[db_name]
     print("Connected to the MongoDB database!")
-    app.diary_entry_service = DiaryEntryService(app.database["diary_entries"])
+    app.diary_entry_service = DiaryEntryService(app.database["diary_entries"], int(config.get("DIARY_MAX_PAGE_SIZE") or 100))
     app.user_service = UserService(app.database["users"])
     app.auth_service = AuthService(app.user_service, config["SECRET_KEY"], config["ALGORITHM"])
-    app.admin_service = AdminService(app.database)
+    app.admin_service = AdminService(app.database, int(config.get("ADMIN_MAX_PAGE_SIZE") or 100))
+    app.daily_rollup_service = DailyRollupService(app.database["daily_rollups"])
+    app.streak_service = StreakService(app.database["users"])
+    app.index_service = IndexService(app.database)
+    app.export_service = ExportService(app.database, int(config.get("EXPORT_BATCH_SIZE") or 500))
+    app.sentiment_service = SentimentService(
+        resources,
+        max_workers=int(config.get("SENTIMENT_WORKERS") or 0) or None,
+        chunk_size=int(config.get("SENTIMENT_CHUNK_SIZE") or 500)
+    )
+    app.import_service = DiaryImportService(
+        app.database["diary_entries"],
+        predict_service,
+        chunk_size=int(config.get("IMPORT_CHUNK_SIZE") or 500),
+        predict_batch_size=int(config.get("IMPORT_PREDICT_BATCH_SIZE") or 64),
+        max_rows=int(config.get("IMPORT_MAX_ROWS") or 10000),
+        sentiment_service=app.sentiment_service
+    )
+    index_changes = await app.index_service.reconcile()
+    if index_changes["failed"]:
+        print(f"Failed to create indexes: {index_changes['failed']}")
+    if predict_batcher.cache is not None and config.get("PREDICTION_CACHE_BACKEND") == "mongo":
+        shared_backend = MongoPredictionCacheBackend(app.database["prediction_cache"], predict_batcher.cache.ttl_seconds)
+        await shared_backend.create_indexes()
+        predict_batcher.cache.shared_backend = shared_backend
+    await resources.open()
+    # Loads a local embedding model once, before the first advice needs it
+    await vectored_service.embedding_provider.load()
+    await vectored_service.suggestion_store.refresh()
+    advice_cache_task = None
+    if advice_cache is not None:
+        print(f"Loaded {await run_blocking(advice_cache.load)} cached advice")
+        advice_cache_interval = float(config.get("ADVICE_CACHE_SAVE_INTERVAL_SECONDS") or 300)
+        if advice_cache_interval > 0:
+            advice_cache_task = asyncio.create_task(
+                run_periodically(advice_cache_interval, save_advice_cache)
+            )
+    app.advice_queue = AdviceJobQueue(
+        generate_entry_advice,
+        on_dead_letter=fail_entry_advice,
+        concurrency=int(config.get("ADVICE_WORKERS") or 4),
+        max_retries=int(config.get("ADVICE_MAX_RETRIES") or 3),
+        retry_delay_seconds=float(config.get("ADVICE_RETRY_DELAY_SECONDS") or 2),
+        max_queue_size=int(config.get("ADVICE_QUEUE_MAX_SIZE") or 1000)
+    )
+    # Jobs live in memory, so re-queue the entries still waiting for advice
+    async for entry in app.diary_entry_service.pending_advice():
+        await app.advice_queue.submit(advice_job(entry))
+    await app.admin_service.initialize_prediction_counts()
+    reconcile_interval = float(config.get("PREDICTION_COUNTS_RECONCILE_INTERVAL_SECONDS") or 3600)
+    reconcile_task = None
+    if reconcile_interval > 0:
+        reconcile_task = asyncio.create_task(
+            run_periodically(reconcile_interval, app.admin_service.reconcile_prediction_counts)
+        )
     yield
     # Shutdown
-    app.mongodb_client.close()
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    await predict_batcher.stop()
+    await app.advice_queue.stop()
+    await vectored_service.embedding_provider.close()
+    await resources.close()
+    app.sentiment_service.shutdown()
+    if advice_cache is not None:
+        if advice_cache_task is not None:
+            advice_cache_task.cancel()
+        advice_cache.save()
+    shutdown_executors()
+    await app.mongodb_client.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -68,7 +156,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-vectored_service = VectoredService()
+resources = ResourceRegistry(
+    max_connections=int(config.get("OPENAI_MAX_CONNECTIONS") or 100),
+    max_keepalive_connections=int(config.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS") or 20),
+    keepalive_expiry_seconds=float(config.get("OPENAI_KEEPALIVE_EXPIRY_SECONDS") or 30),
+    timeout_seconds=float(config.get("OPENAI_TIMEOUT_SECONDS") or 60)
+)
+
+embedding_provider = create_embedding_provider(
+    config.get("EMBEDDING_PROVIDER") or "openai",
+    model_name=config.get("EMBEDDING_MODEL_NAME") or None,
+    batch_size=int(config.get("EMBEDDING_BATCH_SIZE") or 32),
+    similarity_threshold=float(config.get("ADVICE_SIMILARITY_THRESHOLD") or 0.6),
+    resources=resources
+)
+
+advice_cache = None
+if config.get("ADVICE_CACHE_ENABLED", "false").lower() == "true":
+    advice_cache = SemanticAdviceCache(
+        embedding_provider.name,
+        path=config.get("ADVICE_CACHE_PATH") or None,
+        radius=float(config.get("ADVICE_CACHE_RADIUS") or 0.92),
+        # e.g. "suicide watch:0.97,anxiety:0.9"
+        class_radius={
+            label.strip().lower(): float(radius)
+            for label, radius in (item.rsplit(":", 1) for item in (config.get("ADVICE_CACHE_CLASS_RADIUS") or "").split(",") if item.strip())
+        },
+        max_size=int(config.get("ADVICE_CACHE_MAX_SIZE") or 10000),
+        backend=config.get("ADVICE_CACHE_BACKEND") or "auto"
+    )
+
+vectored_service = VectoredService(
+    candidates_per_attempt=int(config.get("ADVICE_CANDIDATES_PER_ATTEMPT") or 5),
+    max_attempts=int(config.get("ADVICE_MAX_ATTEMPTS") or 2),
+    embedding_provider=embedding_provider,
+    advice_cache=advice_cache,
+    resources=resources,
+    suggestion_store=SuggestionStore(
+        load_suggestion_documents,
+        fallback_path=config.get("SUGGESTIONS_FALLBACK_PATH") or DEFAULT_FALLBACK_PATH,
+        ttl_seconds=float(config.get("SUGGESTIONS_TTL_SECONDS") or 3600)
+    )
+)
+
+def advice_job(entry):
+    return {
+        "entry_id": entry["_id"],
+        "content": entry["content"],
+        "content_digest": entry["content_digest"],
+        "prediction_class": entry["prediction_class"],
+    }
+
+async def save_advice_cache():
+    await run_blocking(advice_cache.write, advice_cache.snapshot())
+
+async def generate_entry_advice(job):
+    advice = await vectored_service.generate_advice(job["prediction_class"], job["content"])
+    await app.diary_entry_service.set_advice(job["entry_id"], job["content_digest"], advice, "ready")
+
+async def fail_entry_advice(job, error):
+    await app.diary_entry_service.set_advice(job["entry_id"], job["content_digest"], ADVICE_UNAVAILABLE, "failed")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
@@ -85,7 +232,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         token_data = app.auth_service.TokenData(username=username)
     except InvalidTokenError:
         raise credentials_exception
-    user = app.user_service.find_user_by_username(username)
+    user = await app.user_service.find_user_by_username(username)
     if user is None:
         raise credentials_exception
     return user
@@ -120,7 +267,7 @@ Returns:
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
-    user = app.auth_service.authenticate_user(form_data.username, form_data.password)
+    user = await app.auth_service.authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -167,70 +314,266 @@ async def create_diary_entry(current_user: Annotated[User, Depends(get_current_a
     try:
         diaryEntry = jsonable_encoder(diaryEntry)
         diaryEntry["author"] = current_user["_id"]
-        diaryEntry = app.diary_entry_service.create_diary_entry(diaryEntry)
+        created_entry = await app.diary_entry_service.create_diary_entry(diaryEntry)
+        await app.admin_service.record_prediction(diaryEntry["author"], None, diaryEntry["predicted_class_number"])
+        if await app.daily_rollup_service.record_entry(diaryEntry) == 1:
+            # First entry of the day extends or starts a streak
+            await app.streak_service.add_day(diaryEntry["author"], date.fromisoformat(entry_day(diaryEntry["entry_date"])))
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
-    return diaryEntry
+    return created_entry
 
 @app.get("/diary_entry", response_description="List all diary entries", response_model=List[DiaryEntry])
 async def list_diary_entries(
     current_user: Annotated[User, Depends(get_current_active_user)]
 ):
     try:
-        diary_entries = app.diary_entry_service.list_diary_entries(current_user)
+        diary_entries = await app.diary_entry_service.list_diary_entries(current_user)
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
     return diary_entries
 
+'''
+Endpoint to list diary entries page by page, newest first.
+Query parameters:
+  page_size: number of entries per page (default 20)
+  cursor: next_cursor of the previous page, omitted for the first page
+  fields: optional comma separated fields to return, e.g. "entry_date,prediction_class"
+
+Returns:
+{
+  "entries": [...],
+  "next_cursor": "" or null on the last page
+}
+'''
+@app.get("/diary_entry_page", response_description="List one page of diary entries", response_model=DiaryEntryPage)
+async def list_diary_entries_page(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    try:
+        fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        entries, next_cursor = await app.diary_entry_service.list_diary_entries_page(current_user, page_size, cursor, fields)
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return {"entries": entries, "next_cursor": next_cursor}
+
+'''
+Endpoint to import many diary entries of the current user at once.
+Expects in Body a JSON array (Content-Type: application/json) or one JSON object
+per line (Content-Type: application/x-ndjson), each object like:
+{
+  "content": "",
+  "entry_date": ""
+}
+Entries are classified while importing; advice is not generated.
+
+Returns:
+{
+  "inserted": 0,
+  "class_counts": {"<predicted_class_number>": 0},
+  "errors": [{"row": 0, "error": ""}]
+}
+'''
+@app.post("/diary_entry/import", response_description="Import diary entries")
+async def import_diary_entries(current_user: Annotated[User, Depends(get_current_active_user)], request: Request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    import_max_row_bytes = int(config.get("IMPORT_MAX_ROW_BYTES") or MAX_ROW_BYTES)
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        values = iter_ndjson(request.stream(), import_max_row_bytes)
+    elif content_type == "application/json":
+        values = iter_json_array(request.stream(), import_max_row_bytes)
+    else:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Expected application/json or application/x-ndjson")
+    try:
+        report = await app.import_service.import_entries(values, current_user["_id"])
+        days = report.pop("days")
+        if report["inserted"]:
+            # Bring the derived per-user data up to date once for the whole import, for the imported days only
+            await app.admin_service.add_prediction_counts(current_user["_id"], report["class_counts"])
+            new_days = await app.daily_rollup_service.record_days(current_user["_id"], days)
+            if new_days:
+                await app.streak_service.add_days(current_user["_id"], [date.fromisoformat(day) for day in new_days])
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return report
+
 @app.get("/diary_entry/{id}", response_description="Get a single diary entry by id", response_model=DiaryEntry)
 async def find_diary_entry(id: str, current_user: Annotated[User, Depends(get_current_active_user)]):
-    diaryEntry = app.diary_entry_service.find_diary_entry(id)
+    diaryEntry = await app.diary_entry_service.find_diary_entry(id)
     if diaryEntry is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Diary Entry with ID {id} not found")
     if diaryEntry["author"] != current_user["_id"]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Current user cannot access this diary entry")
     return diaryEntry
 
+async def predict_entry_update(id: str, existing_entry: dict, diaryEntry: dict):
+    # Sets the prediction, sentiment and advice of diaryEntry unless its content is unchanged
+    if diaryEntry["content"] is not None:
+        diaryEntry["content_digest"] = content_digest(diaryEntry["content"])
+    stored_digest = existing_entry.get("content_digest") or content_digest(existing_entry["content"])
+
+    if existing_entry.get("prediction_class") and diaryEntry.get("content_digest", stored_digest) == stored_digest:
+        # Content is unchanged, so the stored prediction and advice are still valid
+        logging.info(f'Content of diary entry {id} is unchanged, skipping prediction')
+        return
+    predicted_class_number, predicted_class, confidence, confidence_scores = await predict_batcher.predict(diaryEntry["content"])
+    diaryEntry["predicted_class_number"] = predicted_class_number
+    diaryEntry["prediction_class"] = predicted_class
+    diaryEntry["confidence"] = confidence
+    diaryEntry["confidence_scores"] = confidence_scores
+
+    logging.info(f'Predicted class: {predicted_class}')
+    logging.info(f'Predicted class number: {predicted_class_number}')
+    logging.info(f'Confidence: {confidence}')
+    logging.info(f'Confidence scores: {confidence_scores}')
+
+    diaryEntry["sentiment"] = (await app.sentiment_service.score_batch([diaryEntry["content"]]))[0]
+    if predicted_class_number == 4:
+        diaryEntry["advice"] = vectored_service.off_my_chest_advice(diaryEntry["sentiment"])
+        diaryEntry["advice_status"] = "ready"
+    elif confidence >= 0.7:
+        # Generated in the background, poll GET /diary_entry/{id}/advice for the result
+        diaryEntry["advice"] = ""
+        diaryEntry["advice_status"] = "pending"
+    else:
+        diaryEntry["advice"] = ADVICE_UNAVAILABLE
+        diaryEntry["advice_status"] = "ready"
+
+async def record_entry_update(existing_entry: dict, diaryEntry: dict):
+    if "prediction_class" in diaryEntry:
+        await app.daily_rollup_service.record_prediction(existing_entry, diaryEntry["prediction_class"])
+        await app.admin_service.record_prediction(
+            existing_entry["author"], existing_entry.get("predicted_class_number", 0), diaryEntry["predicted_class_number"]
+        )
+
 @app.put("/diary_entry/{id}", response_description="Update a diary entry", response_model=DiaryEntry)
 async def update_diary_entry(id: str, current_user: Annotated[User, Depends(get_current_active_user)], diaryEntry: DiaryEntryUpdate = Body(...)):
     try:
         diaryEntry = jsonable_encoder(diaryEntry)
-        await find_diary_entry(id, current_user) # Check availability and access right
-        predicted_class_number, predicted_class, confidence, confidence_scores = predict_service.predict(diaryEntry["content"])
-        diaryEntry["predicted_class_number"] = predicted_class_number
-        diaryEntry["prediction_class"] = predicted_class
-        diaryEntry["confidence"] = confidence
-        diaryEntry["confidence_scores"] = confidence_scores
-
-        logging.info(f'Predicted class: {predicted_class}')
-        logging.info(f'Predicted class number: {predicted_class_number}')
-        logging.info(f'Confidence: {confidence}')
-        logging.info(f'Confidence scores: {confidence_scores}')
-
-        if predicted_class_number == 4:
-            diaryEntry["advice"] = vectored_service.handle_off_my_chest(diaryEntry["content"])
-        elif confidence >= 0.7:
-            diary_content = diaryEntry["content"]
-            advice = await vectored_service.generate_advice(predicted_class, diary_content)
-            diaryEntry["advice"] = advice
-        else:
-            diaryEntry["advice"] = "We couldn't process your request at this time. Please try again or share more details for better advice."
-
-        updated_diary_entry = app.diary_entry_service.update_diary_entry(id, diaryEntry)
+        existing_entry = await find_diary_entry(id, current_user) # Check availability and access right
+        await predict_entry_update(id, existing_entry, diaryEntry)
+
+        updated_diary_entry = await app.diary_entry_service.update_diary_entry(id, diaryEntry)
+        if diaryEntry.get("advice_status") == "pending":
+            await app.advice_queue.submit(advice_job({"_id": id, **diaryEntry}))
+        await record_entry_update(existing_entry, diaryEntry)
     except HTTPException as e:
         raise e
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.args[0])
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
     return updated_diary_entry
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def advice_events(entry: dict, generate: bool):
+    yield sse_event("prediction", {field: entry.get(field) for field in PREDICTION_FIELDS})
+    if not generate:
+        # Stored advice (still pending when a queued job is generating it), Off My Chest or a low confidence
+        advice_status = entry.get("advice_status") or "ready"
+        yield sse_event("advice", {"token": entry.get("advice")})
+        yield sse_event("validation", {
+            "similarity": None, "accepted": advice_status == "ready", "cached": False, "advice": entry.get("advice"),
+            "advice_status": advice_status
+        })
+        return
+    validated = False
+    try:
+        async for event, data in vectored_service.stream_advice(entry["prediction_class"], entry["content"]):
+            if event == "validation":
+                await app.diary_entry_service.set_advice(entry["_id"], entry["content_digest"], data["advice"], "ready")
+                validated = True
+                yield sse_event("validation", {**data, "advice_status": "ready"})
+            else:
+                yield sse_event("advice", {"token": data})
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        if not validated:
+            # The client went away or generation failed: finish the advice in the background
+            await app.advice_queue.submit(advice_job(entry))
+
+'''
+Endpoint to update a diary entry and stream its prediction and advice as
+server-sent events, instead of polling GET /diary_entry/{id}/advice.
+Needed body: same as PUT /diary_entry/{id}
+
+Events, in order:
+event: prediction
+data: {"predicted_class_number": 3, "prediction_class": "Depression", "confidence": 0.85, "confidence_scores": {}, "sentiment": {}}
+
+event: advice (once per token as the LLM produces them)
+data: {"token": ""}
+
+event: validation (last; advice replaces the streamed tokens when accepted is false or another attempt was better)
+data: {"similarity": 0.72, "accepted": true, "cached": false, "advice": "", "advice_status": "ready"}
+
+Only advice this request set to pending is generated. Otherwise the stored advice is
+sent with a null similarity; advice_status is "pending" while a queued job is still
+generating it, poll GET /diary_entry/{id}/advice for the result.
+
+event: error (instead of validation when generation failed; the advice is then generated in the background)
+data: {"detail": ""}
+'''
+@app.put("/diary_entry/{id}/stream", response_description="Update a diary entry and stream its prediction and advice as server-sent events")
+async def stream_diary_entry_update(id: str, current_user: Annotated[User, Depends(get_current_active_user)], diaryEntry: DiaryEntryUpdate = Body(...)):
+    try:
+        diaryEntry = jsonable_encoder(diaryEntry)
+        existing_entry = await find_diary_entry(id, current_user) # Check availability and access right
+        await predict_entry_update(id, existing_entry, diaryEntry)
+
+        updated_diary_entry = await app.diary_entry_service.update_diary_entry(id, diaryEntry)
+        await record_entry_update(existing_entry, diaryEntry)
+    except HTTPException as e:
+        raise e
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.args[0])
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return StreamingResponse(
+        advice_events(updated_diary_entry, diaryEntry.get("advice_status") == "pending"),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+'''
+Endpoint to poll the advice of a diary entry after an update.
+
+Returns:
+{
+  "advice_status": "pending" | "ready" | "failed",
+  "advice": ""
+}
+'''
+@app.get("/diary_entry/{id}/advice", response_description="Get the advice status of a diary entry")
+async def get_diary_entry_advice(id: str, current_user: Annotated[User, Depends(get_current_active_user)]):
+    diaryEntry = await find_diary_entry(id, current_user) # Check availability and access right
+    return {
+        "advice_status": diaryEntry.get("advice_status") or "ready",
+        "advice": diaryEntry.get("advice"),
+    }
+
 @app.delete("/diary_entry/{id}", response_description="Delete a diary entry")
 async def delete_diary_entry(id: str, current_user: Annotated[User, Depends(get_current_active_user)], response: Response):
     try:
-        await find_diary_entry(id, current_user) # Check availability and access right
-        app.diary_entry_service.delete_diary_entry(id)
+        diaryEntry = await find_diary_entry(id, current_user) # Check availability and access right
+        await app.diary_entry_service.delete_diary_entry(id)
+        await app.admin_service.record_prediction(diaryEntry["author"], diaryEntry.get("predicted_class_number", 0), None)
+        if await app.daily_rollup_service.remove_entry(diaryEntry) == 0:
+            await app.streak_service.remove_day(diaryEntry["author"], date.fromisoformat(entry_day(diaryEntry["entry_date"])))
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -240,144 +583,180 @@ async def delete_diary_entry(id: str, current_user: Annotated[User, Depends(get_
     return response
 
 @app.get("/admin/user", response_description="Get a list of user with prediction summary", response_model=List[UserSummary])
-def list_users(current_user: Annotated[User, Depends(get_current_active_user)]):
+async def list_users(current_user: Annotated[User, Depends(get_current_active_user)]):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the user list")
     try:
-        prediction_summary = app.admin_service.list_users()
+        prediction_summary = await app.admin_service.list_users()
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
     return prediction_summary
 
+@app.get("/admin/user_page", response_description="Get one page of users with prediction summary", response_model=UserSummaryPage)
+async def list_users_page(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    page_size: int = 20,
+    cursor: Optional[str] = None
+):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the user list")
+    try:
+        users, next_cursor = await app.admin_service.list_users_page(page_size, cursor)
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return {"users": users, "next_cursor": next_cursor}
+
+'''
+Endpoints to export data as NDJSON (format=ndjson) or CSV (format=csv), streamed batch by batch.
+Diary entries can be filtered by start_date and end_date (YYYY-MM-DD, inclusive),
+predicted_class_number and author. Users other than admin only export their own entries.
+'''
+@app.get("/export/diary_entries", response_description="Stream diary entries as NDJSON or CSV")
+async def export_diary_entries(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    format: str = "ndjson",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    predicted_class_number: Optional[int] = None,
+    author: Optional[str] = None
+):
+    if current_user["role"] != "admin":
+        author = current_user["_id"]
+    try:
+        query = app.export_service.diary_entry_filter(author, start_date, end_date, predicted_class_number)
+        chunks = app.export_service.export_diary_entries(query, format)
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=diary_entries.{format}"}
+    )
+
+@app.get("/admin/export/user_summaries", response_description="Stream users with prediction summary as NDJSON or CSV")
+async def export_user_summaries(current_user: Annotated[User, Depends(get_current_active_user)], format: str = "ndjson"):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can export the user list")
+    try:
+        chunks = app.export_service.export_user_summaries(format)
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=user_summaries.{format}"}
+    )
+
+@app.get("/admin/advice_jobs", response_description="Get advice job queue metrics and dead letters")
+def get_advice_jobs(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the advice jobs")
+    return {**app.advice_queue.stats(), "dead_letters": list(app.advice_queue.dead_letters)}
+
+@app.post("/admin/advice_jobs/retry", response_description="Re-queue the dead-lettered advice jobs")
+async def retry_advice_jobs(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can retry the advice jobs")
+    for letter in app.advice_queue.dead_letters:
+        await app.diary_entry_service.set_advice(letter["job"]["entry_id"], letter["job"]["content_digest"], "", "pending")
+    return {"retried": await app.advice_queue.retry_dead_letters()}
+
+@app.get("/admin/suggestions", response_description="Get the state of the in-memory suggestion store")
+def get_suggestions_state(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the suggestion store")
+    return vectored_service.suggestion_store.stats()
+
+'''
+Reloads the suggestion documents from AstraDB, e.g. after they were edited.
+The documents in memory are kept if AstraDB cannot be reached.
+'''
+@app.post("/admin/suggestions/refresh", response_description="Reload the suggestion documents")
+async def refresh_suggestions(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can refresh the suggestions")
+    await vectored_service.suggestion_store.refresh()
+    return vectored_service.suggestion_store.stats()
+
+@app.get("/admin/advice_cache", response_description="Get semantic advice cache metrics")
+def get_advice_cache_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the advice cache metrics")
+    if advice_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **advice_cache.stats()}
+
+@app.get("/admin/predict_stats", response_description="Get prediction queue metrics")
+def get_predict_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the prediction metrics")
+    return predict_batcher.stats()
+
+'''
+Returns the declared indexes that are missing, the indexes that are not declared,
+the indexes unused since the server started (null if the server does not report it)
+and whether the hot queries are planned on an index.
+'''
+@app.get("/admin/index_report", response_description="Get index health of the collections")
+async def get_index_report(current_user: Annotated[User, Depends(get_current_active_user)]):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can get the index report")
+    try:
+        report = await app.index_service.report()
+        report["hot_queries"] = await app.index_service.check_hot_queries()
+    except Exception as e:
+        print(console_error_template.format(type(e).__name__, e.args))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
+    return report
+
 @app.put("/admin/reset_user_pwd/{id}", response_description="Reset password for a user", response_model=User)
-def reset_user_pwd(id: str, current_user: Annotated[User, Depends(get_current_active_user)], user: UserPwdReset = Body(...)):
+async def reset_user_pwd(id: str, current_user: Annotated[User, Depends(get_current_active_user)], user: UserPwdReset = Body(...)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can reset the user password")
     try:
         user = jsonable_encoder(user)
-        user["hashed_password"] = app.auth_service.get_password_hash(user["password"])
+        user["hashed_password"] = await run_blocking(app.auth_service.get_password_hash, user["password"])
         del user["password"]
-        updated_user = app.admin_service.reset_user_pwd(id, user)
+        updated_user = await app.admin_service.reset_user_pwd(id, user)
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
     return updated_user
 
 @app.delete("/admin/delete_user/{id}", response_description="Delete a user")
-def delete_user(id: str, current_user: Annotated[User, Depends(get_current_active_user)], response: Response):
+async def delete_user(id: str, current_user: Annotated[User, Depends(get_current_active_user)], response: Response):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Only admin can delete user")
     try:
-        app.admin_service.delete_user(id)
+        await app.admin_service.delete_user(id)
+        await app.daily_rollup_service.remove_author(id)
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
     response.status_code = status.HTTP_204_NO_CONTENT
     return response
 
+# The streak state is stored on the user record, which get_current_user already
+# loaded through the unique username index, so no further read is needed.
 @app.get("/diary_streak", response_description="Get current diary entry streak")
 async def get_streak(current_user: Annotated[User, Depends(get_current_active_user)]):
     try:
-        diary_entries = await list_diary_entries(current_user)
-
-        # Mock data
-        # diary_entries = [
-        #   {
-        #     "created": "2024-11-02T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-11-01T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-11-01T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-28T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-27T07:52:32.917025",
-        #   }
-        # ]
-        
-        # Collect "created" dates, remove duplicates using set, and sort
-        dates = list(sorted({datetime.fromisoformat(entry["entry_date"]).date() for entry in diary_entries}, reverse=True))
-
-        if len(dates) <= 0:
-            return {
-                "streak": 0,
-            }
-        current_streak = 1
-        today = datetime.now().date()
-
-        # Check if the most recent entry is today or yesterday; otherwise, streak is zero
-        if dates[0] < today - timedelta(days=1):
-            return {
-                "streak": 0,
-            }
-        
-        # Iterate from the most recent to the oldest date
-        for i in range(1, len(dates)):
-            if dates[i] == dates[i - 1] - timedelta(days=1):
-                current_streak += 1
-            else:
-                break  # Stop if there is a gap in the streak
-
         return {
-            "streak": current_streak,
+            "streak": current_streak(current_user.get("streak"), datetime.now().date()),
         }
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.args[0])
 
 @app.get("/max_diary_streak", response_description="Get longest diary entry streak")
-async def get_streak(current_user: Annotated[User, Depends(get_current_active_user)]):
+async def get_max_streak(current_user: Annotated[User, Depends(get_current_active_user)]):
     try:
-        diary_entries = await list_diary_entries(current_user)
-
-        # Mock data
-        # diary_entries = [
-        #   {
-        #     "created": "2024-11-01T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-31T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-30T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-28T07:52:32.917025",
-        #   },
-        #   {
-        #     "created": "2024-10-27T07:52:32.917025",
-        #   }
-        # ]
-        
-        # Collect "created" dates, remove duplicates using set, and sort
-        dates = list(sorted({datetime.fromisoformat(entry["entry_date"]).date() for entry in diary_entries}, reverse=True))
-
-        if len(dates) <= 0:
-            return {
-                "max_streak": 0,
-            }
-
-        max_streak = 1
-        current_streak = 1
-        
-        # Iterate from the most recent to the oldest date
-        for i in range(1, len(dates)):
-            if dates[i] == dates[i - 1] - timedelta(days=1):
-                current_streak += 1
-            else:
-                # Update max_streak if the current one is the longest found so far
-                max_streak = max(max_streak, current_streak)
-                current_streak = 1  # Reset the current streak
-
-        max_streak = max(max_streak, current_streak)
-
         return {
-            "max_streak": max_streak,
+            "max_streak": max_streak(current_user.get("streak")),
         }
     except Exception as e:
         print(console_error_template.format(type(e).__name__, e.args))
@@ -386,7 +765,7 @@ async def get_streak(current_user: Annotated[User, Depends(get_current_active_us
 @app.get("/diary_dates", response_description="Get longest diary entry streak")
 async def get_diary_dates(current_user: Annotated[User, Depends(get_current_active_user)]):
     try:
-        diary_entries = await list_diary_entries(current_user)
+        days = await app.daily_rollup_service.list_days(current_user["_id"])
 
         # Mock data
         # diary_entries = [
@@ -407,8 +786,8 @@ async def get_diary_dates(current_user: Annotated[User, Depends(get_current_acti
         #   }
         # ]
         
-        # Collect "created" dates, remove duplicates using set, and sort
-        dates = list(sorted({datetime.fromisoformat(entry["entry_date"]).date() for entry in diary_entries}, reverse=True))
+        # One rollup per day with entries, already sorted from the most recent
+        dates = [date.fromisoformat(day["date"]) for day in days]
 
         return {
             "dates": dates,
@@ -438,7 +817,7 @@ async def get_prediction_summary(
     current_user: Annotated[User, Depends(get_current_active_user)]
 ):
     try:
-        diary_entries = await list_diary_entries(current_user)
+        days = await app.daily_rollup_service.list_days(current_user["_id"])
 
         weights = {
             "Depression": 10,
@@ -448,26 +827,17 @@ async def get_prediction_summary(
             "Off My Chest": 0,
         }
 
-        predictions = {}
-
-        for entry in diary_entries:
-            current_date = str(datetime.fromisoformat(entry["entry_date"]).date())
-            prediction = entry["prediction_class"]
-            if len(prediction) == 0:
-                continue
-            if current_date not in predictions:
-                predictions[current_date] = []
-            predictions[current_date].append(prediction)
-
         result = {}
 
-        for date in predictions:
+        for day in days:
+            class_counts = {pred: count for pred, count in day.get("class_counts", {}).items() if count > 0}
+            if len(class_counts) == 0:
+                continue
             score = 100
-            preds = predictions[date]
-            for pred in preds:
-                score -= weights[pred]
+            for pred, count in class_counts.items():
+                score -= weights[pred] * count
 
-            result[date] = score
+            result[day["date"]] = score
 
         return {
             "summary": result
@@ -502,11 +872,11 @@ Returns user info:
 }
 '''
 @app.post("/user", response_description="Create a new user", status_code=status.HTTP_201_CREATED, response_model=User)
-def create_user(user: User = Body(...)):
+async def create_user(user: User = Body(...)):
     try:
         user = jsonable_encoder(user)
-        user["hashed_password"] = app.auth_service.get_password_hash(user["hashed_password"])
-        created_user = app.user_service.create_user(user)
+        user["hashed_password"] = await run_blocking(app.auth_service.get_password_hash, user["hashed_password"])
+        created_user = await app.user_service.create_user(user)
     except errors.DuplicateKeyError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.args[0])
     except Exception as e:
@@ -515,8 +885,8 @@ def create_user(user: User = Body(...)):
     return created_user
 
 @app.get("/user/{id}", response_description="Get a single user by id", response_model=User)
-def find_user(id: str):
-    if (user := app.user_service.find_user(id)) is None:
+async def find_user(id: str):
+    if (user := await app.user_service.find_user(id)) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {id} not found")
     return user
 
@@ -545,14 +915,14 @@ Returns updated user info:
 }
 '''
 @app.put("/user", response_description="Update a user")
-def update_user(current_user: Annotated[User, Depends(get_current_active_user)], user: UserUpdate = Body(...)) -> Token:
+async def update_user(current_user: Annotated[User, Depends(get_current_active_user)], user: UserUpdate = Body(...)) -> Token:
     try:
         user_data = user.dict(exclude_unset=True)
         if "password" in user_data:
-            user_data["hashed_password"] = app.auth_service.get_password_hash(user_data["password"])
+            user_data["hashed_password"] = await run_blocking(app.auth_service.get_password_hash, user_data["password"])
             del user_data["password"]
         user_data = jsonable_encoder(user_data)
-        updated_user = app.user_service.update_user(current_user["_id"], user_data)
+        updated_user = await app.user_service.update_user(current_user["_id"], user_data)
         access_token_expires = timedelta(minutes=int(config["ACCESS_TOKEN_EXPIRE_MINUTES"]))
         access_token = app.auth_service.create_access_token(
             data={"sub": updated_user["username"]}, expires_delta=access_token_expires
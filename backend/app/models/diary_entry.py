@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -13,6 +13,11 @@ class DiaryEntry(BaseModel):
     confidence: float = Field(default_factory=lambda: 0.0)
     confidence_scores: dict = Field(default_factory=lambda: {})
     advice: Optional[str] = Field(default_factory=lambda: "")
+    content_digest: Optional[str] = None
+    # pending while advice is generated in the background, then ready or failed
+    advice_status: Optional[str] = None
+    # VADER scores of the content: neg, neu, pos and compound
+    sentiment: Optional[dict] = None
     created: datetime = Field(default_factory=datetime.now)
     updated: datetime = Field(default_factory=datetime.now)
 
@@ -38,4 +43,9 @@ class DiaryEntryUpdate(BaseModel):
             "example": {
                 "content": "Don Quixote is a Spanish novel by Miguel de Cervantes..."
             }
-        }
\ No newline at end of file
+        }
+
+class DiaryEntryPage(BaseModel):
+    # Entries may be projected to a subset of the DiaryEntry fields
+    entries: List[dict]
+    next_cursor: Optional[str] = None
@@ -1,8 +1,11 @@
 import uuid
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
+# Per-user counters of entries by predicted_class_number, kept on the user record
+PREDICTION_COUNT_FIELDS = ("anxiety_count", "suicide_count", "bipolar_count", "depression_count", "other_count")
+
 class User(BaseModel):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, alias="_id")
     username: str = Field(...)
@@ -57,6 +60,10 @@ class UserSummary(BaseModel):
     user_id: Optional[str]
     username: Optional[str]
 
+class UserSummaryPage(BaseModel):
+    users: List[UserSummary]
+    next_cursor: Optional[str] = None
+
 class UserPwdReset(BaseModel):
     password: Optional[str]
     updated: datetime = Field(default_factory=datetime.now)
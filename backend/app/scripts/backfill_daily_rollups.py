@@ -0,0 +1,48 @@
+'''
+Build the per-user daily rollups used by the prediction summary endpoints, the
+streak state and the admin prediction counters stored on the user records from
+the stored diary entries. Run from backend/app:
+python -m scripts.backfill_daily_rollups
+python -m scripts.backfill_daily_rollups --author <user id>
+Safe to re-run, e.g. to repair drift after a failed write.
+'''
+import argparse
+import asyncio
+from dotenv import dotenv_values
+from datetime import date
+from services.daily_rollup_service import DailyRollupService
+from services.streak_service import StreakService
+from services.admin_service import AdminService
+from utils.mongo_utils import create_mongo_client
+
+async def backfill(author=None):
+    config = dotenv_values(".env")
+    client = create_mongo_client(config["ATLAS_URI"], config)
+    try:
+        database = client[config["DB_NAME"]]
+        service = DailyRollupService(database["daily_rollups"])
+        written = await service.rebuild(database["diary_entries"], author)
+        print(f"Wrote {written} daily rollups")
+
+        streak_service = StreakService(database["users"])
+        authors = [author] if author else await database["users"].distinct("_id")
+        for user_id in authors:
+            days = await service.list_days(user_id)
+            await streak_service.rebuild(user_id, [date.fromisoformat(day["date"]) for day in days])
+        print(f"Rebuilt the streaks of {len(authors)} users")
+
+        if author is None:
+            # The counters are also reconciled periodically by the server
+            await AdminService(database).reconcile_prediction_counts()
+            print("Reconciled the admin prediction counters")
+    finally:
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--author", help="Only rebuild the rollups of this user id")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.author))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+'''
+Compare the wall-clock time of advice generation against the previous sequential
+implementation (five attempts of two candidates one after the other, one embedding
+request per candidate). Starts scripts.fake_llm_server in the background, so neither OpenAI
+nor AstraDB is contacted. Run from backend/app:
+python -m scripts.benchmark_advice --chat-latency 1.0 --embedding-latency 0.2 --repeat 3
+"worst case" never reaches the similarity threshold and runs every attempt;
+"first attempt" clears it with the first candidate.
+'''
+import argparse
+import asyncio
+import os
+import time
+import numpy as np
+import openai
+from scripts.fake_llm_server import DEFAULT_SETTINGS, start_in_thread, topic_vector
+
+PORT = 8001
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+
+from sklearn.metrics.pairwise import cosine_similarity
+from services.openai_service import OpenAIService, EMBEDDING_MODEL
+from services.embedding_providers import SIMILARITY_THRESHOLD
+from services.suggestion_store import SuggestionStore
+from services.vectordb_service import VectoredService
+
+DIARY_CONTENT = "I could not sleep again and everything feels heavy."
+
+def sequential_advice(service, openai_service, db_embeddings):
+    highest_similarity = 0
+    best_response = None
+    for _ in range(5):
+        responses = [openai_service.generate_response("prompt", temperature=service.temperature) for _ in range(2)]
+        for response in responses:
+            embedding = np.array(openai.embeddings.create(input=[response], model=EMBEDDING_MODEL).data[0].embedding)
+            similarity = cosine_similarity(embedding.reshape(1, -1), db_embeddings)[0].max()
+            if similarity > highest_similarity:
+                highest_similarity, best_response = similarity, response
+            if highest_similarity >= SIMILARITY_THRESHOLD:
+                return best_response
+    return best_response
+
+async def concurrent_advice(service):
+    try:
+        return await service.generate_advice("depression", DIARY_CONTENT)
+    finally:
+        await service.resources.close()
+
+def timed(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return np.mean(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chat-latency", type=float, default=1.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=DEFAULT_SETTINGS["jitter"])
+    parser.add_argument("--candidates-per-attempt", type=int, default=5)
+    parser.add_argument("--max-attempts", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    settings = dict(DEFAULT_SETTINGS, chat_latency=args.chat_latency, embedding_latency=args.embedding_latency,
+                    jitter=args.jitter)
+    server = start_in_thread(settings, port=PORT)
+
+    db_embeddings = topic_vector(settings["dimensions"]).reshape(1, -1)
+    # AstraDB is not contacted: the suggestion vector is the fake server's topic vector
+    suggestion_store = SuggestionStore(lambda: [{"class": "depression", "suggestions": ["Take a walk"], "$vector": db_embeddings[0]}])
+    service = VectoredService(candidates_per_attempt=args.candidates_per_attempt, max_attempts=args.max_attempts,
+                              suggestion_store=suggestion_store)
+    openai_service = OpenAIService()
+
+    print(f"{'scenario':>14} {'sequential (s)':>15} {'concurrent (s)':>15} {'speedup':>8}")
+    for scenario, similarity in (("worst case", 0.5), ("first attempt", 0.7)):
+        settings["similarity"] = similarity
+        sequential = timed(lambda: sequential_advice(service, openai_service, db_embeddings), args.repeat)
+        concurrent = timed(lambda: asyncio.run(concurrent_advice(service)), args.repeat)
+        print(f"{scenario:>14} {sequential:>15.2f} {concurrent:>15.2f} {sequential / concurrent:>7.1f}x")
+
+    server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+'''
+Compare p50/p99 latency and throughput of the inference backends on CPU.
+Export the models first with scripts.export_model. Run from backend/app:
+python -m scripts.benchmark_backends --batch-size 8 --seq-len 128 --repeat 50
+'''
+import argparse
+import os
+import time
+import numpy as np
+import torch
+from utils.inference_backends import INFERENCE_BACKENDS
+from utils.roberta_model_utils import RobertaModelUtils
+
+def benchmark(model, input_ids, attention_mask, repeat):
+    with torch.no_grad():
+        model(input_ids=input_ids, attention_mask=attention_mask)  # warm up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(input_ids=input_ids, attention_mask=attention_mask)
+            timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99), input_ids.shape[0] * 1000 / np.mean(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seq-len", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    input_ids = torch.randint(3, 1000, (args.batch_size, args.seq_len))
+    attention_mask = torch.ones_like(input_ids)
+
+    print(f"{'backend':>12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'entries/s':>10}")
+    for backend in INFERENCE_BACKENDS:
+        model_utils = RobertaModelUtils(backend=backend, quantization=None if backend == "torch-eager" else "none")
+        path = {"torchscript": model_utils.torchscript_path, "onnxruntime": model_utils.onnx_path}.get(backend)
+        if path and not os.path.exists(path):
+            print(f"{backend:>12} skipped, {path} not found")
+            continue
+        model, _, _ = model_utils.load()
+        p50, p99, throughput = benchmark(model, input_ids, attention_mask, args.repeat)
+        print(f"{backend:>12} {p50:>10.2f} {p99:>10.2f} {throughput:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+'''
+Compare the embedding providers used to score advice candidates: latency and API
+cost of scoring the candidates of one advice (candidates_per_attempt texts per
+request, max_attempts requests). Run from backend/app:
+python -m scripts.benchmark_embeddings --repeat 20
+The remote provider calls OPENAI_BASE_URL when it is set (e.g. a running
+scripts.fake_llm_server), otherwise it starts a fake server with --remote-latency.
+The local model is downloaded on first use.
+'''
+import argparse
+import asyncio
+import os
+import time
+import numpy as np
+from scripts.fake_llm_server import DEFAULT_SETTINGS, REPLIES, start_in_thread
+
+if not os.getenv("OPENAI_BASE_URL"):
+    os.environ["OPENAI_BASE_URL"] = "http://127.0.0.1:8001/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    start_fake_server = True
+else:
+    start_fake_server = False
+
+from services.embedding_providers import create_embedding_provider
+
+# Rough tokens per character of English text, for the cost estimate
+TOKENS_PER_CHAR = 0.25
+
+async def benchmark(provider, candidates, candidates_per_attempt, repeat):
+    await provider.load()
+    await provider.embed(candidates[:candidates_per_attempt])  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for index in range(0, len(candidates), candidates_per_attempt):
+            await provider.embed(candidates[index:index + candidates_per_attempt])
+        timings.append((time.perf_counter() - start) * 1000)
+    await provider.close()
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--local-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--candidates-per-attempt", type=int, default=5)
+    parser.add_argument("--max-attempts", type=int, default=2)
+    parser.add_argument("--remote-latency", type=float, default=DEFAULT_SETTINGS["embedding_latency"])
+    # text-embedding-ada-002 list price in USD
+    parser.add_argument("--price-per-million-tokens", type=float, default=0.10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    server = None
+    if start_fake_server:
+        server = start_in_thread(dict(DEFAULT_SETTINGS, embedding_latency=args.remote_latency))
+
+    count = args.candidates_per_attempt * args.max_attempts
+    candidates = [f"{REPLIES[index % len(REPLIES)]} ({index})" for index in range(count)]
+    remote_cost = sum(len(text) for text in candidates) * TOKENS_PER_CHAR * args.price_per_million_tokens / 1e6
+
+    print(f"{'provider':>40} {'p50 (ms)':>10} {'p99 (ms)':>10} {'USD/advice':>12}")
+    for name, model_name, cost in (("openai", None, remote_cost), ("sentence-transformers", args.local_model, 0.0)):
+        provider = create_embedding_provider(name, model_name=model_name)
+        try:
+            p50, p99 = asyncio.run(benchmark(provider, candidates, args.candidates_per_attempt, args.repeat))
+        except Exception as e:
+            print(f"{provider.name:>40} skipped: {str(e)}")
+            continue
+        print(f"{provider.name:>40} {p50:>10.2f} {p99:>10.2f} {cost:>12.7f}")
+
+    if server is not None:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
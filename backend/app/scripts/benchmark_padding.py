@@ -0,0 +1,47 @@
+'''
+Compare prediction latency of fixed max_length padding against length-bucketed padding.
+Run from backend/app:
+python -m scripts.benchmark_padding --repeat 20 --batch-size 8
+'''
+import argparse
+import statistics
+import time
+from services.predict_service import PredictService, predict_service
+
+WORDS = "today i felt tired and a little worried about school but talking to my friend helped".split()
+
+def make_text(tokenizer, target_tokens: int):
+    # Grow the text until it reaches the requested token length (special tokens included)
+    words = []
+    while len(tokenizer(" ".join(words))["input_ids"]) < target_tokens:
+        words.append(WORDS[len(words) % len(WORDS)])
+    return " ".join(words)
+
+def time_predictions(service, texts, repeat):
+    service.predict_batch(texts)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        service.predict_batch(texts)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    model, tokenizer, label_mapping = predict_service.model, predict_service.tokenizer, predict_service.label_mapping
+    fixed = PredictService(model, tokenizer, label_mapping, padding='max_length')
+    bucketed = PredictService(model, tokenizer, label_mapping, padding='bucket', length_buckets=predict_service.length_buckets)
+
+    print(f"{'bucket':>8} {'fixed (ms)':>12} {'bucketed (ms)':>14} {'speedup':>8}")
+    for bucket in bucketed.length_buckets:
+        texts = [make_text(tokenizer, bucket - 2)] * args.batch_size
+        fixed_ms = time_predictions(fixed, texts, args.repeat)
+        bucketed_ms = time_predictions(bucketed, texts, args.repeat)
+        print(f"{bucket:>8} {fixed_ms:>12.2f} {bucketed_ms:>14.2f} {fixed_ms / bucketed_ms:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
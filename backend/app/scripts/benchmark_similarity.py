@@ -0,0 +1,43 @@
+'''
+Compare scoring advice candidates against the suggestion embeddings of a class:
+the previous path (rebuild the reference matrix from the stored list and call
+sklearn's cosine_similarity once per candidate) against one matrix multiply on a
+pre-normalized float32 matrix. Run from backend/app:
+python -m scripts.benchmark_similarity --candidates 10 --references 20 --dimensions 1536
+'''
+import argparse
+import timeit
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from utils.similarity import normalize_rows, top_k_similarities
+
+def per_candidate(candidates, stored_vectors):
+    db_embeddings = np.array(stored_vectors)
+    return [max(cosine_similarity(candidate.reshape(1, -1), db_embeddings)[0]) for candidate in candidates]
+
+def batched(candidates, references):
+    return top_k_similarities(candidates, references, k=1)[0][:, 0]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--references", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    candidates = rng.standard_normal((args.candidates, args.dimensions))
+    stored_vectors = rng.standard_normal((args.references, args.dimensions)).tolist()
+    references = normalize_rows(stored_vectors)
+
+    np.testing.assert_allclose(per_candidate(candidates, stored_vectors), batched(candidates, references), atol=1e-5)
+
+    print(f"{'path':>14} {'mean (ms)':>10}")
+    for name, run in (("per candidate", lambda: per_candidate(candidates, stored_vectors)),
+                      ("batched", lambda: batched(candidates, references))):
+        seconds = timeit.timeit(run, number=args.repeat) / args.repeat
+        print(f"{name:>14} {seconds * 1000:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+'''
+Compare when the user first sees advice: after the whole generate_advice loop, as
+with PUT /diary_entry/{id} and polling, or at the first token of stream_advice, as
+with PUT /diary_entry/{id}/stream. Starts scripts.fake_llm_server in the
+background, so neither OpenAI nor AstraDB is contacted. Run from backend/app:
+python -m scripts.benchmark_streaming --chat-latency 1.0 --token-latency 0.02 --repeat 3
+'''
+import argparse
+import asyncio
+import os
+import time
+import numpy as np
+from scripts.fake_llm_server import DEFAULT_SETTINGS, start_in_thread, topic_vector
+
+PORT = 8001
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+
+from services.suggestion_store import SuggestionStore
+from services.vectordb_service import VectoredService
+
+DIARY_CONTENT = "I could not sleep again and everything feels heavy."
+
+async def whole_advice(service):
+    start = time.perf_counter()
+    try:
+        await service.generate_advice("depression", DIARY_CONTENT)
+        return time.perf_counter() - start, time.perf_counter() - start
+    finally:
+        await service.resources.close()
+
+async def streamed_advice(service):
+    start = time.perf_counter()
+    first_token = None
+    try:
+        async for event, _ in service.stream_advice("depression", DIARY_CONTENT):
+            if event == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+        return first_token, time.perf_counter() - start
+    finally:
+        await service.resources.close()
+
+def timed(run, repeat):
+    timings = np.array([asyncio.run(run()) for _ in range(repeat)])
+    return timings.mean(axis=0)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chat-latency", type=float, default=1.0)
+    parser.add_argument("--token-latency", type=float, default=DEFAULT_SETTINGS["token_latency"])
+    parser.add_argument("--embedding-latency", type=float, default=0.2)
+    parser.add_argument("--similarity", type=float, default=0.7)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    settings = dict(DEFAULT_SETTINGS, chat_latency=args.chat_latency, token_latency=args.token_latency,
+                    embedding_latency=args.embedding_latency, similarity=args.similarity)
+    server = start_in_thread(settings, port=PORT)
+
+    vector = topic_vector(settings["dimensions"])
+    # AstraDB is not contacted: the suggestion vector is the fake server's topic vector
+    suggestion_store = SuggestionStore(lambda: [{"class": "depression", "suggestions": ["Take a walk"], "$vector": vector}])
+    service = VectoredService(suggestion_store=suggestion_store)
+
+    print(f"{'mode':>10} {'first advice (s)':>17} {'validated (s)':>14}")
+    for mode, run in (("whole", lambda: whole_advice(service)), ("streamed", lambda: streamed_advice(service))):
+        first, validated = timed(run, args.repeat)
+        print(f"{mode:>10} {first:>17.2f} {validated:>14.2f}")
+
+    server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Accuracy regression check and memory/latency report for the int8 model against fp32,
+on the SWMH test split loaded with model/pipeline/data_loading.py.
+Run from backend/app (TAR_GZ_PATH points to the SWMH archive):
+python -m scripts.evaluate_quantization --limit 2000 --max-accuracy-drop 0.01
+Exits with status 1 when the int8 accuracy drops by more than --max-accuracy-drop.
+'''
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+from services.predict_service import PredictService
+from utils.roberta_model_utils import RobertaModelUtils
+from utils.quantization_utils import quantize_dynamic_int8, model_size_bytes
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "model", "pipeline"))
+from data_loading import load_data
+
+# LabelEncoder order used at training time, matching RobertaModelUtils.label_mapping
+SWMH_LABELS = ['self.Anxiety', 'self.SuicideWatch', 'self.bipolar', 'self.depression', 'self.offmychest']
+
+def evaluate(service, texts, labels, batch_size):
+    correct = 0
+    timings = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        begin = time.perf_counter()
+        results = service.predict_batch(batch)
+        timings.append((time.perf_counter() - begin) * 1000)
+        correct += sum(result[0] == label for result, label in zip(results, labels[start:start + batch_size]))
+    return correct / len(texts), statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    load_dotenv()
+    tar_gz_path = os.getenv("TAR_GZ_PATH")
+    if not tar_gz_path:
+        raise ValueError("TAR_GZ_PATH is not set in the .env file.")
+    _, _, df_test = load_data(tar_gz_path)
+    df_test = df_test.dropna(subset=["text"]).head(args.limit)
+    texts = list(df_test["text"])
+    labels = [SWMH_LABELS.index(label) for label in df_test["label"]]
+
+    model_utils = RobertaModelUtils(backend="torch-eager", quantization="none")
+    fp32_model, tokenizer, label_mapping = model_utils.load()
+    int8_model = quantize_dynamic_int8(copy.deepcopy(fp32_model))
+
+    report = {}
+    for name, model in (("fp32", fp32_model), ("int8", int8_model)):
+        service = PredictService(model, tokenizer, label_mapping, padding="bucket")
+        accuracy, latency = evaluate(service, texts, labels, args.batch_size)
+        report[name] = (accuracy, latency, model_size_bytes(model))
+
+    print(f"{'model':>6} {'accuracy':>9} {'batch p50 (ms)':>15} {'size (MB)':>10}")
+    for name, (accuracy, latency, size) in report.items():
+        print(f"{name:>6} {accuracy:>9.4f} {latency:>15.2f} {size / 2**20:>10.1f}")
+
+    accuracy_drop = report["fp32"][0] - report["int8"][0]
+    print(f"Accuracy drop: {accuracy_drop:.4f} (allowed {args.max_accuracy_drop})")
+    if accuracy_drop > args.max_accuracy_drop:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+'''
+Export the fine-tuned classifier at MODEL_PATH for the torchscript or onnxruntime backend.
+Run from backend/app:
+python -m scripts.export_model --format onnx --optimize
+python -m scripts.export_model --format torchscript
+Then set INFERENCE_BACKEND=onnxruntime (or torchscript) in .env
+'''
+import argparse
+from utils.roberta_model_utils import RobertaModelUtils
+from utils.inference_backends import export_onnx, export_torchscript
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=["onnx", "torchscript"], default="onnx")
+    parser.add_argument("--optimize", action="store_true", help="Apply onnxruntime graph fusion (onnx only)")
+    parser.add_argument("--output", help="Defaults to ONNX_MODEL_PATH / TORCHSCRIPT_MODEL_PATH")
+    args = parser.parse_args()
+
+    model_utils = RobertaModelUtils(backend="torch-eager", quantization="none")
+    model = model_utils.load_eager()
+
+    if args.format == "onnx":
+        path = export_onnx(model, args.output or model_utils.onnx_path, optimize=args.optimize)
+    else:
+        path = export_torchscript(model, args.output or model_utils.torchscript_path)
+    print(f"Exported {args.format} model to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+'''
+OpenAI-compatible chat completions and embeddings server with a configurable latency,
+to benchmark advice generation without calling OpenAI. Run from backend/app:
+python -m scripts.fake_llm_server --port 8001 --chat-latency 1.0 --embedding-latency 0.2 --similarity 0.5
+then start the backend with OPENAI_BASE_URL=http://localhost:8001/v1.
+Streamed chat completions send their first word after --chat-latency and one
+word every --token-latency after that.
+Every embedding has cosine similarity --similarity with topic_vector(), which
+scripts.benchmark_advice uses as the suggestion vector.
+'''
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Body
+from fastapi.responses import StreamingResponse
+
+DEFAULT_SETTINGS = {
+    "chat_latency": 1.0,
+    "embedding_latency": 0.2,
+    "token_latency": 0.02,
+    # Latencies vary by up to this fraction, so concurrent candidates finish at different times
+    "jitter": 0.3,
+    "similarity": 0.5,
+    "dimensions": 1536,
+}
+
+REPLIES = [
+    "Try to take a short walk today and notice how your body feels.",
+    "It can help to write down one small thing you managed to do today.",
+    "Consider reaching out to someone you trust and sharing how you feel.",
+    "Give yourself permission to rest; slowing down is not failing.",
+]
+
+def topic_vector(dimensions: int) -> np.ndarray:
+    vector = np.random.default_rng(0).standard_normal(dimensions)
+    return vector / np.linalg.norm(vector)
+
+def fake_embedding(text: str, similarity: float, dimensions: int) -> np.ndarray:
+    topic = topic_vector(dimensions)
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    noise = np.random.default_rng(seed).standard_normal(dimensions)
+    noise -= noise.dot(topic) * topic
+    noise /= np.linalg.norm(noise)
+    return similarity * topic + np.sqrt(1 - similarity ** 2) * noise
+
+def create_app(settings: dict) -> FastAPI:
+    """
+    settings is read on every request, so a caller may change it while the server runs.
+    """
+    app = FastAPI()
+    app.state.chat_requests = 0
+    app.state.embedding_requests = 0
+
+    async def sleep(latency):
+        await asyncio.sleep(latency * random.uniform(1 - settings["jitter"], 1 + settings["jitter"]))
+
+    def chunk(completion_id, model, delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    async def stream_words(completion_id, model, content):
+        await sleep(settings["chat_latency"])
+        yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for index, word in enumerate(content.split(" ")):
+            if index:
+                await sleep(settings["token_latency"])
+            yield chunk(completion_id, model, {"content": word if index == 0 else f" {word}"})
+        yield chunk(completion_id, model, {}, "stop")
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: dict = Body(...)):
+        app.state.chat_requests += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        content = f"{random.choice(REPLIES)} ({uuid.uuid4().hex[:8]})"
+        if request.get("stream"):
+            return StreamingResponse(
+                stream_words(completion_id, request.get("model", "fake"), content), media_type="text/event-stream"
+            )
+        await sleep(settings["chat_latency"])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: dict = Body(...)):
+        app.state.embedding_requests += 1
+        await sleep(settings["embedding_latency"])
+        texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index,
+                 "embedding": fake_embedding(text, settings["similarity"], settings["dimensions"]).tolist()}
+                for index, text in enumerate(texts)
+            ],
+            "model": request.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+def start_in_thread(settings: dict, host: str = "127.0.0.1", port: int = 8001) -> uvicorn.Server:
+    """
+    Serves create_app(settings) from a daemon thread; set should_exit on the result to stop it.
+    """
+    server = uvicorn.Server(uvicorn.Config(create_app(settings), host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    for name, value in DEFAULT_SETTINGS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    settings = {name: getattr(args, name) for name in DEFAULT_SETTINGS}
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+'''
+Save a dynamically int8 quantized copy of the classifier at MODEL_PATH.
+Run from backend/app:
+python -m scripts.quantize_model
+Then set MODEL_QUANTIZATION=dynamic-int8 in .env
+'''
+import argparse
+from utils.roberta_model_utils import RobertaModelUtils
+from utils.quantization_utils import quantize_dynamic_int8, save_quantized, model_size_bytes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="Defaults to QUANTIZED_MODEL_PATH")
+    args = parser.parse_args()
+
+    model_utils = RobertaModelUtils(backend="torch-eager", quantization="none")
+    model = model_utils.load_eager()
+    fp32_size = model_size_bytes(model)
+
+    quantized = quantize_dynamic_int8(model)
+    path = save_quantized(quantized, args.output or model_utils.quantized_path)
+    print(f"Saved int8 model to {path} ({fp32_size / 2**20:.1f} MB -> {model_size_bytes(quantized) / 2**20:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
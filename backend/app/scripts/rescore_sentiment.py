@@ -0,0 +1,45 @@
+'''
+Score the stored diary entries with VADER and store the scores in their
+sentiment field, scoring large batches across a pool of processes. Run from
+backend/app:
+python -m scripts.rescore_sentiment
+python -m scripts.rescore_sentiment --author <user id> --missing-only
+Safe to re-run, e.g. after updating vaderSentiment.
+'''
+import argparse
+import asyncio
+from dotenv import dotenv_values
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+from utils.mongo_utils import create_mongo_client
+
+async def rescore(author=None, missing_only=False, batch_size=5000):
+    config = dotenv_values(".env")
+    client = create_mongo_client(config["ATLAS_URI"], config)
+    service = SentimentService(
+        ResourceRegistry(),
+        max_workers=int(config.get("SENTIMENT_WORKERS") or 0) or None,
+        chunk_size=int(config.get("SENTIMENT_CHUNK_SIZE") or 500)
+    )
+    try:
+        query = {}
+        if author:
+            query["author"] = author
+        if missing_only:
+            query["sentiment"] = None
+        scored = await service.rescore_entries(client[config["DB_NAME"]]["diary_entries"], query, batch_size)
+        print(f"Scored {scored} diary entries")
+    finally:
+        service.shutdown()
+        await client.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--author", help="Only rescore the entries of this user id")
+    parser.add_argument("--missing-only", action="store_true", help="Only score the entries without a sentiment")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Entries read and written per batch")
+    args = parser.parse_args()
+    asyncio.run(rescore(args.author, args.missing_only, args.batch_size))
+
+if __name__ == "__main__":
+    main()
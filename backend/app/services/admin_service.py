@@ -1,90 +1,142 @@
-from models.user import UserPwdReset
+import asyncio
+from pymongo import ASCENDING, DESCENDING
+from models.user import UserPwdReset, PREDICTION_COUNT_FIELDS
+from utils.mongo_utils import encode_cursor, decode_cursor
+
+SUICIDE_COUNT = "prediction_counts.suicide_count"
+USER_SUMMARY_SORT = [(SUICIDE_COUNT, DESCENDING), ("_id", ASCENDING)]
+USER_SUMMARY_PROJECTION = {"username": 1, "prediction_counts": 1}
+
+def empty_prediction_counts():
+    return {field: 0 for field in PREDICTION_COUNT_FIELDS}
+
+def user_summary(user):
+    counts = user.get("prediction_counts") or {}
+    return {
+        "user_id": user["_id"],
+        "username": user["username"],
+        **{field: counts.get(field, 0) for field in PREDICTION_COUNT_FIELDS},
+    }
 
 class AdminService:
 
-    def __init__(self, database):
+    def __init__(self, database, max_page_size=100):
         self.database = database
+        self.max_page_size = max_page_size
+
+    async def list_users(self):
+        """
+        Users with their prediction counters, most suicide watch entries first.
+        Reads the counters kept on the user records instead of joining every diary entry.
+        """
+        users = await self.database["users"].find(
+            {"role": "user"}, USER_SUMMARY_PROJECTION, sort=USER_SUMMARY_SORT
+        ).to_list(None)
+        return [user_summary(user) for user in users]
+
+    async def list_users_page(self, page_size=20, cursor=None):
+        if page_size < 1 or page_size > self.max_page_size:
+            raise ValueError(f"page_size must be between 1 and {self.max_page_size}")
+        query = {"role": "user"}
+        if cursor is not None:
+            suicide_count, last_id = decode_cursor(cursor, 2)
+            query["$or"] = [
+                {SUICIDE_COUNT: {"$lt": suicide_count}},
+                {SUICIDE_COUNT: suicide_count, "_id": {"$gt": last_id}},
+            ]
+
+        users = await self.database["users"].find(
+            query, USER_SUMMARY_PROJECTION, sort=USER_SUMMARY_SORT, limit=page_size + 1
+        ).to_list(None)
+        next_cursor = None
+        if len(users) > page_size:
+            users = users[:page_size]
+            next_cursor = encode_cursor([user_summary(users[-1])["suicide_count"], users[-1]["_id"]])
+        return [user_summary(user) for user in users], next_cursor
 
-    def list_users(self):
-        summary = self.database["users"].aggregate([
-            {
-                "$match": { "role": "user" }
-            },
-            {
-                "$lookup": {
-                    "from": "diary_entries",
-                    "localField": "_id",
-                    "foreignField": "author",
-                    "as": "diaryEntries"
-                }
-            },
-            {
-                "$unwind": {
-                    "path": "$diaryEntries",
-                    "preserveNullAndEmptyArrays": True
-                }
-            },
-            {
-                "$group": {
-                    "_id": { "user_id": "$_id", "username": "$username" },
-                    "anxiety_count": {
-                        "$sum": {
-                            "$cond": [{ "$eq": ["$diaryEntries.predicted_class_number", 0] }, 1, 0]
-                        }
-                    },
-                    "suicide_count": {
-                        "$sum": {
-                            "$cond": [{ "$eq": ["$diaryEntries.predicted_class_number", 1] }, 1, 0]
-                        }
-                    },
-                    "bipolar_count": {
-                        "$sum": {
-                            "$cond": [{ "$eq": ["$diaryEntries.predicted_class_number", 2] }, 1, 0]
-                        }
-                    },
-                    "depression_count": {
-                        "$sum": {
-                            "$cond": [{ "$eq": ["$diaryEntries.predicted_class_number", 3] }, 1, 0]
-                        }
-                    },
-                    "other_count": {
-                        "$sum": {
-                            "$cond": [{ "$eq": ["$diaryEntries.predicted_class_number", 4] }, 1, 0]
-                        }
-                    },
-                },
-            },
-            {
-                "$project": {
-                    "user_id": "$_id.user_id",
-                    "username": "$_id.username",
-                    "anxiety_count": 1,
-                    "suicide_count": 1,
-                    "bipolar_count": 1,
-                    "depression_count": 1,
-                    "other_count": 1
-                }
-            },
-            {
-                "$sort": { "suicide_count": -1 }
-            }
+    async def record_prediction(self, user_id: str, previous_class_number=None, class_number=None):
+        """
+        Moves one entry of the user from the previous class to the new one.
+        None stands for an entry that is created (previous) or deleted (new).
+        """
+        if previous_class_number == class_number:
+            return
+        increments = {}
+        if previous_class_number is not None:
+            increments[f"prediction_counts.{PREDICTION_COUNT_FIELDS[previous_class_number]}"] = -1
+        if class_number is not None:
+            increments[f"prediction_counts.{PREDICTION_COUNT_FIELDS[class_number]}"] = 1
+        await self.database["users"].update_one({"_id": user_id}, {"$inc": increments})
+
+    async def add_prediction_counts(self, user_id: str, class_counts: dict):
+        """
+        Adds class_counts, a number of new entries per predicted_class_number, in one update.
+        """
+        increments = {f"prediction_counts.{PREDICTION_COUNT_FIELDS[class_number]}": count for class_number, count in class_counts.items()}
+        if increments:
+            await self.database["users"].update_one({"_id": user_id}, {"$inc": increments})
+
+    async def initialize_prediction_counts(self):
+        """
+        Adds zero counters to users written before they existed, so the admin listing
+        sorts and pages them. Counters that are already there are left alone.
+        """
+        await asyncio.gather(*(
+            self.database["users"].update_many(
+                {f"prediction_counts.{field}": {"$exists": False}},
+                {"$set": {f"prediction_counts.{field}": 0}}
+            )
+            for field in PREDICTION_COUNT_FIELDS
+        ))
+
+    async def _reconcile_user(self, user):
+        counted = await self.database["diary_entries"].aggregate([
+            {"$match": {"author": user["_id"]}},
+            {"$group": {"_id": "$predicted_class_number", "count": {"$sum": 1}}},
         ])
-        return summary
+        counts = empty_prediction_counts()
+        async for group in counted:
+            if group["_id"] in range(len(PREDICTION_COUNT_FIELDS)):
+                counts[PREDICTION_COUNT_FIELDS[group["_id"]]] = group["count"]
+        stored = user.get("prediction_counts")
+        if stored != counts:
+            # Only replaces the counters read before counting: an increment that lands
+            # in between makes this a no-op, and the next run recounts the user
+            await self.database["users"].update_one(
+                {"_id": user["_id"], "prediction_counts": stored},
+                {"$set": {"prediction_counts": counts}}
+            )
+        return any(counts.values())
+
+    async def reconcile_prediction_counts(self, chunk_size=100):
+        """
+        Recounts the counters of every user from their diary entries, repairing any
+        drift from failed counter writes. Returns the number of users with entries.
+        """
+        users_with_entries = 0
+        pending = []
+        async for user in self.database["users"].find({}, {"prediction_counts": 1}):
+            pending.append(self._reconcile_user(user))
+            if len(pending) >= chunk_size:
+                users_with_entries += sum(await asyncio.gather(*pending))
+                pending = []
+        users_with_entries += sum(await asyncio.gather(*pending))
+        return users_with_entries
     
-    def reset_user_pwd(self, id: str, user: UserPwdReset):
+    async def reset_user_pwd(self, id: str, user: UserPwdReset):
         user = {k: v for k, v in user.items() if v is not None}
         if len(user) >= 1:
-            update_result = self.database["users"].update_one(
+            update_result = await self.database["users"].update_one(
                 {"_id": id}, {"$set": user}
             )
             if update_result.modified_count == 0:
                 raise Exception(f"User with ID {id} not found")
 
-        return self.database["users"].find_one({"_id": id})
+        return await self.database["users"].find_one({"_id": id})
     
-    def delete_user(self, id: str):
-        delete_diary = self.database["diary_entries"].delete_many({"author": id})
-        delete_user = self.database["users"].delete_one({"_id": id})
+    async def delete_user(self, id: str):
+        delete_diary = await self.database["diary_entries"].delete_many({"author": id})
+        delete_user = await self.database["users"].delete_one({"_id": id})
         if delete_user.deleted_count != 1:
            raise Exception(f"User with ID {id} not found")
         return delete_user
\ No newline at end of file
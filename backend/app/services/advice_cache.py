@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+from collections import Counter, OrderedDict
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+ADVICE_CACHE_BACKENDS = ("auto", "hnsw", "brute-force")
+
+class BruteForceIndex:
+    """
+    Exact inner-product search over a growable float32 matrix.
+    """
+    def __init__(self, dimensions: int, max_elements: int):
+        self.vectors = np.zeros((min(max_elements, 64), dimensions), dtype=np.float32)
+        self.ids = []
+        self.rows = {}
+
+    def add(self, item_id: int, vector: np.ndarray):
+        if len(self.ids) == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+        self.rows[item_id] = len(self.ids)
+        self.vectors[len(self.ids)] = vector
+        self.ids.append(item_id)
+
+    def remove(self, item_id: int):
+        row = self.rows.pop(item_id)
+        last = len(self.ids) - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+
+    def nearest(self, vector: np.ndarray):
+        if not self.ids:
+            return None
+        scores = self.vectors[:len(self.ids)] @ vector
+        row = int(np.argmax(scores))
+        return self.ids[row], float(scores[row])
+
+class HnswIndex:
+    """
+    Approximate inner-product search with hnswlib. Removed items are marked deleted
+    and their slots reused by later additions.
+    """
+    def __init__(self, dimensions: int, max_elements: int, m: int = 16, ef: int = 64):
+        self.index = hnswlib.Index(space="ip", dim=dimensions)
+        self.index.init_index(max_elements=max_elements, ef_construction=200, M=m, allow_replace_deleted=True)
+        self.index.set_ef(ef)
+        self.count = 0
+
+    def add(self, item_id: int, vector: np.ndarray):
+        self.index.add_items(vector.reshape(1, -1), [item_id], replace_deleted=True)
+        self.count += 1
+
+    def remove(self, item_id: int):
+        self.index.mark_deleted(item_id)
+        self.count -= 1
+
+    def nearest(self, vector: np.ndarray):
+        if self.count == 0:
+            return None
+        labels, distances = self.index.knn_query(vector.reshape(1, -1), k=1)
+        # hnswlib's inner-product distance is 1 - dot product
+        return int(labels[0][0]), 1 - float(distances[0][0])
+
+class SemanticAdviceCache:
+    """
+    Remembers accepted advice with the normalized embedding of the diary content
+    it was generated for, indexed per class. lookup returns the advice of the
+    closest entry of the same class when its cosine similarity reaches the radius
+    of the class. At most max_size entries are kept, evicting the least recently
+    used. Embeddings are only comparable within one embedding space, so a cache
+    saved from another space is not loaded.
+    """
+    def __init__(self, space: str, path=None, radius=0.92, class_radius=None, max_size=10000, backend="auto"):
+        if backend not in ADVICE_CACHE_BACKENDS:
+            raise ValueError(f"Unsupported advice cache backend: {backend}. Expected one of {ADVICE_CACHE_BACKENDS}")
+        if backend == "hnsw" and hnswlib is None:
+            raise ValueError("hnswlib is not installed, run: pip install hnswlib")
+        self.backend = "hnsw" if backend == "hnsw" or (backend == "auto" and hnswlib is not None) else "brute-force"
+        self.space = space
+        self.path = path
+        self.radius = radius
+        self.class_radius = class_radius or {}
+        self.max_size = max_size
+
+        self._indexes = {}
+        # id -> entry, least recently used first
+        self._entries = OrderedDict()
+        self._next_id = 0
+
+        self.lookups = Counter()
+        self.hits = Counter()
+        self.eviction_count = 0
+
+    def radius_for(self, label: str) -> float:
+        return self.class_radius.get(label, self.radius)
+
+    def _index(self, label, dimensions):
+        if label not in self._indexes:
+            index_class = HnswIndex if self.backend == "hnsw" else BruteForceIndex
+            self._indexes[label] = index_class(dimensions, self.max_size)
+        return self._indexes[label]
+
+    def lookup(self, label: str, embedding: np.ndarray):
+        self.lookups[label] += 1
+        index = self._indexes.get(label)
+        nearest = index.nearest(embedding) if index is not None else None
+        if nearest is None or nearest[1] < self.radius_for(label):
+            return None
+        item_id, _ = nearest
+        self.hits[label] += 1
+        self._entries.move_to_end(item_id)
+        self._entries[item_id]["hits"] += 1
+        return self._entries[item_id]["advice"]
+
+    def add(self, label: str, embedding: np.ndarray, advice: str, hits: int = 0):
+        if self.max_size <= 0:
+            return
+        while len(self._entries) >= self.max_size:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            self._indexes[evicted["class"]].remove(evicted_id)
+            self.eviction_count += 1
+        item_id = self._next_id
+        self._next_id += 1
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self._index(label, embedding.shape[0]).add(item_id, embedding)
+        self._entries[item_id] = {"class": label, "advice": advice, "embedding": embedding, "hits": hits}
+
+    def snapshot(self):
+        """
+        Copies the entries, in eviction order, for write. Taken on the event loop,
+        so write can run in a thread while the cache keeps changing.
+        """
+        entries = list(self._entries.values())
+        metadata = {
+            "space": self.space,
+            "entries": [{"class": entry["class"], "advice": entry["advice"], "hits": entry["hits"]} for entry in entries],
+        }
+        embeddings = np.stack([entry["embedding"] for entry in entries]) if entries else np.zeros((0, 0), np.float32)
+        return metadata, embeddings
+
+    def write(self, snapshot):
+        if not self.path:
+            return
+        metadata, embeddings = snapshot
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(file, embeddings=embeddings, metadata=np.array(json.dumps(metadata)))
+        os.replace(temporary_path, self.path)
+
+    def save(self):
+        """
+        Writes the entries to path. The indexes are rebuilt on load.
+        """
+        self.write(self.snapshot())
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with np.load(self.path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            embeddings = data["embeddings"]
+        if metadata["space"] != self.space:
+            logger.warning(f"Ignoring advice cache of embedding space {metadata['space']}, expected {self.space}")
+            return 0
+        for entry, embedding in zip(metadata["entries"][-self.max_size:], embeddings[-self.max_size:]):
+            self.add(entry["class"], embedding, entry["advice"], entry["hits"])
+        return len(self._entries)
+
+    def stats(self):
+        lookups = sum(self.lookups.values())
+        hits = sum(self.hits.values())
+        return {
+            "backend": self.backend,
+            "space": self.space,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "eviction_count": self.eviction_count,
+            "classes": {
+                label: {
+                    "radius": self.radius_for(label),
+                    "lookups": self.lookups[label],
+                    "hits": self.hits[label],
+                    "hit_rate": self.hits[label] / self.lookups[label] if self.lookups[label] else 0.0,
+                }
+                for label in sorted(self.lookups)
+            },
+        }
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class AdviceJobQueue:
+    """
+    Runs advice generation jobs in the background with at most concurrency jobs
+    in flight. A failing job is retried max_retries times with exponential backoff,
+    then handed to on_dead_letter and kept in the dead-letter list. Jobs that do
+    not fit in the queue go to the dead-letter list right away.
+    """
+    def __init__(self, handler, on_dead_letter=None, concurrency=4, max_retries=3, retry_delay_seconds=2.0,
+                 max_queue_size=1000, max_dead_letters=1000):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.handler = handler
+        self.on_dead_letter = on_dead_letter
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_queue_size = max_queue_size
+        self.dead_letters = deque(maxlen=max_dead_letters)
+
+        self._queue = None
+        self._workers = []
+        self._retries = set()
+        self._loop = None
+
+        self.submitted_count = 0
+        self.completed_count = 0
+        self.retried_count = 0
+        self.dead_letter_count = 0
+        self.in_progress = 0
+
+    def _ensure_workers(self):
+        # Workers are bound to the running event loop, like the predict batcher's
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._workers = []
+        # Replace stopped or crashed workers only, keeping the jobs already queued
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        self._workers += [loop.create_task(self._run()) for _ in range(self.concurrency - len(self._workers))]
+
+    async def submit(self, job: dict):
+        self._ensure_workers()
+        job.setdefault("attempts", 0)
+        self.submitted_count += 1
+        await self._put(job)
+
+    async def _put(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await self._dead_letter(job, "Advice queue is full")
+
+    async def _retry_later(self, job, delay):
+        await asyncio.sleep(delay)
+        await self._put(job)
+
+    async def _dead_letter(self, job, error: str):
+        self.dead_letter_count += 1
+        self.dead_letters.append({"job": job, "error": error, "failed_at": datetime.now().isoformat()})
+        if self.on_dead_letter is not None:
+            try:
+                await self.on_dead_letter(job, error)
+            except Exception as e:
+                logger.error(f"Dead-letter handler failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            self.in_progress += 1
+            try:
+                await self.handler(job)
+                self.completed_count += 1
+            except Exception as e:
+                job["attempts"] += 1
+                if job["attempts"] <= self.max_retries:
+                    self.retried_count += 1
+                    delay = self.retry_delay_seconds * 2 ** (job["attempts"] - 1)
+                    logger.warning(f"Advice job failed, retrying in {delay}s: {str(e)}")
+                    task = self._loop.create_task(self._retry_later(job, delay))
+                    self._retries.add(task)
+                    task.add_done_callback(self._retries.discard)
+                else:
+                    logger.error(f"Advice job failed after {job['attempts']} attempts: {str(e)}")
+                    await self._dead_letter(job, str(e))
+            finally:
+                self.in_progress -= 1
+                self._queue.task_done()
+
+    async def join(self):
+        """
+        Waits until every submitted job, including scheduled retries, has finished.
+        """
+        if self._queue is None:
+            return
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    async def retry_dead_letters(self):
+        letters = list(self.dead_letters)
+        self.dead_letters.clear()
+        for letter in letters:
+            letter["job"]["attempts"] = 0
+            await self.submit(letter["job"])
+        return len(letters)
+
+    async def stop(self):
+        for task in self._workers + list(self._retries):
+            task.cancel()
+        for task in self._workers + list(self._retries):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._retries = set()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "concurrency": self.concurrency,
+            "in_progress": self.in_progress,
+            "scheduled_retries": len(self._retries),
+            "submitted_count": self.submitted_count,
+            "completed_count": self.completed_count,
+            "retried_count": self.retried_count,
+            "dead_letter_count": self.dead_letter_count,
+        }
@@ -6,6 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from models.user import User
+from utils.concurrency import run_blocking
 
 class AuthService:
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -28,11 +29,12 @@ class AuthService:
     def get_password_hash(self, password):
         return self.pwd_context.hash(password)
 
-    def authenticate_user(self, username: str, password: str):
-        user = self.user_service.find_user_by_username(username)
+    async def authenticate_user(self, username: str, password: str):
+        user = await self.user_service.find_user_by_username(username)
         if not user:
             return False
-        if not self.verify_password(password, user["hashed_password"]):
+        # bcrypt is deliberately slow, keep it off the event loop
+        if not await run_blocking(self.verify_password, password, user["hashed_password"]):
             return False
         return user
 
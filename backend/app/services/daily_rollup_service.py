@@ -0,0 +1,105 @@
+from datetime import datetime
+from pymongo import DESCENDING, ReturnDocument
+
+def entry_day(entry_date):
+    if isinstance(entry_date, str):
+        entry_date = datetime.fromisoformat(entry_date)
+    return entry_date.date().isoformat()
+
+class DailyRollupService:
+    """
+    Keeps one document per (author, day) with the number of entries written that day
+    and the number of entries per predicted class, so streaks and mood summaries
+    read one small document per day instead of every diary entry.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+
+    def _id(self, author, day):
+        return f"{author}:{day}"
+
+    async def _increment(self, author, day, entries=0, classes=None):
+        increments = {f"class_counts.{name}": count for name, count in (classes or {}).items()}
+        if entries:
+            increments["entry_count"] = entries
+        if not increments:
+            return None
+        return await self.collection.find_one_and_update(
+            {"_id": self._id(author, day)},
+            {"$inc": increments, "$setOnInsert": {"author": author, "date": day}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def record_entry(self, entry):
+        """
+        Returns the number of entries of the author on that day, including this one.
+        """
+        classes = {entry["prediction_class"]: 1} if entry.get("prediction_class") else None
+        rollup = await self._increment(entry["author"], entry_day(entry["entry_date"]), 1, classes)
+        return rollup["entry_count"]
+
+    async def record_days(self, author, days):
+        """
+        Adds the entries of an import, given as {day: {"entry_count": n, "class_counts": {class: n}}}.
+        Returns the days that had no entries before.
+        """
+        new_days = []
+        for day, counts in days.items():
+            rollup = await self._increment(author, day, counts["entry_count"], counts["class_counts"])
+            if rollup["entry_count"] == counts["entry_count"]:
+                new_days.append(day)
+        return new_days
+
+    async def record_prediction(self, entry, prediction_class):
+        previous = entry.get("prediction_class")
+        if previous == prediction_class:
+            return
+        classes = {}
+        if previous:
+            classes[previous] = -1
+        if prediction_class:
+            classes[prediction_class] = 1
+        await self._increment(entry["author"], entry_day(entry["entry_date"]), classes=classes)
+
+    async def remove_entry(self, entry):
+        """
+        Returns the number of entries of the author left on that day.
+        """
+        classes = {entry["prediction_class"]: -1} if entry.get("prediction_class") else None
+        day = entry_day(entry["entry_date"])
+        rollup = await self._increment(entry["author"], day, -1, classes)
+        await self.collection.delete_one({"_id": self._id(entry["author"], day), "entry_count": {"$lte": 0}})
+        return max(rollup["entry_count"], 0)
+
+    async def remove_author(self, author):
+        await self.collection.delete_many({"author": author})
+
+    async def list_days(self, author):
+        return await self.collection.find({"author": author}, sort=[("date", DESCENDING)]).to_list(None)
+
+    async def rebuild(self, diary_entries, author=None):
+        """
+        Recomputes the rollups from the diary entries, for all authors or one author.
+        Returns the number of day documents written.
+        """
+        query = {} if author is None else {"author": author}
+        days = {}
+        async for entry in diary_entries.find(query, {"author": 1, "entry_date": 1, "prediction_class": 1}):
+            day = entry_day(entry["entry_date"])
+            rollup = days.setdefault(self._id(entry["author"], day), {
+                "_id": self._id(entry["author"], day),
+                "author": entry["author"],
+                "date": day,
+                "entry_count": 0,
+                "class_counts": {},
+            })
+            rollup["entry_count"] += 1
+            if entry.get("prediction_class"):
+                counts = rollup["class_counts"]
+                counts[entry["prediction_class"]] = counts.get(entry["prediction_class"], 0) + 1
+
+        await self.collection.delete_many(query)
+        if days:
+            await self.collection.insert_many(list(days.values()))
+        return len(days)
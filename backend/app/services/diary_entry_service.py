@@ -1,45 +1,105 @@
+from pymongo import DESCENDING
 from models.diary_entry import DiaryEntry, DiaryEntryUpdate
+from utils.mongo_utils import encode_cursor, decode_cursor
+
+LISTING_SORT = [("created", DESCENDING), ("_id", DESCENDING)]
+# Fields every listed entry keeps, since the cursor of the next page is built from them
+CURSOR_FIELDS = ("_id", "created")
 
 class DiaryEntryService:
-    def __init__(self, collection):
+    def __init__(self, collection, max_page_size=100):
         self.collection = collection
+        self.max_page_size = max_page_size
 
-    def create_diary_entry(self, diaryEntry: DiaryEntry):
-        new_diaryEntry = self.collection.insert_one(diaryEntry)
-        return self.collection.find_one(
+    async def create_diary_entry(self, diaryEntry: DiaryEntry):
+        new_diaryEntry = await self.collection.insert_one(diaryEntry)
+        return await self.collection.find_one(
             {"_id": new_diaryEntry.inserted_id}
         )
     
-    def list_diary_entries(self, current_user):
+    async def list_diary_entries(self, current_user, fields=None):
+        limit = 100 if current_user["role"] == "admin" else 0
+        return await self.collection.find(
+            self._listing_filter(current_user), self._projection(fields), sort=LISTING_SORT, limit=limit
+        ).to_list(None)
+
+    async def list_diary_entries_page(self, current_user, page_size=20, cursor=None, fields=None):
+        """
+        Returns one page of entries, newest first, and the cursor of the next page
+        (None on the last page). Pages are read by keyset on (created, _id), so the
+        cost of a page does not grow with the number of entries before it.
+        """
+        if page_size < 1 or page_size > self.max_page_size:
+            raise ValueError(f"page_size must be between 1 and {self.max_page_size}")
+        query = self._listing_filter(current_user)
+        if cursor is not None:
+            created, last_id = decode_cursor(cursor, 2)
+            query["$or"] = [
+                {"created": {"$lt": created}},
+                {"created": created, "_id": {"$lt": last_id}},
+            ]
+
+        # Read one extra entry to know whether there is a next page
+        entries = await self.collection.find(
+            query, self._projection(fields), sort=LISTING_SORT, limit=page_size + 1
+        ).to_list(None)
+        next_cursor = None
+        if len(entries) > page_size:
+            entries = entries[:page_size]
+            next_cursor = encode_cursor([entries[-1]["created"], entries[-1]["_id"]])
+        return entries, next_cursor
+
+    def _listing_filter(self, current_user):
         if current_user["role"] == "admin":
-            diaryEntries = list(self.collection.find(limit=100))
-        else:
-            diaryEntries = list(self.collection.find({"author": current_user["_id"]}))
-        sortedDiaryEntries = sorted(diaryEntries, key=lambda x: x['created'], reverse=True)
-        return sortedDiaryEntries
+            return {}
+        return {"author": current_user["_id"]}
+
+    def _projection(self, fields):
+        if not fields:
+            return None
+        unknown = [field for field in fields if field not in DiaryEntry.model_fields and field != "_id"]
+        if unknown:
+            raise ValueError(f"Unknown diary entry fields: {', '.join(unknown)}")
+        projection = {field: 1 for field in fields if field != "id"}
+        projection.update({field: 1 for field in CURSOR_FIELDS})
+        return projection
 
-    def find_diary_entry(self, id: str):
-        return self.collection.find_one({"_id": id})
+    async def find_diary_entry(self, id: str):
+        return await self.collection.find_one({"_id": id})
 
-    def update_diary_entry(self, id: str, diaryEntry: DiaryEntryUpdate):
+    async def update_diary_entry(self, id: str, diaryEntry: DiaryEntryUpdate):
         diaryEntry = {k: v for k, v in diaryEntry.items() if v is not None}
         if len(diaryEntry) >= 1:
-            update_result = self.collection.update_one(
+            update_result = await self.collection.update_one(
                 {"_id": id}, {"$set": diaryEntry}
             )
             if update_result.modified_count == 0:
                 raise Exception(f"Diary Entry with ID {id} not found")
 
-        return self.collection.find_one({"_id": id})
+        return await self.collection.find_one({"_id": id})
+
+    async def set_advice(self, id: str, digest: str, advice: str, advice_status: str):
+        # Only written if the content the advice was generated for is still current
+        update_result = await self.collection.update_one(
+            {"_id": id, "content_digest": digest},
+            {"$set": {"advice": advice, "advice_status": advice_status}}
+        )
+        return update_result.matched_count == 1
+
+    def pending_advice(self):
+        return self.collection.find(
+            {"advice_status": "pending"},
+            {"content": 1, "content_digest": 1, "prediction_class": 1}
+        )
 
-    def delete_diary_entry(self, id: str):
-        delete_result = self.collection.delete_one({"_id": id})
+    async def delete_diary_entry(self, id: str):
+        delete_result = await self.collection.delete_one({"_id": id})
         if delete_result.deleted_count != 1:
            raise Exception(f"Diary Entry with ID {id} not found")
         return delete_result
     
-    def get_prediction_summary(self):
-        summary = self.collection.aggregate([
+    async def get_prediction_summary(self):
+        summary = await self.collection.aggregate([
             {
                 "$group": {
                     "_id": "$author",
@@ -85,4 +145,4 @@ class DiaryEntryService:
                 "$sort": { "suicide_count": -1 }
             },
         ])
-        return summary
+        return await summary.to_list(None)
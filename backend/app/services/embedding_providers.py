@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import logging
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from services.openai_service import EMBEDDING_MODEL
+from services.resource_registry import ResourceRegistry
+from utils.concurrency import run_blocking, run_inference
+from utils.similarity import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PROVIDERS = ("openai", "sentence-transformers")
+SIMILARITY_THRESHOLD = 0.6
+
+class EmbeddingProvider:
+    def __init__(self):
+        self._references = {}
+
+    async def embed(self, texts: list) -> np.ndarray:
+        raise NotImplementedError
+
+    async def suggestion_embeddings(self, related_data: dict) -> np.ndarray:
+        """
+        Embeds the suggestions of a class, once per set of suggestions, as a
+        normalized float32 matrix.
+        """
+        suggestions = related_data.get("suggestions") or []
+        if isinstance(suggestions, str):
+            suggestions = [suggestions]
+        key = hashlib.sha256(json.dumps(suggestions).encode("utf-8")).hexdigest()
+        if key not in self._references:
+            self._references[key] = normalize_rows(await self.embed(suggestions))
+        return self._references[key]
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeds with the OpenAI embeddings API. The reference embedding of a class is
+    the $vector stored with its suggestions in AstraDB, which is in the same space.
+    Documents without a $vector (the local fallback file) have their suggestions
+    embedded instead. Requests go through the OpenAI client of resources, which
+    is only closed here when the provider created it.
+    """
+    def __init__(self, model=EMBEDDING_MODEL, similarity_threshold=SIMILARITY_THRESHOLD, resources=None):
+        super().__init__()
+        self.model = model
+        self.name = f"openai:{model}"
+        self.similarity_threshold = similarity_threshold
+        self._owns_resources = resources is None
+        self.resources = resources or ResourceRegistry()
+
+    async def load(self):
+        self.resources.openai_service()
+
+    async def embed(self, texts: list) -> np.ndarray:
+        return await self.resources.openai_service().create_embeddings(texts, model=self.model)
+
+    async def reference_embeddings(self, related_data: dict) -> np.ndarray:
+        vectors = related_data.get("$vector")
+        if vectors is None:
+            return await self.suggestion_embeddings(related_data)
+        # The suggestion store already keeps $vector as a normalized float32 matrix
+        if isinstance(vectors, np.ndarray) and vectors.dtype == np.float32 and vectors.ndim == 2:
+            return vectors
+        return normalize_rows(vectors)
+
+    async def close(self):
+        if self._owns_resources:
+            await self.resources.close()
+
+class SentenceTransformerEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeds locally with a sentence-transformers model that stays loaded between
+    calls. Texts are encoded in batches of batch_size on the inference executor.
+    The $vector in AstraDB belongs to another model, so the suggestions are
+    embedded with this model instead and kept per set of suggestions.
+    """
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=32, device=None, similarity_threshold=SIMILARITY_THRESHOLD):
+        super().__init__()
+        self.model_name = model_name
+        self.name = f"sentence-transformers:{model_name}"
+        self.batch_size = batch_size
+        self.device = device
+        self.similarity_threshold = similarity_threshold
+        self.model = None
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        async with self._load_lock:
+            if self.model is None:
+                self.model = await run_blocking(SentenceTransformer, self.model_name, device=self.device)
+                logger.info(f"Loaded embedding model {self.model_name}")
+
+    def _encode(self, texts):
+        return self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)
+
+    async def embed(self, texts: list) -> np.ndarray:
+        await self.load()
+        return np.asarray(await run_inference(self._encode, texts))
+
+    async def reference_embeddings(self, related_data: dict) -> np.ndarray:
+        return await self.suggestion_embeddings(related_data)
+
+    async def close(self):
+        pass
+
+def create_embedding_provider(provider: str = "openai", model_name: str | None = None, batch_size: int = 32,
+                              similarity_threshold: float = SIMILARITY_THRESHOLD, resources=None):
+    if provider == "openai":
+        return OpenAIEmbeddingProvider(model_name or EMBEDDING_MODEL, similarity_threshold=similarity_threshold,
+                                       resources=resources)
+    if provider == "sentence-transformers":
+        return SentenceTransformerEmbeddingProvider(model_name or "all-MiniLM-L6-v2", batch_size=batch_size,
+                                                    similarity_threshold=similarity_threshold)
+    raise ValueError(f"Unsupported embedding provider: {provider}. Expected one of {EMBEDDING_PROVIDERS}")
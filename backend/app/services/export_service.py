@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from models.diary_entry import DiaryEntry
+from models.user import PREDICTION_COUNT_FIELDS
+from services.admin_service import USER_SUMMARY_PROJECTION, user_summary
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+DIARY_ENTRY_FIELDS = ["_id" if field == "id" else field for field in DiaryEntry.model_fields]
+USER_SUMMARY_FIELDS = ["user_id", "username"] + list(PREDICTION_COUNT_FIELDS)
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return "" if value is None else value
+
+class ExportService:
+    """
+    Streams collections as NDJSON or CSV. Documents are read from the cursor in
+    batches of batch_size and written out as one chunk per batch, so memory use
+    does not depend on the size of the export.
+    """
+    def __init__(self, database, batch_size=500):
+        self.database = database
+        self.batch_size = batch_size
+
+    def diary_entry_filter(self, author=None, start_date=None, end_date=None, predicted_class_number=None):
+        query = {}
+        if author is not None:
+            query["author"] = author
+        if start_date is not None or end_date is not None:
+            # entry_date is stored as an ISO string, so day bounds compare as strings
+            query["entry_date"] = {}
+            if start_date is not None:
+                query["entry_date"]["$gte"] = start_date.isoformat()
+            if end_date is not None:
+                query["entry_date"]["$lt"] = (end_date + timedelta(days=1)).isoformat()
+        if predicted_class_number is not None:
+            query["predicted_class_number"] = predicted_class_number
+        return query
+
+    async def _batches(self, cursor):
+        batch = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write(self, rows, fields, format):
+        # Checked before streaming starts, while the error can still become a 400
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}. Expected one of {tuple(EXPORT_FORMATS)}")
+        return self._chunks(rows, fields, format)
+
+    async def _chunks(self, rows, fields, format):
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            yield buffer.getvalue()
+        async for batch in rows:
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([[_csv_value(row.get(field)) for field in fields] for row in batch])
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps({field: row.get(field) for field in fields}, default=str) + "\n" for row in batch)
+
+    def export_diary_entries(self, query, format="ndjson"):
+        projection = {field: 1 for field in DIARY_ENTRY_FIELDS}
+        cursor = self.database["diary_entries"].find(query, projection, batch_size=self.batch_size)
+        return self._write(self._batches(cursor), DIARY_ENTRY_FIELDS, format)
+
+    def export_user_summaries(self, format="ndjson"):
+        cursor = self.database["users"].find({"role": "user"}, USER_SUMMARY_PROJECTION, batch_size=self.batch_size)
+        return self._write(self._summaries(cursor), USER_SUMMARY_FIELDS, format)
+
+    async def _summaries(self, cursor):
+        async for batch in self._batches(cursor):
+            yield [user_summary(user) for user in batch]
@@ -0,0 +1,112 @@
+import logging
+from collections import Counter
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import BulkWriteError
+from services.daily_rollup_service import entry_day
+from models.diary_entry import DiaryEntry
+from utils.concurrency import run_inference
+from utils.content_digest import content_digest
+
+logger = logging.getLogger(__name__)
+
+# Fields set by the server; imported values are ignored
+SERVER_FIELDS = ("_id", "id", "author", "predicted_class_number", "prediction_class", "confidence",
+                 "confidence_scores", "advice", "content_digest", "sentiment")
+
+class DiaryImportService:
+    """
+    Imports diary entries in chunks: each chunk is validated, classified in
+    batches of predict_batch_size through PredictService, scored with
+    sentiment_service when given and written with one unordered insert_many.
+    Invalid rows are reported and skipped instead of failing the import.
+    """
+    def __init__(self, collection, predict_service, chunk_size=500, predict_batch_size=64, max_rows=10000,
+                 sentiment_service=None):
+        self.collection = collection
+        self.predict_service = predict_service
+        self.sentiment_service = sentiment_service
+        self.chunk_size = chunk_size
+        self.predict_batch_size = predict_batch_size
+        self.max_rows = max_rows
+
+    def _entry(self, value, author):
+        if not isinstance(value, dict):
+            raise ValueError("Row is not a JSON object")
+        fields = {key: field for key, field in value.items() if key not in SERVER_FIELDS}
+        entry = jsonable_encoder(DiaryEntry(**fields, author=author))
+        entry["content_digest"] = content_digest(entry["content"])
+        return entry
+
+    async def _classify(self, entries):
+        for start in range(0, len(entries), self.predict_batch_size):
+            batch = entries[start:start + self.predict_batch_size]
+            predictions = await run_inference(self.predict_service.predict_batch, [entry["content"] for entry in batch])
+            for entry, (predicted_class_number, predicted_class, confidence, confidence_scores) in zip(batch, predictions):
+                entry["predicted_class_number"] = predicted_class_number
+                entry["prediction_class"] = predicted_class
+                entry["confidence"] = confidence
+                entry["confidence_scores"] = confidence_scores
+        if self.sentiment_service is not None:
+            scores = await self.sentiment_service.score_batch([entry["content"] for entry in entries])
+            for entry, entry_scores in zip(entries, scores):
+                entry["sentiment"] = entry_scores
+
+    async def _insert(self, rows, entries, report):
+        try:
+            await self.collection.insert_many(entries, ordered=False)
+            failed = {}
+        except BulkWriteError as e:
+            failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        for index, (row, entry) in enumerate(zip(rows, entries)):
+            if index in failed:
+                report["errors"].append({"row": row, "error": failed[index]})
+            else:
+                report["inserted"] += 1
+                report["class_counts"][entry["predicted_class_number"]] += 1
+                day = report["days"].setdefault(entry_day(entry["entry_date"]), {"entry_count": 0, "class_counts": Counter()})
+                day["entry_count"] += 1
+                day["class_counts"][entry["prediction_class"]] += 1
+
+    async def _flush(self, rows, entries, report):
+        try:
+            await self._classify(entries)
+        except Exception as e:
+            logger.error(f"Classification of imported rows failed: {str(e)}")
+            report["errors"] += [{"row": row, "error": f"Classification failed: {str(e)}"} for row in rows]
+            return
+        await self._insert(rows, entries, report)
+
+    async def import_entries(self, values, author: str):
+        """
+        values yields (row, value, error) as produced by utils.json_stream.
+        Returns the number of inserted entries, the inserted entries per
+        predicted_class_number, the errors of the rejected rows and, under days,
+        the inserted entries per day and per class for the daily rollups.
+        """
+        report = {"inserted": 0, "class_counts": Counter(), "errors": [], "days": {}}
+        rows = []
+        entries = []
+        async for row, value, error in values:
+            if row >= self.max_rows:
+                report["errors"].append({"row": row, "error": f"Import is limited to {self.max_rows} rows"})
+                break
+            if error is not None:
+                report["errors"].append({"row": row, "error": error})
+                continue
+            try:
+                entries.append(self._entry(value, author))
+                rows.append(row)
+            except ValueError as e:
+                report["errors"].append({"row": row, "error": str(e)})
+                continue
+            if len(entries) >= self.chunk_size:
+                await self._flush(rows, entries, report)
+                rows, entries = [], []
+        if entries:
+            await self._flush(rows, entries, report)
+        report["class_counts"] = dict(report["class_counts"])
+        report["days"] = {
+            day: {"entry_count": counts["entry_count"], "class_counts": dict(counts["class_counts"])}
+            for day, counts in report["days"].items()
+        }
+        return report
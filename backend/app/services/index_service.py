@@ -0,0 +1,162 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from services.diary_entry_service import LISTING_SORT
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_INDEXES = {
+    "diary_entries": [
+        # Per-user listing sorted by (created, _id); its author prefix also serves
+        # find({"author": ...}), delete_many and the $lookup in AdminService.list_users
+        IndexModel([("author", ASCENDING)] + LISTING_SORT, name="author_created_id"),
+        IndexModel([("author", ASCENDING), ("entry_date", DESCENDING)], name="author_entry_date"),
+        # Admin listing over all users
+        IndexModel(LISTING_SORT, name="created_id"),
+        IndexModel([("predicted_class_number", ASCENDING)], name="predicted_class_number"),
+        # Entries waiting for advice, re-queued at startup
+        IndexModel([("advice_status", ASCENDING)], name="advice_pending", partialFilterExpression={"advice_status": "pending"}),
+    ],
+    "daily_rollups": [
+        IndexModel([("author", ASCENDING), ("date", DESCENDING)], name="author_date"),
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username", unique=True),
+        # Admin dashboard pages, most suicide watch entries first
+        IndexModel([("role", ASCENDING), ("prediction_counts.suicide_count", DESCENDING), ("_id", ASCENDING)], name="role_suicide_count"),
+    ],
+}
+
+# Queries served on every request, checked against the query planner
+HOT_QUERIES = [
+    {"collection": "diary_entries", "filter": {"author": ""}, "sort": dict(LISTING_SORT)},
+    {"collection": "diary_entries", "filter": {"author": ""}, "sort": {"entry_date": DESCENDING}},
+    {"collection": "diary_entries", "filter": {"predicted_class_number": 1}},
+    {"collection": "daily_rollups", "filter": {"author": ""}, "sort": {"date": DESCENDING}},
+    {"collection": "users", "filter": {"username": ""}},
+    {"collection": "users", "filter": {"role": "user"}, "sort": {"prediction_counts.suicide_count": DESCENDING, "_id": ASCENDING}},
+]
+
+# Plan stages that read the collection through an index
+INDEX_STAGES = ("IXSCAN", "EXPRESS_IXSCAN", "IDHACK", "EXPRESS_IDHACK", "COUNT_SCAN", "DISTINCT_SCAN")
+
+def _key(index):
+    return tuple((field, int(direction)) for field, direction in index["key"].items())
+
+def _unique(index):
+    return bool(index.get("unique", False))
+
+def plan_stages(plan):
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []) + [plan.get("queryPlan")]:
+        if child:
+            stages += plan_stages(child)
+    return stages
+
+def winning_plan_stages(explain):
+    planner = explain["queryPlanner"]
+    return plan_stages(planner["winningPlan"])
+
+def uses_index(explain):
+    stages = winning_plan_stages(explain)
+    return "COLLSCAN" not in stages and any(stage in INDEX_STAGES for stage in stages)
+
+class IndexService:
+    """
+    Declares the indexes each collection needs and reconciles them at startup.
+    Existing indexes are matched by key pattern, so indexes created by hand under
+    another name are reused instead of duplicated.
+    """
+    def __init__(self, database, required_indexes=REQUIRED_INDEXES, hot_queries=HOT_QUERIES):
+        self.database = database
+        self.required_indexes = required_indexes
+        self.hot_queries = hot_queries
+
+    async def _indexes(self, collection_name: str):
+        return await (await self.database[collection_name].list_indexes()).to_list(None)
+
+    async def missing_indexes(self):
+        missing = {}
+        for collection_name, indexes in self.required_indexes.items():
+            existing = {_key(index): index for index in await self._indexes(collection_name)}
+            for index in indexes:
+                document = index.document
+                found = existing.get(_key(document))
+                if found is None:
+                    missing.setdefault(collection_name, []).append(index)
+                elif _unique(found) != _unique(document):
+                    logger.warning(f"Index {found['name']} on {collection_name} does not match the declared options of {document['name']}")
+        return missing
+
+    async def undeclared_indexes(self):
+        undeclared = {}
+        for collection_name, indexes in self.required_indexes.items():
+            declared = {_key(index.document) for index in indexes}
+            names = [
+                index["name"] for index in await self._indexes(collection_name)
+                if index["name"] != "_id_" and _key(index) not in declared
+            ]
+            if names:
+                undeclared[collection_name] = names
+        return undeclared
+
+    async def unused_indexes(self):
+        """
+        Returns the indexes without any recorded use since the server started,
+        or None when the server does not report index usage.
+        """
+        unused = {}
+        for collection_name in self.required_indexes:
+            try:
+                stats = await (await self.database[collection_name].aggregate([{"$indexStats": {}}])).to_list(None)
+            except (OperationFailure, NotImplementedError) as e:
+                logger.warning(f"Index usage is not available: {str(e)}")
+                return None
+            names = [stat["name"] for stat in stats if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0]
+            if names:
+                unused[collection_name] = sorted(names)
+        return unused
+
+    async def reconcile(self):
+        created = {}
+        failed = {}
+        for collection_name, indexes in (await self.missing_indexes()).items():
+            for index in indexes:
+                name = index.document["name"]
+                try:
+                    await self.database[collection_name].create_indexes([index])
+                    created.setdefault(collection_name, []).append(name)
+                except OperationFailure as e:
+                    # e.g. duplicate usernames already stored, which blocks the unique index
+                    logger.error(f"Could not create index {name} on {collection_name}: {str(e)}")
+                    failed.setdefault(collection_name, []).append(name)
+        if created:
+            logger.info(f"Created indexes: {created}")
+        return {"created": created, "failed": failed}
+
+    async def explain(self, collection_name, filter, sort=None):
+        command = {"find": collection_name, "filter": filter}
+        if sort:
+            command["sort"] = sort
+        return await self.database.command({"explain": command, "verbosity": "queryPlanner"})
+
+    async def check_hot_queries(self):
+        results = []
+        for query in self.hot_queries:
+            explain = await self.explain(query["collection"], query["filter"], query.get("sort"))
+            results.append({
+                "collection": query["collection"],
+                "filter": query["filter"],
+                "sort": query.get("sort"),
+                "stages": winning_plan_stages(explain),
+                "uses_index": uses_index(explain),
+            })
+        return results
+
+    async def report(self):
+        missing = await self.missing_indexes()
+        return {
+            "missing": {name: [index.document["name"] for index in indexes] for name, indexes in missing.items()},
+            "undeclared": await self.undeclared_indexes(),
+            "unused": await self.unused_indexes(),
+        }
@@ -1,4 +1,5 @@
 import openai
+import numpy as np
 from dotenv import load_dotenv
 import os
 import logging
@@ -6,13 +7,18 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CHAT_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
 class OpenAIService:
-    def __init__(self):
+    def __init__(self, http_client=None):
         load_dotenv()
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("No OpenAI API key provided")
         openai.api_key = self.api_key
+        # Both clients also honour OPENAI_BASE_URL, e.g. to point at scripts/fake_llm_server.py
+        self.async_client = openai.AsyncOpenAI(api_key=self.api_key, http_client=http_client)
 
     def generate_response(self, system_input: str, max_completion_tokens: int = 100, temperature: float = 0.7) -> str:
         try:
@@ -20,7 +26,7 @@ class OpenAIService:
                 {"role": "system", "content": f"{system_input}"},
             ]
             response = openai.chat.completions.create(
-                model="gpt-4o-mini",
+                model=CHAT_MODEL,
                 messages=messages,
                 max_completion_tokens=max_completion_tokens,
                 temperature=temperature
@@ -30,3 +36,42 @@ class OpenAIService:
         except Exception as e:
             return f"Error: {str(e)}"
 
+    async def generate_response_async(self, system_input: str, max_completion_tokens: int = 100, temperature: float = 0.7) -> str:
+        """
+        Same request as generate_response on the async client. Errors are raised
+        instead of being returned as text, so a failed candidate is never scored.
+        """
+        response = await self.async_client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "system", "content": f"{system_input}"}],
+            max_completion_tokens=max_completion_tokens,
+            temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    async def stream_response_async(self, system_input: str, max_completion_tokens: int = 100, temperature: float = 0.7):
+        """
+        Same request as generate_response_async, streamed: yields the text of each
+        chunk as the model produces it.
+        """
+        stream = await self.async_client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "system", "content": f"{system_input}"}],
+            max_completion_tokens=max_completion_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def create_embeddings(self, texts: list, model: str = EMBEDDING_MODEL) -> np.ndarray:
+        """
+        Embeds all texts with one request. Returns one row per text, in input order.
+        """
+        response = await self.async_client.embeddings.create(input=list(texts), model=model)
+        return np.array([item.embedding for item in sorted(response.data, key=lambda item: item.index)])
+
+    async def close(self):
+        await self.async_client.close()
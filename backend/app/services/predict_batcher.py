@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from services.predict_service import predict_service
+from services.prediction_cache import PredictionCache
+from utils.concurrency import run_inference
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+class QueueFullError(Exception):
+    pass
+
+class PredictBatcher:
+    """
+    Collects concurrent predict calls into micro-batches so that one forward pass
+    serves up to max_batch_size entries. A batch is flushed when it is full or when
+    max_wait_ms has passed since its first request arrived.
+    """
+    def __init__(self, predict_service, max_batch_size=16, max_wait_ms=10, max_queue_size=256, cache=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_service = predict_service
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self.cache = cache
+
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+        self.submitted_count = 0
+        self.rejected_count = 0
+        self.batch_count = 0
+        self.batched_item_count = 0
+        self.max_observed_queue_depth = 0
+
+    def _ensure_worker(self):
+        # The worker is bound to the running event loop, so (re)start it lazily
+        # whenever we are called from a loop that does not own it yet.
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = loop.create_task(self._run())
+
+    async def predict(self, text: str):
+        if self.cache is not None:
+            cached = await self.cache.get(text)
+            if cached is not None:
+                return cached
+
+        prediction = await self._submit(text)
+        if self.cache is not None:
+            await self.cache.set(text, prediction)
+        return prediction
+
+    async def _submit(self, text: str):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            self.rejected_count += 1
+            raise QueueFullError("Prediction queue is full, please try again later")
+        self.submitted_count += 1
+        self.max_observed_queue_depth = max(self.max_observed_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                results = await run_inference(self.predict_service.predict_batch, texts)
+            except Exception as e:
+                logger.error(f"Batched prediction failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batch_count += 1
+            self.batched_item_count += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def stop(self):
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "max_observed_queue_depth": self.max_observed_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "submitted_count": self.submitted_count,
+            "rejected_count": self.rejected_count,
+            "batch_count": self.batch_count,
+            "average_batch_size": self.batched_item_count / self.batch_count if self.batch_count else 0.0,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+predict_batcher = PredictBatcher(
+    predict_service,
+    max_batch_size=int(os.getenv("PREDICT_BATCH_SIZE", "16")),
+    max_wait_ms=float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "10")),
+    max_queue_size=int(os.getenv("PREDICT_QUEUE_MAX_SIZE", "256")),
+    cache=PredictionCache(
+        predict_service.cache_version,
+        max_size=int(os.getenv("PREDICTION_CACHE_MAX_SIZE", "10000")),
+        ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "86400")),
+    ) if os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true" else None,
+)
@@ -1,14 +1,48 @@
 from utils.roberta_model_utils import RobertaModelUtils
+import os
 import torch
 
 class PredictService:
-    def __init__(self, model, tokenizer, label_mapping, max_len=256):
+    def __init__(self, model, tokenizer, label_mapping, max_len=256, padding='max_length', length_buckets=(32, 64, 128, 256),
+                 long_text_mode='truncate', window_stride=128, pooling='mean', max_windows=8, model_version='unversioned'):
+        if padding not in ('max_length', 'bucket'):
+            raise ValueError(f"Unsupported padding mode: {padding}")
+        if long_text_mode not in ('truncate', 'window'):
+            raise ValueError(f"Unsupported long text mode: {long_text_mode}")
+        if pooling not in ('mean', 'max', 'attention'):
+            raise ValueError(f"Unsupported pooling: {pooling}")
+        if window_stride < 1 or max_windows < 1:
+            raise ValueError("window_stride and max_windows must be at least 1")
         self.model = model
         self.tokenizer = tokenizer
         self.label_mapping = label_mapping
         self.max_len = max_len
+        self.padding = padding
+        self.length_buckets = sorted(bucket for bucket in length_buckets if bucket < max_len) + [max_len]
+        self.long_text_mode = long_text_mode
+        self.window_stride = window_stride
+        self.pooling = pooling
+        self.max_windows = max_windows
+        self.model_version = model_version
+
+    @property
+    def cache_version(self):
+        # Predictions also depend on how long entries are split and padded, so cached
+        # ones are only reused under the same settings
+        return f"{self.model_version}:{self.long_text_mode}-{self.pooling}-{self.max_windows}x{self.window_stride}-{self.padding}"
+
+    def bucket_length(self, length: int):
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return bucket
+        return self.max_len
 
     def encode_texts(self, texts):
+        if self.padding == 'bucket':
+            encoded = self._tokenize(texts)
+            longest = max(len(ids) for ids in encoded['input_ids'])
+            return self._pad(encoded, self.bucket_length(longest))
+
         return self.tokenizer(
             list(texts),
             add_special_tokens=True,
@@ -19,22 +53,148 @@ class PredictService:
             return_tensors='pt'
         )
 
+    def _tokenize(self, texts):
+        return self.tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            max_length=self.max_len,
+            truncation=True,
+            return_attention_mask=True
+        )
+
+    def _pad(self, encoded, length: int):
+        return self.tokenizer.pad(
+            encoded,
+            padding='max_length',
+            max_length=length,
+            return_attention_mask=True,
+            return_tensors='pt'
+        )
+
     def predict(self, text: str):
-        inputs = self.encode_texts([text])
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        texts = list(texts)
+        if self.long_text_mode != 'window':
+            return self._predict_texts(texts)
+
+        # Entries that do not fit in one sequence are classified over
+        # overlapping windows instead of being truncated.
+        token_ids = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        window_size = self.window_size()
+        long_indices = [i for i, ids in enumerate(token_ids) if len(ids) > window_size]
+        short_indices = [i for i, ids in enumerate(token_ids) if len(ids) <= window_size]
+
+        results = [None] * len(texts)
+        if short_indices:
+            for index, result in zip(short_indices, self._predict_texts([texts[i] for i in short_indices])):
+                results[index] = result
+        if long_indices:
+            for index, result in zip(long_indices, self._predict_windows([token_ids[i] for i in long_indices])):
+                results[index] = result
+        return results
+
+    def window_size(self):
+        return self.max_len - self.tokenizer.num_special_tokens_to_add()
+
+    def window_starts(self, length: int):
+        window_size = self.window_size()
+        last_start = max(length - window_size, 0)
+        starts = list(range(0, last_start, self.window_stride)) + [last_start]
+        if len(starts) > self.max_windows:
+            # Too long to cover: sample max_windows windows spread evenly from start to end, leaving gaps between them
+            if self.max_windows == 1:
+                return [0]
+            step = last_start / (self.max_windows - 1)
+            starts = [round(i * step) for i in range(self.max_windows)]
+        return starts
+
+    def _predict_windows(self, token_id_lists):
+        window_size = self.window_size()
+        windows = []
+        owners = []
+        for owner, ids in enumerate(token_id_lists):
+            for start in self.window_starts(len(ids)):
+                windows.append([self.tokenizer.cls_token_id] + ids[start:start + window_size] + [self.tokenizer.sep_token_id])
+                owners.append(owner)
+
+        # Every window is full length, so all windows of the batch run in one forward pass
+        inputs = {
+            'input_ids': torch.tensor(windows, dtype=torch.long),
+            'attention_mask': torch.ones((len(windows), len(windows[0])), dtype=torch.long),
+        }
+        logits = self._logits(inputs)
+        owners = torch.tensor(owners)
+        pooled = torch.stack([self._pool(logits[owners == owner]) for owner in range(len(token_id_lists))])
+        return self._results(pooled)
+
+    def _pool(self, window_logits):
+        if self.pooling == 'max':
+            return window_logits.max(dim=0).values
+        if self.pooling == 'attention':
+            # Windows the model is more certain about weigh more in the final vote
+            weights = torch.softmax(window_logits.max(dim=1).values, dim=0)
+            return (weights.unsqueeze(1) * window_logits).sum(dim=0)
+        return window_logits.mean(dim=0)
+
+    def _predict_texts(self, texts):
+        if self.padding != 'bucket':
+            return self._predict_inputs(self.encode_texts(texts))
+
+        # Group the batch by length bucket so short entries are not padded
+        # up to the longest entry of the whole batch.
+        encoded = self._tokenize(texts)
+        groups = {}
+        for index, ids in enumerate(encoded['input_ids']):
+            groups.setdefault(self.bucket_length(len(ids)), []).append(index)
+
+        results = [None] * len(texts)
+        for length, indices in groups.items():
+            group = {
+                'input_ids': [encoded['input_ids'][i] for i in indices],
+                'attention_mask': [encoded['attention_mask'][i] for i in indices],
+            }
+            for index, result in zip(indices, self._predict_inputs(self._pad(group, length))):
+                results[index] = result
+        return results
+
+    def _predict_inputs(self, inputs):
+        return self._results(self._logits(inputs))
+
+    def _logits(self, inputs):
         with torch.no_grad():
             outputs = self.model(**inputs)
-            logits = outputs.logits
+            return outputs.logits
+
+    def _results(self, logits):
+        with torch.no_grad():
             probabilities = torch.softmax(logits, dim=1)
             confidence, predicted_class = torch.max(probabilities, dim=1)
 
-        predicted_label = self.label_mapping[predicted_class.item()]
-        confidence_scores = {self.label_mapping[i]: prob.item() for i, prob in enumerate(probabilities[0])}
+        results = []
+        for row in range(len(probabilities)):
+            predicted_label = self.label_mapping[predicted_class[row].item()]
+            confidence_scores = {self.label_mapping[i]: prob.item() for i, prob in enumerate(probabilities[row])}
+            results.append((predicted_class[row].item(), predicted_label, confidence[row].item(), confidence_scores))
 
-        return predicted_class.item(), predicted_label, confidence.item(), confidence_scores
+        return results
 
 def load_text_predictor():
     model_loader = RobertaModelUtils()
     model, tokenizer, label_mapping = model_loader.load()
-    return PredictService(model, tokenizer, label_mapping)
+    length_buckets = tuple(int(bucket) for bucket in os.getenv("PREDICT_LENGTH_BUCKETS", "32,64,128,256").split(","))
+    return PredictService(
+        model,
+        tokenizer,
+        label_mapping,
+        padding=os.getenv("PREDICT_PADDING", "bucket"),
+        length_buckets=length_buckets,
+        long_text_mode=os.getenv("PREDICT_LONG_TEXT_MODE", "window"),
+        window_stride=int(os.getenv("PREDICT_WINDOW_STRIDE", "128")),
+        pooling=os.getenv("PREDICT_WINDOW_POOLING", "mean"),
+        max_windows=int(os.getenv("PREDICT_MAX_WINDOWS", "8")),
+        model_version=model_loader.model_version
+    )
 
-predict_service = load_text_predictor()
\ No newline at end of file
+predict_service = load_text_predictor()
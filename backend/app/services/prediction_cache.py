@@ -0,0 +1,114 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from utils.content_digest import content_digest
+
+logger = logging.getLogger(__name__)
+
+class MongoPredictionCacheBackend:
+    """
+    Shares cached predictions between workers through a Mongo collection.
+    Expired documents are removed by a TTL index on expires_at.
+    """
+    def __init__(self, collection, ttl_seconds: float):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    async def create_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str):
+        document = await self.collection.find_one({"_id": key})
+        if document is None or document["expires_at"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return tuple(document["prediction"])
+
+    async def set(self, key: str, prediction):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        await self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "prediction": list(prediction), "expires_at": expires_at},
+            upsert=True
+        )
+
+class PredictionCache:
+    """
+    In-process LRU cache of predictions keyed by the digest of the normalized content
+    and the model version, with an optional shared backend behind it.
+    """
+    def __init__(self, model_version: str, max_size=10000, ttl_seconds=86400, shared_backend=None, clock=time.monotonic):
+        self.model_version = model_version
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.shared_backend = shared_backend
+        self.clock = clock
+        self._entries = OrderedDict()
+
+        self.hit_count = 0
+        self.shared_hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    def key(self, content: str):
+        return f"{self.model_version}:{content_digest(content)}"
+
+    async def get(self, content: str):
+        key = self.key(content)
+        entry = self._entries.get(key)
+        if entry is not None:
+            prediction, expires_at = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hit_count += 1
+                return prediction
+            del self._entries[key]
+            self.eviction_count += 1
+
+        if self.shared_backend is not None:
+            try:
+                prediction = await self.shared_backend.get(key)
+            except Exception as e:
+                logger.warning(f"Shared prediction cache lookup failed: {str(e)}")
+                prediction = None
+            if prediction is not None:
+                self._store(key, prediction)
+                self.shared_hit_count += 1
+                return prediction
+
+        self.miss_count += 1
+        return None
+
+    async def set(self, content: str, prediction):
+        key = self.key(content)
+        self._store(key, prediction)
+        if self.shared_backend is not None:
+            try:
+                await self.shared_backend.set(key, prediction)
+            except Exception as e:
+                logger.warning(f"Shared prediction cache write failed: {str(e)}")
+
+    def _store(self, key: str, prediction):
+        self._entries[key] = (prediction, self.clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.eviction_count += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hit_count + self.shared_hit_count + self.miss_count
+        return {
+            "model_version": self.model_version,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "shared_backend": type(self.shared_backend).__name__ if self.shared_backend is not None else None,
+            "hit_count": self.hit_count,
+            "shared_hit_count": self.shared_hit_count,
+            "miss_count": self.miss_count,
+            "eviction_count": self.eviction_count,
+            "hit_rate": (self.hit_count + self.shared_hit_count) / lookups if lookups else 0.0,
+        }
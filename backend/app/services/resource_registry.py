@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import threading
+import httpx
+import openai
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from services.openai_service import OpenAIService
+
+logger = logging.getLogger(__name__)
+
+class ResourceRegistry:
+    """
+    Holds the clients that are expensive to build and safe to share between
+    requests: one OpenAIService whose async client keeps a pool of keep-alive
+    connections, used for both chat completions and embeddings, and one VADER
+    analyzer. Open it in lifespan; resources are otherwise built on first use.
+    """
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry_seconds=30.0,
+                 timeout_seconds=60.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_seconds
+        )
+        self.timeout_seconds = timeout_seconds
+        self._openai_service = None
+        self._loop = None
+        self._sentiment_analyzer = None
+        self._sentiment_analyzer_lock = threading.Lock()
+
+    def openai_service(self) -> OpenAIService:
+        # The pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._openai_service is None or self._loop is not loop:
+            self._close_stale_openai_service()
+            http_client = openai.DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout_seconds)
+            self._openai_service = OpenAIService(http_client=http_client)
+            self._loop = loop
+        return self._openai_service
+
+    def _close_stale_openai_service(self):
+        if self._openai_service is None:
+            return
+        if self._loop.is_running():
+            # The stale connections can only be closed on the loop that opened them
+            asyncio.run_coroutine_threadsafe(self._openai_service.close(), self._loop)
+        else:
+            logger.warning("Dropping an OpenAI client whose event loop ended before ResourceRegistry.close()")
+        self._openai_service = None
+        self._loop = None
+
+    def sentiment_analyzer(self) -> SentimentIntensityAnalyzer:
+        # Called from threadpool workers; loading the lexicon once is the point
+        with self._sentiment_analyzer_lock:
+            if self._sentiment_analyzer is None:
+                self._sentiment_analyzer = SentimentIntensityAnalyzer()
+            return self._sentiment_analyzer
+
+    async def open(self):
+        self.openai_service()
+        self.sentiment_analyzer()
+        logger.info("Opened shared OpenAI and sentiment clients")
+
+    async def close(self):
+        if self._openai_service is not None:
+            await self._openai_service.close()
+            self._openai_service = None
+            self._loop = None
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import UpdateOne
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# One analyzer per worker process, so the lexicon is loaded once per process
+_analyzer = None
+
+def _score_chunk(texts):
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return [_analyzer.polarity_scores(text) for text in texts]
+
+class SentimentService:
+    """
+    Scores texts with VADER. VADER is pure Python and holds the GIL, so batches
+    larger than chunk_size are split into chunks scored in parallel by a pool of
+    max_workers processes. Smaller batches, such as one entry on the request
+    path, are scored in the threadpool with the analyzer of resources.
+    """
+    def __init__(self, resources, max_workers=None, chunk_size=500):
+        self.resources = resources
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def _score_in_process(self, texts):
+        analyzer = self.resources.sentiment_analyzer()
+        return [analyzer.polarity_scores(text) for text in texts]
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn rather than fork: the parent already runs PyTorch and event loop threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def score_batch(self, texts: list) -> list:
+        """
+        Returns the VADER scores (neg, neu, pos, compound) of each text, in order.
+        """
+        texts = list(texts)
+        if len(texts) <= self.chunk_size:
+            return await run_blocking(self._score_in_process, texts)
+        loop = asyncio.get_running_loop()
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self._pool(), _score_chunk, chunk) for chunk in chunks))
+        return [scores for chunk_scores in results for scores in chunk_scores]
+
+    async def rescore_entries(self, collection, query=None, batch_size=5000):
+        """
+        Scores the content of the diary entries matching query in batches of
+        batch_size and stores the scores in their sentiment field with one
+        unordered bulk_write per batch. Returns the number of entries scored.
+        """
+        scored = 0
+        batch = []
+        cursor = collection.find(query or {}, {"_id": 1, "content": 1}, batch_size=batch_size)
+        async for entry in cursor:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                scored += await self._rescore(collection, batch)
+                batch = []
+        if batch:
+            scored += await self._rescore(collection, batch)
+        return scored
+
+    async def _rescore(self, collection, entries):
+        scores = await self.score_batch([entry.get("content") or "" for entry in entries])
+        await collection.bulk_write([
+            UpdateOne({"_id": entry["_id"]}, {"$set": {"sentiment": entry_scores}})
+            for entry, entry_scores in zip(entries, scores)
+        ], ordered=False)
+        logger.info(f"Stored the sentiment of {len(entries)} diary entries")
+        return len(entries)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
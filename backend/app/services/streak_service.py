@@ -0,0 +1,158 @@
+import bisect
+import logging
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+def compute_streak(dates, today):
+    """
+    Full recomputation of the current streak from the distinct entry dates sorted
+    from the most recent.
+    """
+    if len(dates) <= 0:
+        return 0
+    current_streak = 1
+
+    # Check if the most recent entry is today or yesterday; otherwise, streak is zero
+    if dates[0] < today - timedelta(days=1):
+        return 0
+
+    # Iterate from the most recent to the oldest date
+    for i in range(1, len(dates)):
+        if dates[i] == dates[i - 1] - timedelta(days=1):
+            current_streak += 1
+        else:
+            break  # Stop if there is a gap in the streak
+    return current_streak
+
+def compute_max_streak(dates):
+    """
+    Full recomputation of the longest streak from the distinct entry dates sorted
+    from the most recent.
+    """
+    if len(dates) <= 0:
+        return 0
+
+    max_streak = 1
+    current_streak = 1
+
+    # Iterate from the most recent to the oldest date
+    for i in range(1, len(dates)):
+        if dates[i] == dates[i - 1] - timedelta(days=1):
+            current_streak += 1
+        else:
+            # Update max_streak if the current one is the longest found so far
+            max_streak = max(max_streak, current_streak)
+            current_streak = 1  # Reset the current streak
+
+    return max(max_streak, current_streak)
+
+def _run_length(run):
+    return (date.fromisoformat(run[1]) - date.fromisoformat(run[0])).days + 1
+
+def add_run_day(runs, day: date):
+    """
+    Returns the runs, as sorted [start, end] ISO date pairs, after a first entry on day.
+    Only the runs ending the day before and starting the day after are touched.
+    """
+    runs = [list(run) for run in runs]
+    value = day.isoformat()
+    index = bisect.bisect_left(runs, [value, value])
+    if (index > 0 and runs[index - 1][1] >= value) or (index < len(runs) and runs[index][0] == value):
+        return runs
+    joins_previous = index > 0 and runs[index - 1][1] == (day - timedelta(days=1)).isoformat()
+    joins_next = index < len(runs) and runs[index][0] == (day + timedelta(days=1)).isoformat()
+    if joins_previous and joins_next:
+        runs[index - 1][1] = runs.pop(index)[1]
+    elif joins_previous:
+        runs[index - 1][1] = value
+    elif joins_next:
+        runs[index][0] = value
+    else:
+        runs.insert(index, [value, value])
+    return runs
+
+def remove_run_day(runs, day: date):
+    """
+    Returns the runs after the last entry of day is deleted, splitting the run
+    containing it around the day.
+    """
+    runs = [list(run) for run in runs]
+    value = day.isoformat()
+    index = bisect.bisect_right(runs, [value, "9999-12-31"]) - 1
+    if index < 0 or runs[index][1] < value:
+        return runs
+    start, end = runs.pop(index)
+    if value < end:
+        runs.insert(index, [(day + timedelta(days=1)).isoformat(), end])
+    if start < value:
+        runs.insert(index, [start, (day - timedelta(days=1)).isoformat()])
+    return runs
+
+def streak_state(runs, version=0):
+    return {
+        "runs": runs,
+        "last_entry_date": runs[-1][1] if runs else None,
+        "current_run_start": runs[-1][0] if runs else None,
+        "max_streak": max((_run_length(run) for run in runs), default=0),
+        "version": version,
+    }
+
+def current_streak(state, today: date):
+    if not state or not state["last_entry_date"]:
+        return 0
+    if date.fromisoformat(state["last_entry_date"]) < today - timedelta(days=1):
+        return 0
+    return (date.fromisoformat(state["last_entry_date"]) - date.fromisoformat(state["current_run_start"])).days + 1
+
+def max_streak(state):
+    return state["max_streak"] if state else 0
+
+class StreakService:
+    """
+    Keeps the streak state on the user record: the runs of consecutive entry days,
+    the last entry date, the start of the latest run and the longest run. Updates
+    are compare-and-set on a version number, so concurrent writes of the same user
+    are retried instead of overwriting each other.
+    """
+    def __init__(self, collection, max_retries=5):
+        self.collection = collection
+        self.max_retries = max_retries
+
+    async def _update(self, user_id, change):
+        for _ in range(self.max_retries):
+            user = await self.collection.find_one({"_id": user_id}, {"streak": 1})
+            if user is None:
+                return None
+            state = user.get("streak")
+            version = state["version"] if state else 0
+            runs = change(state["runs"] if state else [])
+            new_state = streak_state(runs, version + 1)
+            query = {"_id": user_id, "streak.version": version} if state else {"_id": user_id, "streak": {"$exists": False}}
+            update_result = await self.collection.update_one(query, {"$set": {"streak": new_state}})
+            if update_result.matched_count == 1:
+                return new_state
+        logger.error(f"Streak of user {user_id} was not updated after {self.max_retries} conflicting writes")
+        raise Exception(f"Could not update the streak of user {user_id}")
+
+    async def add_day(self, user_id, day: date):
+        return await self._update(user_id, lambda runs: add_run_day(runs, day))
+
+    async def add_days(self, user_id, days):
+        """
+        Adds the first entries of several days, e.g. of an import, with one write.
+        """
+        def change(runs):
+            for day in days:
+                runs = add_run_day(runs, day)
+            return runs
+        return await self._update(user_id, change)
+
+    async def remove_day(self, user_id, day: date):
+        return await self._update(user_id, lambda runs: remove_run_day(runs, day))
+
+    async def rebuild(self, user_id, days):
+        runs = []
+        for day in sorted(days):
+            runs = add_run_day(runs, day)
+        return await self._update(user_id, lambda _: runs)
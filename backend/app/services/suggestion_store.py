@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from utils.concurrency import run_blocking
+from utils.similarity import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FALLBACK_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "swmh_classes_suggestions.json"))
+
+def normalized_vectors(vector):
+    """
+    Returns the $vector of a suggestion document as a 2D float32 matrix with
+    L2-normalized rows, or None when the document has no vector.
+    """
+    if vector is None:
+        return None
+    return normalize_rows(vector)
+
+class SuggestionStore:
+    """
+    Keeps the suggestion document of every class in memory, keyed by class, with
+    its $vector pre-normalized. The documents are reloaded with load_documents
+    once ttl_seconds have passed or after invalidate(). When they cannot be
+    loaded, the documents already in memory are kept and the load is retried
+    after retry_seconds; if there are none yet, the documents of fallback_path
+    are used instead.
+    """
+    def __init__(self, load_documents, fallback_path=DEFAULT_FALLBACK_PATH, ttl_seconds=3600, retry_seconds=60):
+        self.load_documents = load_documents
+        self.fallback_path = fallback_path
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._documents = {}
+        self._expires_at = 0
+        self._lock = None
+        self._loop = None
+        self.source = None
+        self.loaded_at = None
+        self.refresh_count = 0
+        self.failed_refresh_count = 0
+
+    def _documents_by_class(self, documents):
+        return {
+            document["class"].lower(): {
+                "suggestions": document.get("suggestions", []),
+                "$vector": normalized_vectors(document.get("$vector")),
+            }
+            for document in documents
+        }
+
+    def _read_fallback(self):
+        with open(self.fallback_path, encoding="utf-8") as file:
+            return json.load(file)
+
+    async def refresh(self):
+        """
+        Reloads the documents now. Returns the source now in memory: "astradb",
+        "fallback" or None when neither could be loaded.
+        """
+        try:
+            documents = self._documents_by_class(await run_blocking(self.load_documents))
+            self._documents = documents
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            self.source = "astradb"
+            self.loaded_at = time.time()
+            self.refresh_count += 1
+            logger.info(f"Loaded suggestions of {len(documents)} classes")
+            return self.source
+        except Exception as e:
+            self.failed_refresh_count += 1
+            self._expires_at = time.monotonic() + self.retry_seconds
+            logger.error(f"Failed to load suggestions: {str(e)}")
+        if not self._documents and self.fallback_path:
+            try:
+                self._documents = self._documents_by_class(await run_blocking(self._read_fallback))
+                self.source = "fallback"
+                self.loaded_at = time.time()
+                logger.warning(f"Using the suggestions of {self.fallback_path}")
+            except Exception as e:
+                logger.error(f"Failed to read fallback suggestions: {str(e)}")
+        return self.source
+
+    def invalidate(self):
+        self._expires_at = 0
+
+    def _refresh_lock(self):
+        # Locks are bound to the running event loop, like the advice queue's workers
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def get(self, label: str):
+        if time.monotonic() >= self._expires_at:
+            async with self._refresh_lock():
+                if time.monotonic() >= self._expires_at:
+                    await self.refresh()
+        return self._documents.get(label.lower())
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "classes": sorted(self._documents),
+            "loaded_at": self.loaded_at,
+            "expires_in_seconds": max(0, self._expires_at - time.monotonic()),
+            "refresh_count": self.refresh_count,
+            "failed_refresh_count": self.failed_refresh_count,
+        }
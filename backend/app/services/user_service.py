@@ -1,34 +1,37 @@
 from models.user import User, UserUpdate
+from services.admin_service import empty_prediction_counts
 
 class UserService:
     def __init__(self, collection):
         self.collection = collection
 
-    def create_user(self, user: User):
-        new_diaryEntry = self.collection.insert_one(user)
-        return self.collection.find_one(
+    async def create_user(self, user: User):
+        # Counters start at zero so new users are listed in the admin dashboard pages
+        user.setdefault("prediction_counts", empty_prediction_counts())
+        new_diaryEntry = await self.collection.insert_one(user)
+        return await self.collection.find_one(
             {"_id": new_diaryEntry.inserted_id}
         )
 
-    def list_users(self):
-        return list(self.collection.find(limit=100))
+    async def list_users(self):
+        return await self.collection.find(limit=100).to_list(None)
 
-    def find_user(self, id: str):
-        return self.collection.find_one({"_id": id})
+    async def find_user(self, id: str):
+        return await self.collection.find_one({"_id": id})
     
-    def find_user_by_username(self, username: str):
-        return self.collection.find_one({"username": username})
+    async def find_user_by_username(self, username: str):
+        return await self.collection.find_one({"username": username})
 
-    def update_user(self, id: str, user: UserUpdate):
+    async def update_user(self, id: str, user: UserUpdate):
         user = {k: v for k, v in user.items() if v is not None}
 
         # Check if user exists
-        existing_user = self.collection.find_one({"_id": id})
+        existing_user = await self.collection.find_one({"_id": id})
         if not existing_user:
             raise Exception(f"User with ID {id} not found")
         
         if len(user) >= 1:
-            update_result = self.collection.update_one(
+            update_result = await self.collection.update_one(
                 {"_id": id}, {"$set": user}
             )
 
@@ -37,4 +40,4 @@ class UserService:
             if update_result.modified_count == 0:
                 return existing_user
 
-        return self.collection.find_one({"_id": id})
+        return await self.collection.find_one({"_id": id})
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import logging
 import random
@@ -7,15 +8,18 @@ from fastapi import HTTPException, Request
 from dotenv import load_dotenv
 from astrapy import DataAPIClient
 from services.openai_service import OpenAIService
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from services.embedding_providers import OpenAIEmbeddingProvider
+from services.suggestion_store import SuggestionStore
+from services.resource_registry import ResourceRegistry
+from utils.similarity import normalize_rows, top_k_similarities
 import openai
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+ADVICE_UNAVAILABLE = "We couldn't process your request at this time. Please try again or share more details for better advice."
+
 ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
 ASTRA_DB_ENDPOINT = os.getenv("ASTRA_DB_ENDPOINT")
 ASTRA_DB_KEYSPACE = os.getenv("ASTRA_DB_KEYSPACE", "SWMH")
@@ -23,8 +27,16 @@ OPENAI_API_KEY= os.getenv("OPENAI_API_KEY")
 client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
 db = client.get_database_by_api_endpoint(ASTRA_DB_ENDPOINT, keyspace=ASTRA_DB_KEYSPACE)
 
+def load_suggestion_documents():
+    """
+    Reads the suggestion documents of all classes, for the suggestion store.
+    """
+    collection = db.get_collection("mental_advice1")
+    return list(collection.find({}, projection={"class": True, "$vector": True, "suggestions": True, "_id": False}))
+
 class VectoredService:
-    def __init__(self):
+    def __init__(self, candidates_per_attempt=5, max_attempts=2, embedding_provider=None, suggestion_store=None,
+                 advice_cache=None, resources=None):
         if not ASTRA_DB_APPLICATION_TOKEN or not ASTRA_DB_ENDPOINT or not ASTRA_DB_KEYSPACE:
             raise ValueError("AstraDB credentials are not properly set")
 
@@ -32,68 +44,60 @@ class VectoredService:
         openai.api_key = self.openai_api_key
 
         self.temperature = 1.5
-
-    def retrieve_related_data(self, prediction_label: str):
+        self.candidates_per_attempt = candidates_per_attempt
+        self.max_attempts = max_attempts
+        self.resources = resources or ResourceRegistry()
+        self.embedding_provider = embedding_provider or OpenAIEmbeddingProvider(resources=self.resources)
+        self.suggestion_store = suggestion_store or SuggestionStore(load_suggestion_documents)
+        self.advice_cache = advice_cache
+
+    async def _generate_candidates(self, openai_service: OpenAIService, system_prompt: str, db_embeddings: np.ndarray):
+        """
+        Requests candidates_per_attempt responses concurrently. Responses that have
+        completed are embedded together by the embedding provider while the others
+        are still generating; once a response reaches the provider's similarity
+        threshold the outstanding requests are cancelled. Returns (highest similarity, best response).
+        """
+        pending = {
+            asyncio.create_task(openai_service.generate_response_async(system_prompt, temperature=self.temperature))
+            for _ in range(self.candidates_per_attempt)
+        }
+        highest_similarity = 0
+        best_response = None
+        error = None
         try:
-            logger.info(f"Retrieving data for prediction label (class): {prediction_label}")
-            
-            collection = db.get_collection("mental_advice1")
-
-            document = collection.find_one({"class": prediction_label},
-                                             projection= {"$vector": True, "suggestions": True, "_id": False}  # Only fetch required fields
-            )
-
-            if document:
-                #logger.info(f'document: {document}')
-                return document
-            else:
-                logger.warning(f"No related data found for class: {prediction_label}")
-                return None
-        except Exception as e:
-            logger.error(f"Error retrieving related data: {str(e)}")
-            raise ValueError(f"Failed to retrieve related data: {str(e)}")
-
-    def generate_openai_embedding(self, text: str) -> np.ndarray:
-            """
-            Generates embeddings for the given text using OpenAI's embedding model.
-            """
-            try:
-                response = openai.embeddings.create(
-                    input=[text],
-                    model="text-embedding-ada-002"
-                )
-                # Access the embedding from the response
-                
-                embedding = response.data[0].embedding
-                
-                return np.array(embedding)
-            except Exception as e:
-                logger.error(f"Error generating OpenAI embedding: {str(e)}")
-                raise ValueError(f"Failed to generate OpenAI embedding: {str(e)}")
-
-
-    async def generate_advice(self, prediction_label: str, diary_content: str) -> str:
-        try:
-            related_data = self.retrieve_related_data(prediction_label.lower())
-
-            if related_data:
-                db_suggestions = related_data['suggestions']
-                db_embeddings = np.array(related_data.get("$vector", []))
-
-                if db_embeddings.ndim == 1:
-                        db_embeddings = db_embeddings.reshape(1, -1)  # Single sample case
-                elif db_embeddings.ndim != 2: 
-                  raise ValueError("Database embeddings must be 2D.") 
-
-                openai_service = OpenAIService()
-                attempt_count = 0
-                highest_similarity = 0
-                best_response = "We couldn't process your request at this time. Please try again or share more details for better advice."
-
-                while highest_similarity < 0.6 and attempt_count < 5:
-                    attempt_count += 1
-
-                    system_prompt = f"""
+            while pending and highest_similarity < self.embedding_provider.similarity_threshold:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                responses = []
+                for task in done:
+                    try:
+                        responses.append(task.result())
+                    except Exception as e:
+                        logger.warning(f"Advice candidate failed: {str(e)}")
+                        error = e
+                if not responses:
+                    continue
+
+                response_embeddings = await self.embedding_provider.embed(responses)
+                similarity_scores, _ = top_k_similarities(response_embeddings, db_embeddings, k=1)
+
+                for response, max_similarity_score in zip(responses, similarity_scores[:, 0]):
+                    logger.info(f"Max similarity score for response '{response}': {max_similarity_score}")
+                    if max_similarity_score > highest_similarity:
+                        highest_similarity = max_similarity_score
+                        best_response = response
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if best_response is None and error is not None:
+            raise error
+        return highest_similarity, best_response
+
+    def _advice_prompt(self, prediction_label: str, diary_content: str, db_suggestions, highest_similarity: float,
+                       best_response: str) -> str:
+        return f"""
                     You are a helpful and empathetic therapist. Based on the following diary content and emotional prediction, 
                     provide advice tailored to the user's current state of mind.
     
@@ -115,62 +119,135 @@ class VectoredService:
                     - The best response generated so far is: "{best_response}".
                     """
 
-                    generated_responses = [
-                        openai_service.generate_response(system_prompt, temperature=self.temperature)
-                        for _ in range(2)
-                    ]
-                   # logger.info(f"Attempt {attempt_count}: Generated responses from OpenAI: {generated_responses}")
-
-                    for response in generated_responses:
-                        response_embedding = self.generate_openai_embedding(response)
-                    
-                        # Ensure response_embedding is 2D
-                        if response_embedding.ndim == 1:
-                            response_embedding = response_embedding.reshape(1, -1)
-                        elif response_embedding.ndim != 2:
-                            raise ValueError("Response embedding must be 2D.")
-
-                        
-                        similarity_scores = cosine_similarity(response_embedding, db_embeddings)[0]
-                            
-                        
-                        max_similarity_score = max(similarity_scores)
-                        logger.info(f"Max similarity score for response '{response}': {max_similarity_score}")
+    async def _improve_advice(self, openai_service: OpenAIService, prediction_label: str, diary_content: str,
+                              db_suggestions, db_embeddings: np.ndarray, highest_similarity=0,
+                              best_response=ADVICE_UNAVAILABLE, attempt_count=0):
+        """
+        Runs attempts until a response reaches the similarity threshold or max_attempts
+        attempts, counting attempt_count already made. Returns (highest similarity,
+        best response, attempts made).
+        """
+        # Attempts stay sequential: each prompt carries the best response so far
+        while highest_similarity < self.embedding_provider.similarity_threshold and attempt_count < self.max_attempts:
+            attempt_count += 1
+            system_prompt = self._advice_prompt(prediction_label, diary_content, db_suggestions, highest_similarity, best_response)
+
+            similarity, response = await self._generate_candidates(openai_service, system_prompt, db_embeddings)
+            if response is not None and similarity > highest_similarity:
+                highest_similarity = similarity
+                best_response = response
+        return highest_similarity, best_response, attempt_count
+
+    async def _cached_advice(self, label: str, diary_content: str):
+        """
+        Returns (normalized content embedding, cached advice or None). The embedding
+        is None when the cache is disabled or the content could not be embedded, e.g.
+        past the input limit of the embedding model; both are treated as a miss.
+        """
+        if self.advice_cache is None:
+            return None, None
+        try:
+            content_embedding = normalize_rows(await self.embedding_provider.embed([diary_content]))[0]
+            cached_advice = self.advice_cache.lookup(label, content_embedding)
+        except Exception as e:
+            logger.warning(f"Skipping the advice cache: {str(e)}")
+            return None, None
+        if cached_advice is not None:
+            logger.info(f"Reusing cached advice for a similar {label} entry")
+        return content_embedding, cached_advice
 
-                        if max_similarity_score > highest_similarity:
-                            highest_similarity = max_similarity_score
-                            best_response = response
+    async def generate_advice(self, prediction_label: str, diary_content: str) -> str:
+        try:
+            related_data = await self.suggestion_store.get(prediction_label.lower())
 
-                        if highest_similarity >= 0.6:
-                            logger.info(f"Threshold met with similarity score: {highest_similarity}")
-                            break
+            if related_data:
+                db_suggestions = related_data['suggestions']
+                db_embeddings = await self.embedding_provider.reference_embeddings(related_data)
 
-                    if highest_similarity >= 0.6:
-                        break
+                label = prediction_label.lower()
+                content_embedding, cached_advice = await self._cached_advice(label, diary_content)
+                if cached_advice is not None:
+                    return cached_advice
 
+                openai_service = self.resources.openai_service()
+                highest_similarity, best_response, attempt_count = await self._improve_advice(
+                    openai_service, prediction_label, diary_content, db_suggestions, db_embeddings
+                )
 
-                if highest_similarity < 0.6:
-                    logger.warning("Failed to generate a sufficiently similar response after 5 attempts.")
-                    return "We couldn't process your request at this time. Please try again or share more details for better advice."
+                if highest_similarity < self.embedding_provider.similarity_threshold:
+                    logger.warning(f"Failed to generate a sufficiently similar response after {attempt_count} attempts.")
+                    return ADVICE_UNAVAILABLE
 
                 logger.info(f"Best response selected with highest similarity score: {highest_similarity}")
+                if content_embedding is not None:
+                    self.advice_cache.add(label, content_embedding, best_response)
                 return best_response
 
             else:
                 logger.warning(f"No relevant data found for prediction: {prediction_label}")
-                return "We couldn't process your request at this time. Please try again or share more details for better advice."
+                return ADVICE_UNAVAILABLE
 
         except Exception as e:
             logger.error(f"Error generating advice for prediction: {prediction_label}, Error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to generate advice: {str(e)}")
 
+    async def stream_advice(self, prediction_label: str, diary_content: str):
+        """
+        Streams the advice of generate_advice while it is generated. Yields
+        ("token", text) events with the text of one candidate as the model produces
+        it, then one ("validation", result) event with its similarity to the class
+        suggestions. When the streamed candidate misses the similarity threshold,
+        the remaining attempts run as in generate_advice and result["advice"]
+        replaces the streamed text. Cached advice is sent as a single token.
+        """
+        label = prediction_label.lower()
+        related_data = await self.suggestion_store.get(label)
+        if not related_data:
+            logger.warning(f"No relevant data found for prediction: {prediction_label}")
+            yield "token", ADVICE_UNAVAILABLE
+            yield "validation", {"similarity": None, "accepted": False, "cached": False, "advice": ADVICE_UNAVAILABLE}
+            return
+
+        db_suggestions = related_data['suggestions']
+        db_embeddings = await self.embedding_provider.reference_embeddings(related_data)
+        content_embedding, cached_advice = await self._cached_advice(label, diary_content)
+        if cached_advice is not None:
+            yield "token", cached_advice
+            yield "validation", {"similarity": None, "accepted": True, "cached": True, "advice": cached_advice}
+            return
+
+        openai_service = self.resources.openai_service()
+        system_prompt = self._advice_prompt(prediction_label, diary_content, db_suggestions, 0, ADVICE_UNAVAILABLE)
+        tokens = []
+        async for token in openai_service.stream_response_async(system_prompt, temperature=self.temperature):
+            tokens.append(token)
+            yield "token", token
+        streamed_response = "".join(tokens).strip()
+
+        highest_similarity, best_response = 0, ADVICE_UNAVAILABLE
+        if streamed_response:
+            similarity_scores, _ = top_k_similarities(await self.embedding_provider.embed([streamed_response]), db_embeddings, k=1)
+            highest_similarity, best_response = float(similarity_scores[0, 0]), streamed_response
+            logger.info(f"Max similarity score for streamed response '{streamed_response}': {highest_similarity}")
+        highest_similarity, best_response, attempt_count = await self._improve_advice(
+            openai_service, prediction_label, diary_content, db_suggestions, db_embeddings,
+            highest_similarity, best_response, attempt_count=1
+        )
+
+        accepted = highest_similarity >= self.embedding_provider.similarity_threshold
+        if not accepted:
+            logger.warning(f"Failed to generate a sufficiently similar response after {attempt_count} attempts.")
+            best_response = ADVICE_UNAVAILABLE
+        elif content_embedding is not None:
+            self.advice_cache.add(label, content_embedding, best_response)
+        yield "validation", {
+            "similarity": float(highest_similarity), "accepted": accepted, "cached": False, "advice": best_response
+        }
+
     """
-    Analyze sentiment using VADER and generate a response for 'Off My Chest' entries.
+    Generate a response for 'Off My Chest' entries from their VADER sentiment scores.
     """
-    def handle_off_my_chest(self, diary_content: str) -> str:
-
-        sid = SentimentIntensityAnalyzer()
-        sentiment_scores = sid.polarity_scores(diary_content)
+    def off_my_chest_advice(self, sentiment_scores: dict) -> str:
 
         logging.info(f"Sentiment Scores: {sentiment_scores}")
 
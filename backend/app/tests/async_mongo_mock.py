@@ -0,0 +1,18 @@
+from unittest.mock import patch
+from mongomock_motor import AsyncMongoMockCollection
+
+def _returning_from_coroutine(method):
+    async def wrapper(self, *args, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+def pymongo_async_cursors():
+    """
+    Patches the mongomock collections so aggregate and list_indexes return their
+    cursor from a coroutine, as PyMongo's async API does, instead of directly.
+    """
+    return patch.multiple(
+        AsyncMongoMockCollection,
+        aggregate=_returning_from_coroutine(AsyncMongoMockCollection.aggregate),
+        list_indexes=_returning_from_coroutine(AsyncMongoMockCollection.list_indexes),
+    )
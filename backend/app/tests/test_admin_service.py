@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+from services.admin_service import AdminService
+from tests.async_mongo_mock import pymongo_async_cursors
+
+class TestAdminService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.database = AsyncMongoMockClient()["test_db"]
+        self.service = AdminService(self.database, max_page_size=10)
+        cursors = pymongo_async_cursors()
+        cursors.start()
+        self.addCleanup(cursors.stop)
+
+    async def insert_users(self):
+        await self.database["users"].insert_many([
+            {"_id": "u1", "username": "user1", "role": "user"},
+            {"_id": "u2", "username": "user2", "role": "user"},
+            {"_id": "u3", "username": "user3", "role": "user"},
+            {"_id": "a1", "username": "admin", "role": "admin"},
+        ])
+        await self.database["diary_entries"].insert_many([
+            {"_id": "e1", "author": "u1", "predicted_class_number": 1},
+            {"_id": "e2", "author": "u1", "predicted_class_number": 3},
+            {"_id": "e3", "author": "u2", "predicted_class_number": 1},
+            {"_id": "e4", "author": "u2", "predicted_class_number": 1},
+            {"_id": "e5", "author": "u2", "predicted_class_number": 4},
+        ])
+
+    async def test_reconcile_and_list_users(self):
+        await self.insert_users()
+
+        self.assertEqual(await self.service.reconcile_prediction_counts(chunk_size=1), 2)
+        users = await self.service.list_users()
+
+        self.assertEqual(users, [
+            {"user_id": "u2", "username": "user2", "anxiety_count": 0, "suicide_count": 2, "bipolar_count": 0, "depression_count": 0, "other_count": 1},
+            {"user_id": "u1", "username": "user1", "anxiety_count": 0, "suicide_count": 1, "bipolar_count": 0, "depression_count": 1, "other_count": 0},
+            {"user_id": "u3", "username": "user3", "anxiety_count": 0, "suicide_count": 0, "bipolar_count": 0, "depression_count": 0, "other_count": 0},
+        ])
+
+    async def test_record_prediction_matches_reconcile(self):
+        await self.insert_users()
+        await self.service.reconcile_prediction_counts()
+
+        # Create (unclassified entries default to class 0), classify, re-classify and delete
+        await self.service.record_prediction("u3", None, 0)
+        await self.service.record_prediction("u3", 0, 1)
+        await self.service.record_prediction("u1", 3, 2)
+        await self.service.record_prediction("u2", 4, None)
+        await self.database["diary_entries"].insert_one({"_id": "e6", "author": "u3", "predicted_class_number": 1})
+        await self.database["diary_entries"].update_one({"_id": "e2"}, {"$set": {"predicted_class_number": 2}})
+        await self.database["diary_entries"].delete_one({"_id": "e5"})
+
+        incremental = await self.service.list_users()
+        await self.service.reconcile_prediction_counts()
+
+        self.assertEqual(incremental, await self.service.list_users())
+
+    async def test_initialize_prediction_counts_keeps_existing_counters(self):
+        await self.database["users"].insert_many([
+            {"_id": "u1", "username": "user1", "role": "user"},
+            {"_id": "u2", "username": "user2", "role": "user", "prediction_counts": {"suicide_count": 2}},
+        ])
+
+        await self.service.initialize_prediction_counts()
+
+        self.assertEqual(await self.service.list_users(), [
+            {"user_id": "u2", "username": "user2", "anxiety_count": 0, "suicide_count": 2, "bipolar_count": 0, "depression_count": 0, "other_count": 0},
+            {"user_id": "u1", "username": "user1", "anxiety_count": 0, "suicide_count": 0, "bipolar_count": 0, "depression_count": 0, "other_count": 0},
+        ])
+
+    async def test_reconcile_keeps_concurrent_increments(self):
+        await self.insert_users()
+        await self.service.reconcile_prediction_counts()
+        await self.database["users"].update_one({"_id": "u1"}, {"$set": {"prediction_counts.suicide_count": 5}})
+        aggregate = AsyncMongoMockCollection.aggregate
+
+        async def aggregate_after_increment(collection, pipeline, **kwargs):
+            # The counters change after the reconcile read them but before it writes
+            if pipeline[0]["$match"]["author"] == "u1":
+                await self.service.record_prediction("u1", None, 1)
+            return await aggregate(collection, pipeline, **kwargs)
+
+        with patch.object(AsyncMongoMockCollection, "aggregate", aggregate_after_increment):
+            await self.service.reconcile_prediction_counts()
+
+        users = {user["user_id"]: user for user in await self.service.list_users()}
+        self.assertEqual(users["u1"]["suicide_count"], 6)
+
+    async def test_list_users_page(self):
+        await self.database["users"].insert_many([
+            {"_id": f"u{i}", "username": f"user{i}", "role": "user", "prediction_counts": {"suicide_count": i % 3}}
+            for i in range(7)
+        ])
+
+        user_ids = []
+        cursor = None
+        while True:
+            users, cursor = await self.service.list_users_page(page_size=2, cursor=cursor)
+            self.assertLessEqual(len(users), 2)
+            user_ids += [user["user_id"] for user in users]
+            if cursor is None:
+                break
+
+        self.assertEqual(user_ids, ["u2", "u5", "u1", "u4", "u0", "u3", "u6"])
+
+    async def test_list_users_page_with_partial_counters(self):
+        await self.database["users"].insert_many([
+            {"_id": f"u{i}", "username": f"user{i}", "role": "user"} for i in range(2)
+        ])
+        # Incrementing the counters of a user without them leaves only that counter
+        await self.service.record_prediction("u1", None, 0)
+
+        users, cursor = await self.service.list_users_page(page_size=1)
+
+        self.assertEqual(users[0]["suicide_count"], 0)
+        self.assertIsNotNone(cursor)
+
+    async def test_list_users_page_rejects_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            await self.service.list_users_page(page_size=11)
+        with self.assertRaises(ValueError):
+            await self.service.list_users_page(cursor="bad")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from services import advice_cache
+from services.advice_cache import BruteForceIndex, SemanticAdviceCache
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class TestSemanticAdviceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SemanticAdviceCache("test-space", radius=0.9, class_radius={"anxiety": 0.99}, backend="brute-force")
+
+    def test_lookup_within_radius_of_same_class(self):
+        self.cache.add("depression", unit(1, 0, 0), "Rest")
+
+        self.assertEqual(self.cache.lookup("depression", unit(1, 0.2, 0)), "Rest")
+        self.assertIsNone(self.cache.lookup("depression", unit(1, 1, 0)))
+        self.assertIsNone(self.cache.lookup("bipolar", unit(1, 0, 0)))
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["lookups"], stats["hits"]), (3, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+        self.assertEqual(stats["classes"]["depression"]["hits"], 1)
+
+    def test_class_radius(self):
+        self.cache.add("anxiety", unit(1, 0, 0), "Breathe")
+
+        self.assertIsNone(self.cache.lookup("anxiety", unit(1, 0.2, 0)))
+        self.assertEqual(self.cache.lookup("anxiety", unit(1, 0.01, 0)), "Breathe")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.max_size = 2
+        self.cache.add("depression", unit(1, 0, 0), "first")
+        self.cache.add("depression", unit(0, 1, 0), "second")
+        self.cache.lookup("depression", unit(1, 0, 0))
+
+        self.cache.add("bipolar", unit(0, 0, 1), "third")
+
+        self.assertEqual(self.cache.lookup("depression", unit(1, 0, 0)), "first")
+        self.assertIsNone(self.cache.lookup("depression", unit(0, 1, 0)))
+        self.assertEqual(self.cache.lookup("bipolar", unit(0, 0, 1)), "third")
+        self.assertEqual(self.cache.stats()["eviction_count"], 1)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.cache.path = os.path.join(directory, "advice_cache.npz")
+            self.cache.add("depression", unit(1, 0, 0), "Rest")
+            self.cache.add("anxiety", unit(0, 1, 0), "Breathe")
+            self.cache.save()
+
+            loaded = SemanticAdviceCache("test-space", path=self.cache.path, radius=0.9, backend="brute-force")
+            other_space = SemanticAdviceCache("other-space", path=self.cache.path, backend="brute-force")
+
+            self.assertEqual(loaded.load(), 2)
+            self.assertEqual(loaded.lookup("anxiety", unit(0, 1, 0)), "Breathe")
+            self.assertEqual(other_space.load(), 0)
+
+    def test_load_missing_file(self):
+        self.cache.path = os.path.join(tempfile.gettempdir(), "missing_advice_cache.npz")
+
+        self.assertEqual(self.cache.load(), 0)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            SemanticAdviceCache("test-space", backend="ivf")
+
+    @unittest.skipIf(advice_cache.hnswlib is not None, "hnswlib is installed")
+    def test_hnsw_backend_requires_hnswlib(self):
+        with self.assertRaises(ValueError):
+            SemanticAdviceCache("test-space", backend="hnsw")
+        self.assertEqual(SemanticAdviceCache("test-space").backend, "brute-force")
+
+    @unittest.skipUnless(advice_cache.hnswlib is not None, "hnswlib is not installed")
+    def test_hnsw_backend(self):
+        cache = SemanticAdviceCache("test-space", radius=0.9, max_size=2, backend="hnsw")
+        cache.add("depression", unit(1, 0, 0), "first")
+        cache.add("depression", unit(0, 1, 0), "second")
+        cache.add("depression", unit(0, 0, 1), "third")
+
+        self.assertEqual(cache.lookup("depression", unit(0, 0.1, 1)), "third")
+        self.assertIsNone(cache.lookup("depression", unit(1, 0, 0)))
+
+class TestBruteForceIndex(unittest.TestCase):
+
+    def test_add_remove_and_grow(self):
+        index = BruteForceIndex(2, 100)
+        vectors = {item_id: unit(np.cos(item_id), np.sin(item_id)) for item_id in range(100)}
+        for item_id, vector in vectors.items():
+            index.add(item_id, vector)
+        for item_id in range(0, 100, 2):
+            index.remove(item_id)
+
+        for item_id in range(1, 100, 2):
+            self.assertEqual(index.nearest(vectors[item_id])[0], item_id)
+        self.assertEqual(len(index.ids), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
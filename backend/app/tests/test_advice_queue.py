@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from services.advice_queue import AdviceJobQueue
+
+class TestAdviceJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.handled = []
+        self.dead = []
+        self.failures = {}
+        self.running = 0
+        self.max_running = 0
+
+    async def handler(self, job):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures.get(job["id"], 0) > 0:
+                self.failures[job["id"]] -= 1
+                raise RuntimeError(f"job {job['id']} failed")
+            self.handled.append(job["id"])
+        finally:
+            self.running -= 1
+
+    async def on_dead_letter(self, job, error):
+        self.dead.append((job["id"], error))
+
+    def queue(self, **kwargs):
+        options = {"concurrency": 2, "max_retries": 2, "retry_delay_seconds": 0.001}
+        options.update(kwargs)
+        return AdviceJobQueue(self.handler, self.on_dead_letter, **options)
+
+    async def test_concurrency_limit(self):
+        queue = self.queue()
+
+        for id in range(6):
+            await queue.submit({"id": id})
+        await queue.join()
+        await queue.stop()
+
+        self.assertEqual(sorted(self.handled), list(range(6)))
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(queue.stats()["completed_count"], 6)
+
+    async def test_retries_then_succeeds(self):
+        queue = self.queue()
+        self.failures = {1: 2}
+
+        await queue.submit({"id": 1})
+        await queue.join()
+        await queue.stop()
+
+        self.assertEqual(self.handled, [1])
+        self.assertEqual(self.dead, [])
+        self.assertEqual(queue.stats()["retried_count"], 2)
+
+    async def test_dead_letter_after_retries(self):
+        queue = self.queue()
+        self.failures = {1: 3}
+
+        await queue.submit({"id": 1})
+        await queue.join()
+
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.dead, [(1, "job 1 failed")])
+        self.assertEqual(len(queue.dead_letters), 1)
+        self.assertEqual(queue.dead_letters[0]["job"]["attempts"], 3)
+
+        # Retried from the dead-letter list with a fresh attempt budget
+        self.assertEqual(await queue.retry_dead_letters(), 1)
+        await queue.join()
+        await queue.stop()
+        self.assertEqual(self.handled, [1])
+        self.assertEqual(len(queue.dead_letters), 0)
+
+    async def test_dead_workers_are_replaced_without_dropping_jobs(self):
+        queue = self.queue(concurrency=1)
+        await queue.submit({"id": 1})
+        queue._workers[0].cancel()
+        await asyncio.sleep(0)
+
+        await queue.submit({"id": 2})
+        await queue.join()
+        await queue.stop()
+
+        self.assertEqual(self.handled, [1, 2])
+
+    async def test_full_queue_dead_letters(self):
+        queue = self.queue(concurrency=1, max_queue_size=1)
+
+        for id in range(4):
+            await queue.submit({"id": id})
+        await queue.join()
+        await queue.stop()
+
+        self.assertEqual(len(self.handled) + len(self.dead), 4)
+        self.assertTrue(all(error == "Advice queue is full" for _, error in self.dead))
+        self.assertGreater(len(self.dead), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
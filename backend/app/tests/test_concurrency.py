@@ -0,0 +1,78 @@
+import asyncio
+import time
+import unittest
+import uuid
+from unittest.mock import patch, MagicMock, AsyncMock
+import httpx
+from main import app, get_current_active_user
+from services.diary_entry_service import DiaryEntryService
+from services.daily_rollup_service import DailyRollupService
+from services.admin_service import AdminService
+from services.streak_service import StreakService
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+from mongomock_motor import AsyncMongoMockClient
+
+'''
+Load test: a slow prediction must not hold up other requests served by the same worker
+pytest tests/test_concurrency.py
+'''
+INFERENCE_SECONDS = 0.5
+
+def slow_predict_batch(texts):
+    time.sleep(INFERENCE_SECONDS)  # Blocking, like a real forward pass
+    return [(3, "Depression", 0.5, {"Depression": 0.5}) for _ in texts]
+
+class TestConcurrency(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        app.diary_entry_service = DiaryEntryService(MagicMock())
+        app.daily_rollup_service = DailyRollupService(AsyncMongoMockClient()["test_db"]["daily_rollups"])
+        app.streak_service = StreakService(AsyncMongoMockClient()["test_db"]["users"])
+        app.admin_service = AdminService(AsyncMongoMockClient()["test_db"])
+        app.sentiment_service = SentimentService(ResourceRegistry())
+        app.dependency_overrides[get_current_active_user] = lambda: {"_id": "test_user_id", "role": "user"}
+        self.entry = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "original content",
+            "created": "2024-11-11T15:32:10.950881",
+            "updated": "2024-11-11T15:32:10.950881"
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=self.entry)
+        app.diary_entry_service.update_diary_entry = AsyncMock(return_value=self.entry)
+        app.diary_entry_service.list_diary_entries = AsyncMock(return_value=[self.entry])
+
+    def tearDown(self):
+        app.dependency_overrides = {}
+
+    async def finished_at(self, request):
+        response = await request
+        return response, time.perf_counter()
+
+    @patch("services.predict_service.PredictService.predict_batch", side_effect=slow_predict_batch)
+    @patch("services.vectordb_service.VectoredService.generate_advice", new_callable=AsyncMock)
+    async def test_requests_do_not_wait_for_inference(self, mock_generate_advice, mock_predict):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            update = asyncio.create_task(self.finished_at(client.put(
+                f"/diary_entry/{self.entry['_id']}",
+                json={"content": f"New content {uuid.uuid4()}"}
+            )))
+            # Let the update reach the model, then send listings while it is running.
+            # If inference blocked the event loop, this sleep itself would only return after it.
+            await asyncio.sleep(0.1)
+            listings = await asyncio.gather(*[self.finished_at(client.get("/diary_entry")) for _ in range(5)])
+            update_response, update_finished = await update
+
+        self.assertEqual(update_response.status_code, 200)
+        self.assertGreaterEqual(update_finished - start, INFERENCE_SECONDS)
+        for response, finished in listings:
+            self.assertEqual(response.status_code, 200)
+            self.assertLess(finished - start, 0.1 + INFERENCE_SECONDS / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from mongomock_motor import AsyncMongoMockClient
+from services.daily_rollup_service import DailyRollupService, entry_day
+
+class TestDailyRollupService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        database = AsyncMongoMockClient()["test_db"]
+        self.diary_entries = database["diary_entries"]
+        self.collection = database["daily_rollups"]
+        self.service = DailyRollupService(self.collection)
+
+    def entry(self, id, entry_date, prediction_class="", author="user_id"):
+        return {"_id": id, "author": author, "entry_date": entry_date, "content": "Entry", "prediction_class": prediction_class}
+
+    async def assert_matches_rebuild(self):
+        incremental = {day["_id"]: day for day in await self.collection.find().to_list(None)}
+        for day in incremental.values():
+            day["class_counts"] = {name: count for name, count in day.get("class_counts", {}).items() if count}
+
+        await self.service.rebuild(self.diary_entries)
+        rebuilt = {day["_id"]: day for day in await self.collection.find().to_list(None)}
+
+        self.assertEqual(incremental, rebuilt)
+
+    def test_entry_day(self):
+        self.assertEqual(entry_day("2024-11-11T23:59:59.950881"), "2024-11-11")
+
+    async def test_incremental_updates_match_rebuild(self):
+        entries = [
+            self.entry("1", "2024-11-10T08:00:00"),
+            self.entry("2", "2024-11-10T21:00:00", "Anxiety"),
+            self.entry("3", "2024-11-11T09:00:00"),
+            self.entry("4", "2024-11-11T09:00:00", author="other_user_id"),
+        ]
+        for entry in entries:
+            await self.diary_entries.insert_one(dict(entry))
+            await self.service.record_entry(entry)
+
+        # Classified after creation, then re-classified after an edit
+        await self.service.record_prediction(entries[0], "Depression")
+        await self.diary_entries.update_one({"_id": "1"}, {"$set": {"prediction_class": "Depression"}})
+        entries[0]["prediction_class"] = "Depression"
+        await self.service.record_prediction(entries[0], "Bipolar")
+        await self.diary_entries.update_one({"_id": "1"}, {"$set": {"prediction_class": "Bipolar"}})
+
+        await self.service.remove_entry(entries[2])
+        await self.diary_entries.delete_one({"_id": "3"})
+
+        days = await self.service.list_days("user_id")
+        self.assertEqual([day["date"] for day in days], ["2024-11-10"])
+        self.assertEqual(days[0]["entry_count"], 2)
+        self.assertEqual(days[0]["class_counts"], {"Depression": 0, "Anxiety": 1, "Bipolar": 1})
+        await self.assert_matches_rebuild()
+
+    async def test_record_days_returns_new_days(self):
+        existing = self.entry("1", "2024-11-10T08:00:00", "Anxiety")
+        await self.diary_entries.insert_one(existing)
+        await self.service.record_entry(existing)
+        imported = [self.entry("2", "2024-11-10T09:00:00", "Depression"), self.entry("3", "2024-11-11T09:00:00", "Depression"),
+                    self.entry("4", "2024-11-11T10:00:00", "Anxiety")]
+        await self.diary_entries.insert_many(imported)
+
+        new_days = await self.service.record_days("user_id", {
+            "2024-11-10": {"entry_count": 1, "class_counts": {"Depression": 1}},
+            "2024-11-11": {"entry_count": 2, "class_counts": {"Depression": 1, "Anxiety": 1}},
+        })
+
+        self.assertEqual(new_days, ["2024-11-11"])
+        await self.assert_matches_rebuild()
+
+    async def test_remove_author(self):
+        await self.service.record_entry(self.entry("1", "2024-11-10T08:00:00"))
+        await self.service.record_entry(self.entry("2", "2024-11-10T08:00:00", author="other_user_id"))
+
+        await self.service.remove_author("user_id")
+
+        self.assertEqual(await self.service.list_days("user_id"), [])
+        self.assertEqual(len(await self.service.list_days("other_user_id")), 1)
+
+    async def test_rebuild_one_author(self):
+        await self.diary_entries.insert_many([
+            self.entry("1", "2024-11-10T08:00:00", "Anxiety"),
+            self.entry("2", "2024-11-12T08:00:00", author="other_user_id"),
+        ])
+        await self.service.record_entry(self.entry("2", "2024-11-12T08:00:00", author="other_user_id"))
+        await self.service.record_entry(self.entry("9", "2024-11-01T08:00:00"))
+
+        written = await self.service.rebuild(self.diary_entries, author="user_id")
+
+        self.assertEqual(written, 1)
+        self.assertEqual(
+            await self.service.list_days("user_id"),
+            [{"_id": "user_id:2024-11-10", "author": "user_id", "date": "2024-11-10", "entry_count": 1, "class_counts": {"Anxiety": 1}}]
+        )
+        self.assertEqual(len(await self.service.list_days("other_user_id")), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
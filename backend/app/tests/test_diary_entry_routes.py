@@ -1,11 +1,25 @@
+import asyncio
+import json
 import unittest
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from main import app
 from services.diary_entry_service import DiaryEntryService
+from services.daily_rollup_service import DailyRollupService
+from services.admin_service import AdminService
+from services.export_service import ExportService
+from services.import_service import DiaryImportService
+from services.predict_service import predict_service
+from services.predict_batcher import QueueFullError
+from services.streak_service import StreakService, add_run_day, streak_state
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+from mongomock_motor import AsyncMongoMockClient
 from unittest.mock import ANY
 import uuid
 from main import get_current_active_user
+from utils.content_digest import content_digest
 
 client = TestClient(app)
 
@@ -13,6 +27,12 @@ client = TestClient(app)
 class TestDiaryEntryRoutes(unittest.TestCase):
     def setUp(self):
         app.diary_entry_service = DiaryEntryService(MagicMock())
+        app.daily_rollup_service = DailyRollupService(AsyncMongoMockClient()["test_db"]["daily_rollups"])
+        app.streak_service = StreakService(AsyncMongoMockClient()["test_db"]["users"])
+        app.admin_service = AdminService(AsyncMongoMockClient()["test_db"])
+        app.sentiment_service = SentimentService(ResourceRegistry())
+        app.advice_queue = MagicMock()
+        app.advice_queue.submit = AsyncMock()
         app.predict_service = MagicMock()
         app.vectored_service = MagicMock()
 
@@ -47,6 +67,9 @@ class TestDiaryEntryRoutes(unittest.TestCase):
             "confidence": ANY,
             "confidence_scores": ANY,
             "advice": ANY,
+            "content_digest": None,
+            "advice_status": None,
+            "sentiment": None,
             "created": ANY,
             "updated": ANY
         })
@@ -86,6 +109,33 @@ class TestDiaryEntryRoutes(unittest.TestCase):
         mock_list_diary_entries.assert_called_once()
 
 
+    @patch("services.diary_entry_service.DiaryEntryService.list_diary_entries_page")
+    def test_list_diary_entries_page(self, mock_list_diary_entries_page):
+        mock_list_diary_entries_page.return_value = (
+            [{"_id": "1", "created": "2024-11-11T10:00:00", "entry_date": "2024-11-11T10:00:00"}],
+            "next-page"
+        )
+
+        response = client.get("/diary_entry_page?page_size=1&cursor=abc&fields=entry_date, prediction_class")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "entries": [{"_id": "1", "created": "2024-11-11T10:00:00", "entry_date": "2024-11-11T10:00:00"}],
+            "next_cursor": "next-page"
+        })
+        mock_list_diary_entries_page.assert_called_once_with(
+            {"_id": "test_user_id", "role": "user"}, 1, "abc", ["entry_date", "prediction_class"]
+        )
+
+    @patch("services.diary_entry_service.DiaryEntryService.list_diary_entries_page")
+    def test_list_diary_entries_page_invalid_cursor(self, mock_list_diary_entries_page):
+        mock_list_diary_entries_page.side_effect = ValueError("Invalid cursor")
+
+        response = client.get("/diary_entry_page?cursor=bad")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Invalid cursor")
+
     @patch("services.diary_entry_service.DiaryEntryService.find_diary_entry")
     def test_find_diary_entry_success(self, mock_find_diary_entry):
         mock_diary_entry = {
@@ -119,10 +169,10 @@ class TestDiaryEntryRoutes(unittest.TestCase):
 
         mock_find_diary_entry.assert_called_once_with("non-existing-id")
 
-    @patch("services.predict_service.PredictService.predict")
+    @patch("services.predict_service.PredictService.predict_batch")
     @patch("services.vectordb_service.VectoredService.generate_advice", new_callable=AsyncMock)
     def test_update_diary_entry(self, mock_generate_advice, mock_predict):
-        mock_predict.return_value = (
+        mock_predict.return_value = [(
             3,
             "Depression",
             0.85,
@@ -133,12 +183,13 @@ class TestDiaryEntryRoutes(unittest.TestCase):
                 "Depression": 0.85,
                 "Off My Chest": 0.0
             }
-        )
+        )]
 
         mock_generate_advice.return_value = "This is a sample advice based on prediction."
         original_data = {
             "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
             "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
             "content": "original content",
             "predicted_class_number": 3,
             "prediction_class": "Off My Chest",
@@ -168,12 +219,13 @@ class TestDiaryEntryRoutes(unittest.TestCase):
                 "Depression": 0.85,
                 "Off My Chest": 0.0
             },
-            "advice": "This is a sample advice based on prediction.",
+            "advice": "",
+            "advice_status": "pending",
             "created": "2024-11-11T15:32:10.950881",
             "updated": "2024-11-11T15:32:10.950881"
         }
-        app.diary_entry_service.find_diary_entry = MagicMock(return_value=original_data)
-        app.diary_entry_service.update_diary_entry = MagicMock(return_value=updated_data)
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(return_value=updated_data)
 
         response = client.put(
             "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab",
@@ -192,17 +244,26 @@ class TestDiaryEntryRoutes(unittest.TestCase):
             "Depression": 0.85,
             "Off My Chest": 0.0
         })
-        self.assertEqual(response_json["advice"], "This is a sample advice based on prediction.")
+        self.assertEqual(response_json["advice"], "")
+        self.assertEqual(response_json["advice_status"], "pending")
 
-        mock_predict.assert_called_once_with("Updated content")
+        mock_predict.assert_called_once_with(["Updated content"])
 
-        mock_generate_advice.assert_called_once_with("Depression", "Updated content")
+        # Advice is generated by the background queue, not within the request
+        mock_generate_advice.assert_not_called()
+        app.advice_queue.submit.assert_called_once_with({
+            "entry_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "content": "Updated content",
+            "content_digest": content_digest("Updated content"),
+            "prediction_class": "Depression",
+        })
 
         app.diary_entry_service.update_diary_entry.assert_called_once_with(
             "62d6b427-a606-4323-a675-2ed40108e1ab",
             {
                 "content": "Updated content",
                 "updated": ANY,
+                "content_digest": content_digest("Updated content"),
                 "predicted_class_number": 3,
                 "prediction_class": "Depression",
                 "confidence": 0.85,
@@ -213,10 +274,210 @@ class TestDiaryEntryRoutes(unittest.TestCase):
                     "Depression": 0.85,
                     "Off My Chest": 0.0
                 },
-                "advice": "This is a sample advice based on prediction."
+                "sentiment": ANY,
+                "advice": "",
+                "advice_status": "pending"
             }
         )
 
+    @patch("services.predict_service.PredictService.predict_batch")
+    @patch("services.vectordb_service.VectoredService.generate_advice", new_callable=AsyncMock)
+    def test_update_diary_entry_with_unchanged_content(self, mock_generate_advice, mock_predict):
+        original_data = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "Unchanged content",
+            "content_digest": content_digest("Unchanged content"),
+            "predicted_class_number": 3,
+            "prediction_class": "Depression",
+            "confidence": 0.85,
+            "confidence_scores": {"Depression": 0.85},
+            "advice": "Stored advice.",
+            "created": "2024-11-11T15:32:10.950881",
+            "updated": "2024-11-11T15:32:10.950881"
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(return_value=original_data)
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab",
+            json={"content": "Unchanged  content"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["advice"], "Stored advice.")
+        mock_predict.assert_not_called()
+        mock_generate_advice.assert_not_called()
+        app.diary_entry_service.update_diary_entry.assert_called_once_with(
+            "62d6b427-a606-4323-a675-2ed40108e1ab",
+            {
+                "content": "Unchanged  content",
+                "updated": ANY,
+                "content_digest": content_digest("Unchanged content")
+            }
+        )
+
+    @patch("services.predict_service.PredictService.predict_batch")
+    @patch("services.vectordb_service.VectoredService.stream_advice")
+    def test_stream_diary_entry_update(self, mock_stream_advice, mock_predict):
+        mock_predict.return_value = [(3, "Depression", 0.85, {"Depression": 0.85})]
+
+        async def stream_advice(prediction_class, content):
+            yield "token", "Take"
+            yield "token", " a walk."
+            yield "validation", {"similarity": 0.8, "accepted": True, "cached": False, "advice": "Take a walk."}
+
+        mock_stream_advice.side_effect = stream_advice
+        original_data = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "original content",
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(side_effect=lambda id, entry: {**original_data, **entry})
+        app.diary_entry_service.set_advice = AsyncMock(return_value=True)
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab/stream",
+            json={"content": "Streamed content"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [
+            (lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+            for lines in (block.split("\n") for block in response.text.strip().split("\n\n"))
+        ]
+        self.assertEqual([event for event, _ in events], ["prediction", "advice", "advice", "validation"])
+        self.assertEqual(events[0][1]["prediction_class"], "Depression")
+        self.assertEqual(events[0][1]["confidence"], 0.85)
+        self.assertIn("compound", events[0][1]["sentiment"])
+        self.assertEqual("".join(data["token"] for event, data in events if event == "advice"), "Take a walk.")
+        self.assertEqual(events[-1][1]["similarity"], 0.8)
+
+        mock_stream_advice.assert_called_once_with("Depression", "Streamed content")
+        app.diary_entry_service.set_advice.assert_awaited_once_with(
+            "62d6b427-a606-4323-a675-2ed40108e1ab", content_digest("Streamed content"), "Take a walk.", "ready"
+        )
+        # Streamed advice is not generated again in the background
+        app.advice_queue.submit.assert_not_called()
+
+    @patch("services.predict_service.PredictService.predict_batch")
+    @patch("services.vectordb_service.VectoredService.stream_advice")
+    def test_stream_diary_entry_update_failure_falls_back_to_the_queue(self, mock_stream_advice, mock_predict):
+        mock_predict.return_value = [(3, "Depression", 0.85, {"Depression": 0.85})]
+
+        async def stream_advice(prediction_class, content):
+            yield "token", "Take"
+            raise Exception("API Error")
+
+        mock_stream_advice.side_effect = stream_advice
+        original_data = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "original content",
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(side_effect=lambda id, entry: {**original_data, **entry})
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab/stream",
+            json={"content": "Streamed content"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("event: error", response.text)
+        self.assertNotIn("event: validation", response.text)
+        app.advice_queue.submit.assert_called_once_with({
+            "entry_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "content": "Streamed content",
+            "content_digest": content_digest("Streamed content"),
+            "prediction_class": "Depression",
+        })
+
+    @patch("services.predict_service.PredictService.predict_batch")
+    @patch("services.vectordb_service.VectoredService.stream_advice")
+    def test_stream_diary_entry_update_with_unchanged_content(self, mock_stream_advice, mock_predict):
+        original_data = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "Unchanged content",
+            "content_digest": content_digest("Unchanged content"),
+            "predicted_class_number": 3,
+            "prediction_class": "Depression",
+            "confidence": 0.85,
+            "confidence_scores": {"Depression": 0.85},
+            "advice": "Stored advice.",
+            "advice_status": "ready",
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(return_value=original_data)
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab/stream",
+            json={"content": "Unchanged content"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('event: advice\ndata: {"token": "Stored advice."}', response.text)
+        self.assertIn("event: validation", response.text)
+        mock_predict.assert_not_called()
+        mock_stream_advice.assert_not_called()
+
+    @patch("services.predict_service.PredictService.predict_batch")
+    @patch("services.vectordb_service.VectoredService.stream_advice")
+    def test_stream_diary_entry_update_with_unchanged_content_and_pending_advice(self, mock_stream_advice, mock_predict):
+        original_data = {
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "Unchanged content",
+            "content_digest": content_digest("Unchanged content"),
+            "predicted_class_number": 3,
+            "prediction_class": "Depression",
+            "confidence": 0.85,
+            "confidence_scores": {"Depression": 0.85},
+            "advice": "",
+            "advice_status": "pending",
+        }
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value=original_data)
+        app.diary_entry_service.update_diary_entry = AsyncMock(return_value=original_data)
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab/stream",
+            json={"content": "Unchanged content"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"advice_status": "pending"', response.text)
+        # The queued job is already generating the advice
+        mock_stream_advice.assert_not_called()
+        app.advice_queue.submit.assert_not_called()
+
+    @patch("services.predict_batcher.PredictBatcher.predict")
+    def test_stream_diary_entry_update_with_full_prediction_queue(self, mock_predict):
+        mock_predict.side_effect = QueueFullError("Prediction queue is full, please try again later")
+        app.diary_entry_service.find_diary_entry = AsyncMock(return_value={
+            "_id": "62d6b427-a606-4323-a675-2ed40108e1ab",
+            "author": "test_user_id",
+            "entry_date": "2024-11-11T15:32:10.950881",
+            "content": "original content",
+        })
+        app.diary_entry_service.update_diary_entry = AsyncMock()
+
+        response = client.put(
+            "/diary_entry/62d6b427-a606-4323-a675-2ed40108e1ab/stream",
+            json={"content": "Queued content"}
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["detail"], "Prediction queue is full, please try again later")
+        app.diary_entry_service.update_diary_entry.assert_not_called()
+
     @patch("services.diary_entry_service.DiaryEntryService.delete_diary_entry")
     def test_delete_diary_entry_success(self, mock_delete_diary_entry):
         mock_delete_diary_entry.return_value = None
@@ -239,6 +500,101 @@ class TestDiaryEntryRoutes(unittest.TestCase):
 
         mock_delete_diary_entry.assert_called_once_with("non-existing-id")
 
+    def test_dates_and_summary_read_daily_rollups(self):
+        today = datetime.now().date()
+        entries = [
+            {"author": "test_user_id", "entry_date": f"{today}T08:00:00", "prediction_class": "Anxiety"},
+            {"author": "test_user_id", "entry_date": f"{today}T20:00:00", "prediction_class": "Depression"},
+            {"author": "test_user_id", "entry_date": f"{today - timedelta(days=1)}T08:00:00", "prediction_class": ""},
+            {"author": "test_user_id", "entry_date": f"{today - timedelta(days=5)}T08:00:00", "prediction_class": "Off My Chest"},
+            {"author": "test_user_id", "entry_date": f"{today - timedelta(days=6)}T08:00:00", "prediction_class": "Bipolar"},
+            {"author": "test_user_id", "entry_date": f"{today - timedelta(days=7)}T08:00:00", "prediction_class": "Bipolar"},
+            {"author": "other_user_id", "entry_date": f"{today - timedelta(days=2)}T08:00:00", "prediction_class": "Anxiety"},
+        ]
+        for entry in entries:
+            asyncio.run(app.daily_rollup_service.record_entry(entry))
+
+        self.assertEqual(client.get("/diary_dates").json(), {
+            "dates": [str(today - timedelta(days=days)) for days in (0, 1, 5, 6, 7)]
+        })
+        self.assertEqual(client.get("/prediction_summary").json(), {"summary": {
+            str(today): 85,
+            str(today - timedelta(days=5)): 100,
+            str(today - timedelta(days=6)): 85,
+            str(today - timedelta(days=7)): 85,
+        }})
+
+    def test_streaks_read_user_streak_state(self):
+        today = datetime.now().date()
+        runs = []
+        for days in (0, 1, 5, 6, 7):
+            runs = add_run_day(runs, today - timedelta(days=days))
+        app.dependency_overrides[get_current_active_user] = lambda: {"_id": "test_user_id", "role": "user", "streak": streak_state(runs)}
+
+        self.assertEqual(client.get("/diary_streak").json(), {"streak": 2})
+        self.assertEqual(client.get("/max_diary_streak").json(), {"max_streak": 3})
+
+    def test_streaks_without_entries(self):
+        self.assertEqual(client.get("/diary_streak").json(), {"streak": 0})
+        self.assertEqual(client.get("/max_diary_streak").json(), {"max_streak": 0})
+
+    def test_export_diary_entries_only_exports_own_entries(self):
+        database = AsyncMongoMockClient()["test_db"]
+        app.export_service = ExportService(database, batch_size=1)
+        asyncio.run(database["diary_entries"].insert_many([
+            {"_id": "1", "author": "test_user_id", "entry_date": "2024-11-11T10:00:00", "content": "Mine"},
+            {"_id": "2", "author": "other_user_id", "entry_date": "2024-11-11T10:00:00", "content": "Not mine"},
+        ]))
+
+        response = client.get("/export/diary_entries?author=other_user_id")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line)["_id"] for line in response.text.splitlines()], ["1"])
+        self.assertEqual(client.get("/export/diary_entries?format=xml").status_code, 400)
+
+    @patch("services.predict_service.PredictService.predict_batch")
+    def test_import_diary_entries(self, mock_predict_batch):
+        mock_predict_batch.side_effect = lambda texts: [(3, "Depression", 0.8, {"Depression": 0.8}) for _ in texts]
+        database = AsyncMongoMockClient()["test_db"]
+        app.database = database
+        app.import_service = DiaryImportService(database["diary_entries"], predict_service)
+        app.daily_rollup_service = DailyRollupService(database["daily_rollups"])
+        app.streak_service = StreakService(database["users"])
+        app.admin_service = AdminService(database)
+        asyncio.run(database["users"].insert_one({"_id": "test_user_id", "username": "test", "role": "user"}))
+        today = datetime.now().date()
+        # An existing entry two days ago joins the imported days into one streak
+        existing = {"_id": "existing", "author": "test_user_id", "entry_date": f"{today - timedelta(days=2)}T10:00:00",
+                    "content": "Existing", "prediction_class": "Anxiety"}
+        asyncio.run(database["diary_entries"].insert_one(existing))
+        asyncio.run(app.daily_rollup_service.record_entry(existing))
+        asyncio.run(app.streak_service.add_day("test_user_id", today - timedelta(days=2)))
+        body = "\n".join([
+            json.dumps({"content": "First", "entry_date": f"{today - timedelta(days=1)}T10:00:00"}),
+            json.dumps({"content": "Second", "entry_date": f"{today}T10:00:00"}),
+            json.dumps({"content": "Third", "entry_date": f"{today}T18:00:00"}),
+            json.dumps({"entry_date": f"{today}T10:00:00"}),
+        ])
+
+        response = client.post("/diary_entry/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"inserted": 3, "class_counts": {"3": 3}, "errors": [ANY]})
+        self.assertEqual(response.json()["errors"][0]["row"], 3)
+        user = asyncio.run(database["users"].find_one({"_id": "test_user_id"}))
+        self.assertEqual(user["prediction_counts"]["depression_count"], 3)
+        self.assertEqual(user["streak"]["max_streak"], 3)
+        days = asyncio.run(app.daily_rollup_service.list_days("test_user_id"))
+        self.assertEqual([(day["entry_count"], day["class_counts"]) for day in days], [
+            (2, {"Depression": 2}), (1, {"Depression": 1}), (1, {"Anxiety": 1})
+        ])
+
+    def test_import_diary_entries_unsupported_media_type(self):
+        response = client.post("/diary_entry/import", content="content", headers={"Content-Type": "text/plain"})
+
+        self.assertEqual(response.status_code, 415)
+
 if __name__ == "__main__":
     unittest.main()
 
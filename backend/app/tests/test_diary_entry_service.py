@@ -1,95 +1,165 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from mongomock_motor import AsyncMongoMockClient
+from fastapi.encoders import jsonable_encoder
 from services.diary_entry_service import DiaryEntryService
 from models.diary_entry import DiaryEntry, DiaryEntryUpdate
+from tests.async_mongo_mock import pymongo_async_cursors
 
-class TestDiaryEntryService(unittest.TestCase):
+class TestDiaryEntryService(unittest.IsolatedAsyncioTestCase):
 
 
     def setUp(self):
-        self.mock_collection = MagicMock()
-        self.service = DiaryEntryService(collection=self.mock_collection)
+        self.collection = AsyncMongoMockClient()["test_db"]["diary_entries"]
+        self.service = DiaryEntryService(collection=self.collection)
+        cursors = pymongo_async_cursors()
+        cursors.start()
+        self.addCleanup(cursors.stop)
 
-    def test_create_diary_entry(self):
-        sample_entry = DiaryEntry(author="Test Author", content="Sample diary content")
-        self.mock_collection.insert_one.return_value.inserted_id = "1234"
-        self.mock_collection.find_one.return_value = sample_entry
+    async def test_create_diary_entry(self):
+        sample_entry = jsonable_encoder(DiaryEntry(author="Test Author", content="Sample diary content"))
 
-        result = self.service.create_diary_entry(sample_entry)
+        result = await self.service.create_diary_entry(sample_entry)
 
-        self.mock_collection.insert_one.assert_called_once_with(sample_entry)
-        self.mock_collection.find_one.assert_called_once_with({"_id": "1234"})
         self.assertEqual(result, sample_entry)
+        self.assertEqual(await self.collection.count_documents({}), 1)
 
-    def test_list_diary_entries(self):
+    async def test_list_diary_entries(self):
         sample_entries = [
-            {"created": "2024-11-11T10:00:00", "content": "Entry 1"},
-            {"created": "2024-11-10T10:00:00", "content": "Entry 2"}
+            {"_id": "1", "author": "user_id", "created": "2024-11-10T10:00:00", "content": "Entry 2"},
+            {"_id": "2", "author": "user_id", "created": "2024-11-11T10:00:00", "content": "Entry 1"},
+            {"_id": "3", "author": "other_user_id", "created": "2024-11-12T10:00:00", "content": "Entry 3"}
         ]
-        current_user = {"_id": "user_id", "role": "admin"}  
-        self.mock_collection.find.return_value = sample_entries
-
-        result = self.service.list_diary_entries(current_user)
-
-        self.mock_collection.find.assert_called_once_with(limit=100)
-        self.assertEqual(result, sorted(sample_entries, key=lambda x: x['created'], reverse=True))
-
-    def test_find_diary_entry(self):
+        await self.collection.insert_many(sample_entries)
+
+        admin_result = await self.service.list_diary_entries({"_id": "admin_id", "role": "admin"})
+        user_result = await self.service.list_diary_entries({"_id": "user_id", "role": "user"})
+
+        self.assertEqual([entry["_id"] for entry in admin_result], ["3", "2", "1"])
+        self.assertEqual([entry["_id"] for entry in user_result], ["2", "1"])
+
+    async def test_list_diary_entries_page(self):
+        # Two entries share a created timestamp, so the _id tie-break must keep them apart
+        await self.collection.insert_many([
+            {"_id": f"{i}", "author": "user_id", "created": f"2024-11-{10 + i // 2:02d}T10:00:00", "content": f"Entry {i}", "advice": "Advice"}
+            for i in range(5)
+        ] + [{"_id": "9", "author": "other_user_id", "created": "2024-11-20T10:00:00", "content": "Other"}])
+        user = {"_id": "user_id", "role": "user"}
+
+        ids = []
+        cursor = None
+        while True:
+            entries, cursor = await self.service.list_diary_entries_page(user, page_size=2, cursor=cursor)
+            self.assertLessEqual(len(entries), 2)
+            ids += [entry["_id"] for entry in entries]
+            if cursor is None:
+                break
+
+        self.assertEqual(ids, ["4", "3", "2", "1", "0"])
+
+    async def test_list_diary_entries_page_projection(self):
+        await self.collection.insert_one(
+            {"_id": "1", "author": "user_id", "created": "2024-11-10T10:00:00", "entry_date": "2024-11-10T10:00:00", "content": "Entry", "advice": "Advice"}
+        )
+
+        entries, next_cursor = await self.service.list_diary_entries_page(
+            {"_id": "user_id", "role": "user"}, fields=["entry_date"]
+        )
+
+        self.assertEqual(entries, [{"_id": "1", "created": "2024-11-10T10:00:00", "entry_date": "2024-11-10T10:00:00"}])
+        self.assertIsNone(next_cursor)
+
+    async def test_list_diary_entries_page_rejects_invalid_arguments(self):
+        user = {"_id": "user_id", "role": "user"}
+
+        with self.assertRaises(ValueError):
+            await self.service.list_diary_entries_page(user, page_size=0)
+        with self.assertRaises(ValueError):
+            await self.service.list_diary_entries_page(user, page_size=101)
+        with self.assertRaises(ValueError):
+            await self.service.list_diary_entries_page(user, fields=["password"])
+        with self.assertRaises(ValueError):
+            await self.service.list_diary_entries_page(user, cursor="not-a-cursor")
+
+    async def test_find_diary_entry(self):
         sample_id = "1234"
         sample_entry = {"_id": sample_id, "content": "Sample diary content"}
-        self.mock_collection.find_one.return_value = sample_entry
+        await self.collection.insert_one(sample_entry)
 
-        result = self.service.find_diary_entry(sample_id)
+        result = await self.service.find_diary_entry(sample_id)
 
-        self.mock_collection.find_one.assert_called_once_with({"_id": sample_id})
         self.assertEqual(result, sample_entry)
+        self.assertIsNone(await self.service.find_diary_entry("missing"))
 
-    def test_update_diary_entry(self):
+    async def test_update_diary_entry(self):
         sample_id = "1234"
+        await self.collection.insert_one({"_id": sample_id, "content": "Original content"})
         sample_update = DiaryEntryUpdate(content="Updated content")
 
-        update_data = sample_update.dict(exclude_unset=True)
-
-        self.mock_collection.update_one.return_value.modified_count = 1
-        self.mock_collection.find_one.return_value = update_data
+        update_data = jsonable_encoder(sample_update.dict(exclude_unset=True))
 
-        result = self.service.update_diary_entry(sample_id, update_data)
+        result = await self.service.update_diary_entry(sample_id, update_data)
 
-        self.mock_collection.update_one.assert_called_once_with({"_id": sample_id}, {"$set": update_data})
-        self.mock_collection.find_one.assert_called_once_with({"_id": sample_id})
-        self.assertEqual(result, update_data)
+        self.assertEqual(result, {"_id": sample_id, **update_data})
 
-    def test_update_diary_entry_not_found(self):
+    async def test_update_diary_entry_not_found(self):
         sample_id = "1234"
         sample_update = DiaryEntryUpdate(content="Updated content")
 
         update_data = sample_update.dict(exclude_unset=True)
 
-        self.mock_collection.update_one.return_value.modified_count = 0
-
         with self.assertRaises(Exception) as context:
-            self.service.update_diary_entry(sample_id, update_data)
+            await self.service.update_diary_entry(sample_id, update_data)
 
         self.assertTrue("Diary Entry with ID 1234 not found" in str(context.exception))
 
-    def test_delete_diary_entry(self):
+    async def test_set_advice_skips_stale_content(self):
+        await self.collection.insert_one({"_id": "1", "content_digest": "new", "advice": "", "advice_status": "pending"})
+
+        self.assertFalse(await self.service.set_advice("1", "old", "Stale advice", "ready"))
+        self.assertEqual([entry["_id"] async for entry in self.service.pending_advice()], ["1"])
+        self.assertTrue(await self.service.set_advice("1", "new", "Advice", "ready"))
+
+        self.assertEqual(
+            await self.collection.find_one({"_id": "1"}),
+            {"_id": "1", "content_digest": "new", "advice": "Advice", "advice_status": "ready"}
+        )
+        self.assertEqual([entry async for entry in self.service.pending_advice()], [])
+
+    async def test_delete_diary_entry(self):
         sample_id = "1234"
-        self.mock_collection.delete_one.return_value.deleted_count = 1
+        await self.collection.insert_one({"_id": sample_id, "content": "Sample diary content"})
 
-        result = self.service.delete_diary_entry(sample_id)
+        result = await self.service.delete_diary_entry(sample_id)
 
-        self.mock_collection.delete_one.assert_called_once_with({"_id": sample_id})
         self.assertEqual(result.deleted_count, 1)
+        self.assertEqual(await self.collection.count_documents({}), 0)
 
-    def test_delete_diary_entry_not_found(self):
+    async def test_delete_diary_entry_not_found(self):
         sample_id = "1234"
-        self.mock_collection.delete_one.return_value.deleted_count = 0
 
         with self.assertRaises(Exception) as context:
-            self.service.delete_diary_entry(sample_id)
+            await self.service.delete_diary_entry(sample_id)
 
         self.assertTrue("Diary Entry with ID 1234 not found" in str(context.exception))
 
+    async def test_get_prediction_summary(self):
+        await self.collection.insert_many([
+            {"_id": "1", "author": "user_id", "predicted_class_number": 1},
+            {"_id": "2", "author": "user_id", "predicted_class_number": 1},
+            {"_id": "3", "author": "user_id", "predicted_class_number": 3}
+        ])
+
+        summary = await self.service.get_prediction_summary()
+
+        self.assertEqual(summary, [{
+            "username": "user_id",
+            "anxiety_count": 0,
+            "suicide_count": 2,
+            "bipolar_count": 0,
+            "depression_count": 1,
+            "other_count": 0
+        }])
+
 
 if __name__ == '__main__':
     unittest.main()
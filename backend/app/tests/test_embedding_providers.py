@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+from unittest.mock import AsyncMock, patch
+from services.embedding_providers import (
+    OpenAIEmbeddingProvider, SentenceTransformerEmbeddingProvider, create_embedding_provider
+)
+from services.openai_service import OpenAIService
+
+def fake_encode(texts, **kwargs):
+    return np.array([[len(text), 1.0] for text in texts])
+
+class TestEmbeddingProviders(unittest.IsolatedAsyncioTestCase):
+
+    def test_create_embedding_provider(self):
+        self.assertIsInstance(create_embedding_provider("openai"), OpenAIEmbeddingProvider)
+        local = create_embedding_provider("sentence-transformers", model_name="local-model", batch_size=8,
+                                          similarity_threshold=0.4)
+        self.assertEqual(local.name, "sentence-transformers:local-model")
+        self.assertEqual((local.batch_size, local.similarity_threshold), (8, 0.4))
+        with self.assertRaises(ValueError):
+            create_embedding_provider("unknown")
+
+    @patch("services.embedding_providers.SentenceTransformer")
+    async def test_local_model_is_loaded_once_and_encodes_in_batches(self, MockTransformer):
+        MockTransformer.return_value.encode.side_effect = fake_encode
+        provider = SentenceTransformerEmbeddingProvider("local-model", batch_size=16)
+
+        first = await provider.embed(["a", "bb"])
+        await provider.embed(["ccc"])
+
+        MockTransformer.assert_called_once_with("local-model", device=None)
+        self.assertEqual(first.tolist(), [[1.0, 1.0], [2.0, 1.0]])
+        _, kwargs = MockTransformer.return_value.encode.call_args
+        self.assertEqual(kwargs["batch_size"], 16)
+        self.assertTrue(kwargs["normalize_embeddings"])
+
+    @patch("services.embedding_providers.SentenceTransformer")
+    async def test_local_reference_embeddings_are_computed_once_per_suggestions(self, MockTransformer):
+        MockTransformer.return_value.encode.side_effect = fake_encode
+        provider = SentenceTransformerEmbeddingProvider("local-model")
+        related_data = {"suggestions": ["Rest", "Talk to a friend"], "$vector": [0.5] * 1536}
+
+        references = await provider.reference_embeddings(related_data)
+        await provider.reference_embeddings(dict(related_data))
+
+        np.testing.assert_allclose(references, [[4.0, 1.0] / np.sqrt(17), [16.0, 1.0] / np.sqrt(257)], rtol=1e-6)
+        self.assertEqual(references.dtype, np.float32)
+        self.assertEqual(MockTransformer.return_value.encode.call_count, 1)
+
+    async def test_openai_reference_embeddings_use_stored_vector(self):
+        provider = OpenAIEmbeddingProvider()
+
+        stored = np.array([[0.6, 0.8]], dtype=np.float32)
+
+        references = await provider.reference_embeddings({"suggestions": ["Rest"], "$vector": [3.0, 4.0]})
+
+        np.testing.assert_allclose(references, [[0.6, 0.8]], rtol=1e-6)
+        self.assertIs(await provider.reference_embeddings({"$vector": stored}), stored)
+
+    async def test_openai_embeds_with_one_request(self):
+        provider = OpenAIEmbeddingProvider()
+        with patch.object(OpenAIService, "create_embeddings", AsyncMock(return_value=np.ones((2, 3)))) as mock_create:
+            embeddings = await provider.embed(["first", "second"])
+
+        mock_create.assert_awaited_once_with(["first", "second"], model="text-embedding-ada-002")
+        self.assertEqual(embeddings.shape, (2, 3))
+
+    async def test_openai_embeds_suggestions_without_stored_vector(self):
+        provider = OpenAIEmbeddingProvider()
+        with patch.object(OpenAIService, "create_embeddings", AsyncMock(return_value=np.ones((1, 3)))) as mock_create:
+            references = await provider.reference_embeddings({"suggestions": ["Rest"], "$vector": None})
+            await provider.reference_embeddings({"suggestions": ["Rest"], "$vector": None})
+
+        mock_create.assert_awaited_once_with(["Rest"], model="text-embedding-ada-002")
+        self.assertEqual(references.shape, (1, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import unittest
+from datetime import date
+from mongomock_motor import AsyncMongoMockClient
+from services.export_service import ExportService, DIARY_ENTRY_FIELDS
+
+class TestExportService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.database = AsyncMongoMockClient()["test_db"]
+        self.service = ExportService(self.database, batch_size=2)
+        await self.database["diary_entries"].insert_many([
+            {"_id": str(i), "author": f"user{i % 2}", "entry_date": f"2024-11-{i + 1:02d}T10:00:00", "content": f"Entry {i}",
+             "predicted_class_number": i % 3, "confidence_scores": {"Anxiety": 0.5}}
+            for i in range(5)
+        ])
+
+    async def collect(self, chunks):
+        return [chunk async for chunk in chunks]
+
+    async def test_export_ndjson_in_batches(self):
+        chunks = await self.collect(self.service.export_diary_entries({}, "ndjson"))
+
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        self.assertEqual([row["_id"] for row in rows], ["0", "1", "2", "3", "4"])
+        self.assertEqual(list(rows[0]), DIARY_ENTRY_FIELDS)
+        self.assertEqual(rows[0]["confidence_scores"], {"Anxiety": 0.5})
+        self.assertIsNone(rows[0]["advice"])
+
+    async def test_export_csv(self):
+        chunks = await self.collect(self.service.export_diary_entries({}, "csv"))
+
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1]["content"], "Entry 1")
+        self.assertEqual(json.loads(rows[1]["confidence_scores"]), {"Anxiety": 0.5})
+
+    async def test_diary_entry_filter(self):
+        query = self.service.diary_entry_filter("user0", date(2024, 11, 2), date(2024, 11, 5), 1)
+
+        self.assertEqual(query, {
+            "author": "user0",
+            "entry_date": {"$gte": "2024-11-02", "$lt": "2024-11-06"},
+            "predicted_class_number": 1,
+        })
+        rows = "".join(await self.collect(self.service.export_diary_entries(
+            self.service.diary_entry_filter(start_date=date(2024, 11, 2), end_date=date(2024, 11, 4))
+        )))
+        self.assertEqual([json.loads(line)["_id"] for line in rows.splitlines()], ["1", "2", "3"])
+
+    async def test_export_user_summaries(self):
+        await self.database["users"].insert_many([
+            {"_id": "u1", "username": "user1", "role": "user", "prediction_counts": {"suicide_count": 2}},
+            {"_id": "a1", "username": "admin", "role": "admin"},
+        ])
+
+        rows = list(csv.DictReader(io.StringIO("".join(await self.collect(self.service.export_user_summaries("csv"))))))
+
+        self.assertEqual(rows, [{
+            "user_id": "u1", "username": "user1", "anxiety_count": "0", "suicide_count": "2",
+            "bipolar_count": "0", "depression_count": "0", "other_count": "0"
+        }])
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            self.service.export_diary_entries({}, "xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
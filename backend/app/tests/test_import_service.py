@@ -0,0 +1,96 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+from mongomock_motor import AsyncMongoMockClient
+from services.import_service import DiaryImportService
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+from utils.json_stream import iter_json_array, iter_ndjson
+
+async def stream(data: bytes, chunk_size=7):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def fake_predict_batch(texts):
+    return [(1, "Suicide Watch", 0.9, {"Suicide Watch": 0.9}) if "sad" in text else (0, "Anxiety", 0.8, {"Anxiety": 0.8}) for text in texts]
+
+class TestDiaryImportService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.collection = AsyncMongoMockClient()["test_db"]["diary_entries"]
+        self.predict_service = MagicMock()
+        self.predict_service.predict_batch.side_effect = fake_predict_batch
+        self.service = DiaryImportService(self.collection, self.predict_service, chunk_size=3, predict_batch_size=2, max_rows=100)
+
+    async def test_import_json_array_in_chunks(self):
+        rows = [{"content": f"I am sad {i}" if i % 2 else f"I am fine {i}", "entry_date": f"2024-11-{i + 1:02d}T10:00:00"} for i in range(7)]
+
+        report = await self.service.import_entries(iter_json_array(stream(json.dumps(rows).encode())), "user_id")
+
+        self.assertEqual(report["days"].pop("2024-11-02"), {"entry_count": 1, "class_counts": {"Suicide Watch": 1}})
+        self.assertEqual(len(report.pop("days")), 6)
+        self.assertEqual(report, {"inserted": 7, "class_counts": {0: 4, 1: 3}, "errors": []})
+        # 3 chunks of at most 3 rows, classified in batches of at most 2
+        self.assertEqual([len(call.args[0]) for call in self.predict_service.predict_batch.call_args_list], [2, 1, 2, 1, 1])
+        entries = await self.collection.find({}, sort=[("entry_date", 1)]).to_list(None)
+        self.assertEqual(len(entries), 7)
+        self.assertEqual(entries[1]["prediction_class"], "Suicide Watch")
+        self.assertEqual(entries[1]["author"], "user_id")
+        self.assertEqual(entries[1]["entry_date"], "2024-11-02T10:00:00")
+        self.assertIsNotNone(entries[1]["content_digest"])
+
+    async def test_import_reports_row_errors(self):
+        lines = [
+            json.dumps({"content": "I am fine"}),
+            "{not json}",
+            json.dumps({"entry_date": "2024-11-01"}),
+            json.dumps(["not", "an", "object"]),
+            json.dumps({"content": "I am sad", "author": "someone_else", "advice": "ignored"}),
+        ]
+
+        report = await self.service.import_entries(iter_ndjson(stream("\n".join(lines).encode())), "user_id")
+
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual([error["row"] for error in report["errors"]], [1, 2, 3])
+        self.assertIn("Invalid JSON", report["errors"][0]["error"])
+        self.assertIn("content", report["errors"][1]["error"])
+        entry = await self.collection.find_one({"content": "I am sad"})
+        self.assertEqual(entry["author"], "user_id")
+        self.assertEqual(entry["advice"], "")
+
+    async def test_import_stores_the_sentiment(self):
+        self.service.sentiment_service = SentimentService(ResourceRegistry())
+        data = "\n".join([
+            json.dumps({"content": "I am sad and miserable", "sentiment": {"compound": 1.0}}),
+            json.dumps({"content": "I am happy"}),
+        ]).encode()
+
+        await self.service.import_entries(iter_ndjson(stream(data)), "user_id")
+
+        sad = await self.collection.find_one({"content": "I am sad and miserable"})
+        happy = await self.collection.find_one({"content": "I am happy"})
+        self.assertLess(sad["sentiment"]["compound"], 0)
+        self.assertGreater(happy["sentiment"]["compound"], 0)
+
+    async def test_import_stops_at_max_rows(self):
+        self.service.max_rows = 2
+        data = "\n".join(json.dumps({"content": f"Entry {i}"}) for i in range(4)).encode()
+
+        report = await self.service.import_entries(iter_ndjson(stream(data)), "user_id")
+
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(report["errors"], [{"row": 2, "error": "Import is limited to 2 rows"}])
+
+    async def test_classification_failure_rejects_chunk(self):
+        self.predict_service.predict_batch.side_effect = RuntimeError("model unavailable")
+        data = json.dumps([{"content": "Entry"}]).encode()
+
+        report = await self.service.import_entries(iter_json_array(stream(data)), "user_id")
+
+        self.assertEqual(report["inserted"], 0)
+        self.assertEqual(report["errors"], [{"row": 0, "error": "Classification failed: model unavailable"}])
+        self.assertEqual(await self.collection.count_documents({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import unittest
+import uuid
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import AsyncMongoClient
+from services.index_service import IndexService, REQUIRED_INDEXES, uses_index, winning_plan_stages
+from tests.async_mongo_mock import pymongo_async_cursors
+
+def explain_result(winning_plan):
+    return {"queryPlanner": {"winningPlan": winning_plan}}
+
+class TestIndexService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.database = AsyncMongoMockClient()["test_db"]
+        self.service = IndexService(self.database)
+        cursors = pymongo_async_cursors()
+        cursors.start()
+        self.addCleanup(cursors.stop)
+
+    async def test_reconcile_creates_missing_indexes(self):
+        missing = await self.service.missing_indexes()
+        self.assertEqual(
+            {name: [index.document["name"] for index in indexes] for name, indexes in missing.items()},
+            {name: [index.document["name"] for index in indexes] for name, indexes in REQUIRED_INDEXES.items()}
+        )
+
+        changes = await self.service.reconcile()
+
+        self.assertEqual(changes["created"]["users"], ["username", "role_suicide_count"])
+        self.assertEqual(
+            changes["created"]["diary_entries"],
+            ["author_created_id", "author_entry_date", "created_id", "predicted_class_number", "advice_pending"]
+        )
+        self.assertEqual(await self.service.missing_indexes(), {})
+        self.assertEqual(await self.service.reconcile(), {"created": {}, "failed": {}})
+
+    async def test_reconcile_reuses_index_with_other_name(self):
+        await self.database["users"].create_index("username", name="by_username", unique=True)
+
+        changes = await self.service.reconcile()
+
+        self.assertEqual(changes["created"]["users"], ["role_suicide_count"])
+
+    async def test_report(self):
+        await self.database["diary_entries"].create_index("content", name="content")
+        await self.service.reconcile()
+
+        report = await self.service.report()
+
+        self.assertEqual(report["missing"], {})
+        self.assertEqual(report["undeclared"], {"diary_entries": ["content"]})
+        # mongomock does not implement $indexStats
+        self.assertIsNone(report["unused"])
+
+    def test_uses_index(self):
+        index_scan = explain_result({
+            "stage": "LIMIT",
+            "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "author_created_id"}}
+        })
+        collection_scan = explain_result({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}})
+        sbe_index_scan = explain_result({"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}, "slotBasedPlan": {}})
+
+        self.assertEqual(winning_plan_stages(index_scan), ["LIMIT", "FETCH", "IXSCAN"])
+        self.assertTrue(uses_index(index_scan))
+        self.assertFalse(uses_index(collection_scan))
+        self.assertTrue(uses_index(sbe_index_scan))
+        self.assertTrue(uses_index(explain_result({"stage": "EXPRESS_IXSCAN"})))
+
+@unittest.skipUnless(os.getenv("MONGO_TEST_URI"), "MONGO_TEST_URI is not set")
+class TestIndexServiceQueryPlans(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs the hot queries through the query planner of a real server.
+    """
+    async def asyncSetUp(self):
+        self.client = AsyncMongoClient(os.getenv("MONGO_TEST_URI"))
+        self.database = self.client[f"test_index_service_{uuid.uuid4().hex}"]
+        self.service = IndexService(self.database)
+        await self.database["diary_entries"].insert_many([
+            {"_id": str(i), "author": f"user{i % 10}", "created": f"2024-11-{i % 28 + 1:02d}T10:00:00",
+             "entry_date": f"2024-11-{i % 28 + 1:02d}T10:00:00", "predicted_class_number": i % 5}
+            for i in range(200)
+        ])
+        await self.database["users"].insert_many([{"_id": str(i), "username": f"user{i}", "role": "user"} for i in range(10)])
+
+    async def asyncTearDown(self):
+        await self.client.drop_database(self.database.name)
+        await self.client.close()
+
+    async def test_hot_queries_use_indexes(self):
+        await self.service.reconcile()
+
+        results = await self.service.check_hot_queries()
+
+        for result in results:
+            self.assertTrue(result["uses_index"], result)
+
+    async def test_hot_queries_scan_without_indexes(self):
+        results = await self.service.check_hot_queries()
+
+        self.assertFalse(any(result["uses_index"] for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import torch
+from transformers import RobertaConfig, RobertaForSequenceClassification
+from utils.inference_backends import TorchScriptBackend, OnnxRuntimeBackend, export_torchscript, export_onnx
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+'''
+Checks that the exported backends return the same logits as the eager model
+pytest tests/test_inference_backends.py
+'''
+class TestInferenceBackends(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        config = RobertaConfig(
+            vocab_size=1000,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            intermediate_size=64,
+            max_position_embeddings=300,
+            num_labels=5
+        )
+        cls.model = RobertaForSequenceClassification(config)
+        cls.model.eval()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+        cls.input_ids = torch.randint(3, 1000, (3, 40))
+        cls.attention_mask = torch.ones_like(cls.input_ids)
+        cls.attention_mask[0, 25:] = 0
+        with torch.no_grad():
+            cls.expected_logits = cls.model(input_ids=cls.input_ids, attention_mask=cls.attention_mask).logits
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def assert_logits_match(self, backend):
+        logits = backend(input_ids=self.input_ids, attention_mask=self.attention_mask).logits
+
+        self.assertEqual(logits.shape, self.expected_logits.shape)
+        self.assertTrue(torch.allclose(logits, self.expected_logits, atol=1e-4))
+
+    def test_torchscript_parity(self):
+        path = export_torchscript(self.model, os.path.join(self.tmp_dir.name, "model.pt"))
+
+        self.assert_logits_match(TorchScriptBackend(path))
+
+    @unittest.skipIf(onnxruntime is None, "onnxruntime is not installed")
+    def test_onnxruntime_parity(self):
+        path = export_onnx(self.model, os.path.join(self.tmp_dir.name, "model.onnx"))
+
+        self.assert_logits_match(OnnxRuntimeBackend(path))
+
+    @unittest.skipIf(onnxruntime is None, "onnxruntime is not installed")
+    def test_optimized_onnxruntime_parity(self):
+        path = export_onnx(self.model, os.path.join(self.tmp_dir.name, "model_optimized.onnx"), optimize=True)
+
+        self.assert_logits_match(OnnxRuntimeBackend(path))
+
+    @unittest.skipIf(onnxruntime is None, "onnxruntime is not installed")
+    def test_export_leaves_model_in_eval_mode(self):
+        export_onnx(self.model, os.path.join(self.tmp_dir.name, "model_eval.onnx"))
+
+        self.assertFalse(self.model.training)
+
+
+if __name__ == "__main__":
+    unittest.main()
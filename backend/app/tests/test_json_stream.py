@@ -0,0 +1,73 @@
+import json
+import unittest
+from utils.json_stream import iter_json_array, iter_ndjson
+
+async def stream(data: bytes, chunk_size=3):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+async def collect(values):
+    return [value async for value in values]
+
+class TestJsonStream(unittest.IsolatedAsyncioTestCase):
+
+    async def test_json_array_elements(self):
+        data = json.dumps([{"a": 1}, 12345, "x", [1, 2]], indent=1).encode() + b"\n"
+
+        values = await collect(iter_json_array(stream(data)))
+
+        self.assertEqual(values, [(0, {"a": 1}, None), (1, 12345, None), (2, "x", None), (3, [1, 2], None)])
+
+    async def test_empty_json_array(self):
+        self.assertEqual(await collect(iter_json_array(stream(b" [ ] "))), [])
+
+    async def test_malformed_json_arrays_are_rejected(self):
+        cases = {
+            b"[1 2]": [(0, 1, None), (1, None, "Invalid JSON: expected ',' or ']' after an element")],
+            b'[{"a":1}{"b":2}]': [(0, {"a": 1}, None), (1, None, "Invalid JSON: expected ',' or ']' after an element")],
+            b"[1,,2]": [(0, 1, None), (1, None, "Invalid JSON: expected an element before ','")],
+            b"[,1]": [(0, None, "Invalid JSON: expected an element before ','")],
+            b"[1,]": [(0, 1, None), (1, None, "Invalid JSON: trailing comma before ']'")],
+            b"[1] trailing garbage": [(0, 1, None), (1, None, "Invalid JSON: unexpected data after the end of the array")],
+            b"[1, 2": [(0, 1, None), (1, 2, None), (2, None, "Unexpected end of JSON array")],
+            b'{"a": 1}': [(0, None, "Expected a JSON array")],
+        }
+        for data, expected in cases.items():
+            for chunk_size in (1, 4, 100):
+                with self.subTest(data=data, chunk_size=chunk_size):
+                    self.assertEqual(await collect(iter_json_array(stream(data, chunk_size))), expected)
+
+    async def test_json_array_element_larger_than_limit_ends_the_stream(self):
+        data = b'["short", "' + b"x" * 1000 + b'"]'
+
+        values = await collect(iter_json_array(stream(data, 16), max_row_bytes=100))
+
+        self.assertEqual(values, [(0, "short", None), (1, None, "Row is larger than 100 bytes")])
+
+    async def test_json_array_limit_counts_bytes(self):
+        element = json.dumps("é" * 40, ensure_ascii=False).encode()
+
+        self.assertEqual((await collect(iter_json_array(stream(b"[" + element + b"]"), max_row_bytes=100)))[0][2], None)
+        self.assertEqual(
+            (await collect(iter_json_array(stream(b"[" + element + b"]"), max_row_bytes=60)))[0][2],
+            "Row is larger than 60 bytes"
+        )
+
+    async def test_ndjson_lines(self):
+        data = b'{"a": 1}\n\nnot json\n[2]'
+
+        values = await collect(iter_ndjson(stream(data)))
+
+        self.assertEqual([(row, value) for row, value, _ in values], [(0, {"a": 1}), (1, None), (2, [2])])
+        self.assertTrue(values[1][2].startswith("Invalid JSON"))
+
+    async def test_ndjson_line_larger_than_limit_ends_the_stream(self):
+        data = b'{"a": 1}\n"' + b"x" * 1000
+
+        values = await collect(iter_ndjson(stream(data, 16), max_row_bytes=100))
+
+        self.assertEqual(values, [(0, {"a": 1}, None), (1, None, "Row is larger than 100 bytes")])
+
+
+if __name__ == "__main__":
+    unittest.main()
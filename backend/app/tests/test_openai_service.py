@@ -1,6 +1,9 @@
+import os
+import socket
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from services.openai_service import OpenAIService
+from scripts.fake_llm_server import DEFAULT_SETTINGS, REPLIES, start_in_thread
 
 '''
 pytest tests/test_openai_service.py 
@@ -44,6 +47,95 @@ class TestOpenAIService(unittest.TestCase):
 
         self.assertIn("Error: API Error", result)
 
+class TestOpenAIServiceAsync(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.service = OpenAIService()
+
+    async def test_generate_response_async(self):
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(message=MagicMock(content=" Test response "))]
+        with patch.object(self.service.async_client.chat.completions, "create", AsyncMock(return_value=mock_response)) as mock_create:
+            result = await self.service.generate_response_async("Hello", 50, 0.5)
+
+        mock_create.assert_awaited_once_with(
+            model="gpt-4o-mini",
+            messages=[{"role": "system", "content": "Hello"}],
+            max_completion_tokens=50,
+            temperature=0.5
+        )
+        self.assertEqual(result, "Test response")
+
+    async def test_generate_response_async_raises(self):
+        with patch.object(self.service.async_client.chat.completions, "create", AsyncMock(side_effect=Exception("API Error"))):
+            with self.assertRaises(Exception):
+                await self.service.generate_response_async("Hello")
+
+    async def test_stream_response_async(self):
+        chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=content))]) for content in ["Take", None, " a walk."]]
+
+        class Stream:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            async def __aiter__(self):
+                for chunk in chunks:
+                    yield chunk
+
+        with patch.object(self.service.async_client.chat.completions, "create", AsyncMock(return_value=Stream())) as mock_create:
+            tokens = [token async for token in self.service.stream_response_async("Hello", 50, 0.5)]
+
+        self.assertEqual(tokens, ["Take", " a walk."])
+        mock_create.assert_awaited_once_with(
+            model="gpt-4o-mini",
+            messages=[{"role": "system", "content": "Hello"}],
+            max_completion_tokens=50,
+            temperature=0.5,
+            stream=True
+        )
+
+    async def test_create_embeddings_in_one_request(self):
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(index=1, embedding=[0.0, 1.0]), MagicMock(index=0, embedding=[1.0, 0.0])]
+        with patch.object(self.service.async_client.embeddings, "create", AsyncMock(return_value=mock_response)) as mock_create:
+            result = await self.service.create_embeddings(["first", "second"])
+
+        mock_create.assert_awaited_once_with(input=["first", "second"], model="text-embedding-ada-002")
+        self.assertEqual(result.tolist(), [[1.0, 0.0], [0.0, 1.0]])
+
+
+class TestOpenAIServiceFakeServer(unittest.IsolatedAsyncioTestCase):
+    """
+    Streams from scripts/fake_llm_server.py, so no OpenAI account or network is needed.
+    """
+    @classmethod
+    def setUpClass(cls):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        settings = dict(DEFAULT_SETTINGS, chat_latency=0.05, token_latency=0.01, jitter=0)
+        cls.server = start_in_thread(settings, port=port)
+        cls.environment = patch.dict(os.environ, {"OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1"})
+        cls.environment.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.environment.stop()
+        cls.server.should_exit = True
+
+    async def test_stream_response_async_yields_words_as_they_arrive(self):
+        service = OpenAIService()
+        try:
+            tokens = [token async for token in service.stream_response_async("Hello")]
+        finally:
+            await service.close()
+
+        self.assertGreater(len(tokens), 1)
+        self.assertIn("".join(tokens).rsplit(" (", 1)[0], REPLIES)
+
 
 if __name__ == "__main__":
     unittest.main()
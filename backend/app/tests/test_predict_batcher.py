@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+from services.predict_batcher import PredictBatcher, QueueFullError
+
+def fake_result(text):
+    return (0, "Anxiety", 0.9, {"Anxiety": 0.9})
+
+class TestPredictBatcher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_predict_service = MagicMock()
+        self.mock_predict_service.predict_batch.side_effect = lambda texts: [fake_result(text) for text in texts]
+
+    async def asyncTearDown(self):
+        await self.batcher.stop()
+
+    async def test_concurrent_requests_share_one_batch(self):
+        self.batcher = PredictBatcher(self.mock_predict_service, max_batch_size=8, max_wait_ms=50)
+
+        results = await asyncio.gather(*[self.batcher.predict(f"entry {i}") for i in range(5)])
+
+        self.assertEqual(len(results), 5)
+        self.mock_predict_service.predict_batch.assert_called_once_with([f"entry {i}" for i in range(5)])
+        self.assertEqual(self.batcher.stats()["batch_count"], 1)
+
+    async def test_batch_is_capped_at_max_batch_size(self):
+        self.batcher = PredictBatcher(self.mock_predict_service, max_batch_size=2, max_wait_ms=50)
+
+        await asyncio.gather(*[self.batcher.predict(f"entry {i}") for i in range(5)])
+
+        batch_sizes = [len(call.args[0]) for call in self.mock_predict_service.predict_batch.call_args_list]
+        self.assertEqual(batch_sizes, [2, 2, 1])
+
+    async def test_rejects_when_queue_is_full(self):
+        self.batcher = PredictBatcher(self.mock_predict_service, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+
+        results = await asyncio.gather(*[self.batcher.predict(f"entry {i}") for i in range(3)], return_exceptions=True)
+
+        self.assertTrue(any(isinstance(result, QueueFullError) for result in results))
+        self.assertGreaterEqual(self.batcher.stats()["rejected_count"], 1)
+
+    async def test_failure_is_propagated_to_every_caller(self):
+        self.mock_predict_service.predict_batch.side_effect = RuntimeError("model failure")
+        self.batcher = PredictBatcher(self.mock_predict_service, max_batch_size=4, max_wait_ms=20)
+
+        results = await asyncio.gather(*[self.batcher.predict(f"entry {i}") for i in range(2)], return_exceptions=True)
+
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -70,6 +70,85 @@ class TestPredictService(unittest.TestCase):
         for label, expected_score in expected_scores.items():
             self.assertAlmostEqual(confidence_scores[label], expected_score, places=2)
 
+    def test_bucket_length(self):
+        service = PredictService(self.mock_model, self.mock_tokenizer, self.label_mapping, padding='bucket')
+
+        self.assertEqual(service.bucket_length(5), 32)
+        self.assertEqual(service.bucket_length(32), 32)
+        self.assertEqual(service.bucket_length(33), 64)
+        self.assertEqual(service.bucket_length(200), 256)
+
+    def test_predict_batch_groups_by_bucket(self):
+        service = PredictService(self.mock_model, self.mock_tokenizer, self.label_mapping, padding='bucket')
+        self.mock_tokenizer.return_value = {
+            "input_ids": [[0] * 10, [0] * 40, [0] * 12],
+            "attention_mask": [[1] * 10, [1] * 40, [1] * 12]
+        }
+        self.mock_tokenizer.pad.side_effect = lambda encoded, **kwargs: {
+            "input_ids": torch.zeros((len(encoded["input_ids"]), kwargs["max_length"]), dtype=torch.long)
+        }
+        # Class 0 for the 32 bucket, class 1 for the 64 bucket
+        self.mock_model.side_effect = lambda **inputs: MagicMock(
+            logits=torch.tensor([[5.0, 0.0, 0.0, 0.0, 0.0] if inputs["input_ids"].shape[1] == 32 else [0.0, 5.0, 0.0, 0.0, 0.0]] * inputs["input_ids"].shape[0])
+        )
+
+        results = service.predict_batch(["short", "long", "short again"])
+
+        padded_lengths = [call.kwargs["max_length"] for call in self.mock_tokenizer.pad.call_args_list]
+        self.assertEqual(sorted(padded_lengths), [32, 64])
+        self.assertEqual([result[1] for result in results], ["Anxiety", "Suicide Watch", "Anxiety"])
+
+    def test_window_starts_are_capped(self):
+        service = PredictService(self.mock_model, self.mock_tokenizer, self.label_mapping, long_text_mode='window', max_windows=4)
+        self.mock_tokenizer.num_special_tokens_to_add.return_value = 2
+
+        self.assertEqual(service.window_starts(200), [0])
+        self.assertEqual(service.window_starts(600), [0, 128, 256, 346])
+
+        starts = service.window_starts(2000)
+        self.assertEqual(len(starts), 4)
+        self.assertEqual(starts[0], 0)
+        self.assertEqual(starts[-1], 2000 - 254)
+
+    def test_cache_version_changes_with_the_prediction_settings(self):
+        versions = {
+            PredictService(self.mock_model, self.mock_tokenizer, self.label_mapping, model_version='v1', **settings).cache_version
+            for settings in (
+                {},
+                {"long_text_mode": 'window'},
+                {"long_text_mode": 'window', "pooling": 'max'},
+                {"long_text_mode": 'window', "max_windows": 4},
+                {"long_text_mode": 'window', "window_stride": 64},
+                {"padding": 'bucket'},
+            )
+        }
+
+        self.assertEqual(len(versions), 6)
+        self.assertTrue(all(version.startswith("v1:") for version in versions))
+
+    def test_predict_batch_pools_windows_of_long_entry(self):
+        service = PredictService(self.mock_model, self.mock_tokenizer, self.label_mapping, long_text_mode='window', pooling='max')
+        self.mock_tokenizer.num_special_tokens_to_add.return_value = 2
+        self.mock_tokenizer.cls_token_id = 0
+        self.mock_tokenizer.sep_token_id = 2
+        self.mock_tokenizer.return_value = {"input_ids": [[5] * 600]}
+        self.mock_model.return_value.logits = torch.tensor([
+            [1.0, 0.0, 0.0, 0.0, 0.0],
+            [0.0, 3.0, 0.0, 0.0, 0.0],
+            [0.0, 0.0, 2.0, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 0.5, 0.0]
+        ])
+
+        predicted_class, predicted_label, confidence, confidence_scores = service.predict("A very long diary entry")
+
+        self.mock_model.assert_called_once()
+        inputs = self.mock_model.call_args.kwargs
+        self.assertEqual(tuple(inputs["input_ids"].shape), (4, 256))
+        self.assertEqual(inputs["input_ids"][0, 0].item(), 0)
+        self.assertEqual(inputs["input_ids"][0, -1].item(), 2)
+        self.assertEqual(predicted_class, 1)
+        self.assertEqual(predicted_label, "Suicide Watch")
+
 
 if __name__ == "__main__":
     unittest.main()
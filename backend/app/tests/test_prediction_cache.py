@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from services.prediction_cache import PredictionCache
+from services.predict_batcher import PredictBatcher
+
+PREDICTION = (3, "Depression", 0.85, {"Depression": 0.85})
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestPredictionCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = PredictionCache("model-v1", max_size=2, ttl_seconds=60, clock=self.clock)
+
+    async def test_hit_after_set_ignores_whitespace(self):
+        await self.cache.set("I feel  tired today", PREDICTION)
+
+        self.assertEqual(await self.cache.get(" I feel tired\ntoday "), PREDICTION)
+        self.assertIsNone(await self.cache.get("I feel great today"))
+        self.assertEqual(self.cache.stats()["hit_count"], 1)
+        self.assertEqual(self.cache.stats()["miss_count"], 1)
+
+    async def test_model_version_is_part_of_the_key(self):
+        await self.cache.set("Same content", PREDICTION)
+        other_version = PredictionCache("model-v2", clock=self.clock)
+
+        self.assertNotEqual(self.cache.key("Same content"), other_version.key("Same content"))
+        self.assertIsNone(await other_version.get("Same content"))
+
+    async def test_entries_expire_after_ttl(self):
+        await self.cache.set("Entry", PREDICTION)
+        self.clock.now = 61
+
+        self.assertIsNone(await self.cache.get("Entry"))
+        self.assertEqual(self.cache.stats()["eviction_count"], 1)
+
+    async def test_least_recently_used_entry_is_evicted(self):
+        await self.cache.set("first", PREDICTION)
+        await self.cache.set("second", PREDICTION)
+        await self.cache.get("first")
+        await self.cache.set("third", PREDICTION)
+
+        self.assertIsNotNone(await self.cache.get("first"))
+        self.assertIsNone(await self.cache.get("second"))
+        self.assertEqual(self.cache.stats()["eviction_count"], 1)
+
+    async def test_shared_backend_fills_local_cache(self):
+        shared_backend = MagicMock()
+        shared_backend.get = AsyncMock(return_value=PREDICTION)
+        shared_backend.set = AsyncMock()
+        self.cache.shared_backend = shared_backend
+
+        self.assertEqual(await self.cache.get("Entry"), PREDICTION)
+        self.assertEqual(await self.cache.get("Entry"), PREDICTION)
+
+        shared_backend.get.assert_called_once_with(self.cache.key("Entry"))
+        self.assertEqual(self.cache.stats()["shared_hit_count"], 1)
+        self.assertEqual(self.cache.stats()["hit_count"], 1)
+
+    async def test_batcher_skips_forward_pass_on_hit(self):
+        mock_predict_service = MagicMock()
+        mock_predict_service.predict_batch.return_value = [PREDICTION]
+        batcher = PredictBatcher(mock_predict_service, max_wait_ms=0, cache=self.cache)
+
+        first = await batcher.predict("Unchanged content")
+        second = await batcher.predict("Unchanged content")
+        await batcher.stop()
+
+        self.assertEqual(first, second)
+        mock_predict_service.predict_batch.assert_called_once_with(["Unchanged content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
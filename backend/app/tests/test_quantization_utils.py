@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import torch
+from transformers import RobertaConfig, RobertaForSequenceClassification
+from utils.quantization_utils import quantize_dynamic_int8, save_quantized, load_quantized, model_size_bytes
+
+def build_model():
+    torch.manual_seed(0)
+    config = RobertaConfig(
+        vocab_size=1000,
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=300,
+        num_labels=5
+    )
+    return RobertaForSequenceClassification(config).eval()
+
+class TestQuantizationUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.input_ids = torch.randint(3, 1000, (2, 24))
+        self.attention_mask = torch.ones_like(self.input_ids)
+
+    def test_quantize_dynamic_int8_replaces_linear_layers(self):
+        model = build_model()
+        with torch.no_grad():
+            expected = model(input_ids=self.input_ids, attention_mask=self.attention_mask).logits
+        fp32_size = model_size_bytes(model)
+
+        quantized = quantize_dynamic_int8(model)
+
+        self.assertFalse(any(type(module) is torch.nn.Linear for module in quantized.modules()))
+        self.assertLess(model_size_bytes(quantized), fp32_size)
+        with torch.no_grad():
+            logits = quantized(input_ids=self.input_ids, attention_mask=self.attention_mask).logits
+        self.assertTrue(torch.allclose(logits, expected, atol=0.1))
+
+    def test_saved_artifact_round_trip(self):
+        quantized = quantize_dynamic_int8(build_model())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = save_quantized(quantized, os.path.join(tmp_dir, "model.int8.pt"))
+            loaded = load_quantized(build_model(), path)
+
+        with torch.no_grad():
+            expected = quantized(input_ids=self.input_ids, attention_mask=self.attention_mask).logits
+            logits = loaded(input_ids=self.input_ids, attention_mask=self.attention_mask).logits
+        self.assertTrue(torch.allclose(logits, expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
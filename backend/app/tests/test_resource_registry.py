@@ -0,0 +1,106 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import threading
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import numpy as np
+from services.openai_service import OpenAIService
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+from services.vectordb_service import VectoredService
+
+def call_counts(profile):
+    """
+    Maps function names, and "file:name" for each source file, to call counts in a cProfile run.
+    """
+    counts = {}
+    for (filename, _, name), (_, calls, *_) in pstats.Stats(profile).stats.items():
+        for key in (name, f"{os.path.basename(filename)}:{name}"):
+            counts[key] = counts.get(key, 0) + calls
+    return counts
+
+class TestResourceRegistry(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.resources = ResourceRegistry(max_connections=10, max_keepalive_connections=5)
+        await self.resources.open()
+
+    async def asyncTearDown(self):
+        await self.resources.close()
+
+    async def test_clients_are_shared(self):
+        openai_service = self.resources.openai_service()
+
+        self.assertIs(self.resources.openai_service(), openai_service)
+        self.assertIs(self.resources.sentiment_analyzer(), self.resources.sentiment_analyzer())
+        pool = openai_service.async_client._client._transport._pool
+        self.assertEqual((pool._max_connections, pool._max_keepalive_connections), (10, 5))
+
+    async def test_close_builds_a_new_client_on_next_use(self):
+        openai_service = self.resources.openai_service()
+
+        await self.resources.close()
+
+        self.assertIsNot(self.resources.openai_service(), openai_service)
+
+    async def test_client_of_another_loop_is_closed_on_that_loop(self):
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            async def build():
+                return self.resources.openai_service()
+            stale = asyncio.run_coroutine_threadsafe(build(), other_loop).result(5)
+
+            openai_service = self.resources.openai_service()
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(asyncio.sleep(0.1), other_loop))
+        finally:
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            thread.join(5)
+            other_loop.close()
+
+        self.assertIsNot(openai_service, stale)
+        self.assertTrue(stale.async_client.is_closed())
+        self.assertFalse(openai_service.async_client.is_closed())
+
+    async def test_score_batch_does_not_reload_the_lexicon(self):
+        service = SentimentService(self.resources)
+        profile = cProfile.Profile()
+
+        async def run_inline(func, *args, **kwargs):
+            # The profiler only sees the calling thread
+            return func(*args, **kwargs)
+
+        with patch("services.sentiment_service.run_blocking", run_inline):
+            profile.enable()
+            for _ in range(20):
+                await service.score_batch(["I had a terrible, awful day."])
+            profile.disable()
+
+        counts = call_counts(profile)
+        self.assertEqual(counts.get("make_lex_dict", 0), 0)
+        self.assertEqual(counts.get("polarity_scores"), 20)
+
+    async def test_generate_advice_does_not_build_clients(self):
+        service = VectoredService(resources=self.resources)
+        service.suggestion_store = MagicMock(get=AsyncMock(return_value={"suggestions": ["Rest"], "$vector": [1.0, 0.0]}))
+        profile = cProfile.Profile()
+
+        with patch.object(OpenAIService, "generate_response_async", AsyncMock(return_value="Rest well")), \
+                patch.object(OpenAIService, "create_embeddings", AsyncMock(return_value=np.array([[1.0, 0.0]]))):
+            profile.enable()
+            for _ in range(10):
+                self.assertEqual(await service.generate_advice("depression", "Feeling down lately"), "Rest well")
+            profile.disable()
+
+        counts = call_counts(profile)
+        self.assertEqual(counts.get("load_dotenv", 0), 0)
+        # AsyncOpenAI is defined in openai/_client.py
+        self.assertEqual(counts.get("_client.py:__init__", 0), 0)
+        self.assertEqual(counts.get("close", 0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+from pymongo import UpdateOne
+from mongomock_motor import AsyncMongoMockClient
+from services.resource_registry import ResourceRegistry
+from services.sentiment_service import SentimentService
+
+TEXTS = ["I had a terrible, awful day.", "What a wonderful, happy morning!", "I took the bus to school."]
+
+class TestSentimentService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.resources = ResourceRegistry()
+        self.service = SentimentService(self.resources, max_workers=2, chunk_size=2)
+
+    def tearDown(self):
+        self.service.shutdown()
+
+    async def test_small_batch_is_scored_in_process(self):
+        scores = await self.service.score_batch(TEXTS[:2])
+
+        self.assertIsNone(self.service._executor)
+        analyzer = self.resources.sentiment_analyzer()
+        self.assertEqual(scores, [analyzer.polarity_scores(text) for text in TEXTS[:2]])
+
+    async def test_large_batch_is_scored_in_chunks_across_processes(self):
+        texts = TEXTS * 3
+
+        scores = await self.service.score_batch(texts)
+
+        self.assertIsNotNone(self.service._executor)
+        analyzer = self.resources.sentiment_analyzer()
+        self.assertEqual(scores, [analyzer.polarity_scores(text) for text in texts])
+        self.assertLess(scores[0]["compound"], 0)
+        self.assertGreater(scores[1]["compound"], 0)
+
+    async def test_rescore_entries_writes_one_bulk_write_per_batch(self):
+        collection = AsyncMongoMockClient()["test_db"]["diary_entries"]
+        await collection.insert_many([
+            {"_id": str(i), "author": "a" if i < 4 else "b", "content": TEXTS[i % 3]} for i in range(5)
+        ])
+
+        with patch.object(collection, "bulk_write", AsyncMock()) as bulk_write:
+            scored = await self.service.rescore_entries(collection, {"author": "a"}, batch_size=3)
+
+        self.assertEqual(scored, 4)
+        analyzer = self.resources.sentiment_analyzer()
+        self.assertEqual([call.args[0] for call in bulk_write.await_args_list], [
+            [UpdateOne({"_id": str(i)}, {"$set": {"sentiment": analyzer.polarity_scores(TEXTS[i % 3])}}) for i in ids]
+            for ids in ([0, 1, 2], [3])
+        ])
+        self.assertTrue(all(call.kwargs == {"ordered": False} for call in bulk_write.await_args_list))
+
+if __name__ == "__main__":
+    unittest.main()
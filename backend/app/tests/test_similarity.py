@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from utils.similarity import cosine_scores, normalize_rows, top_k_similarities
+
+class TestSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.candidates = rng.standard_normal((6, 32))
+        self.references = rng.standard_normal((9, 32))
+
+    def test_normalize_rows(self):
+        matrix = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(matrix.flags["C_CONTIGUOUS"])
+        np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+        self.assertEqual(normalize_rows([1.0, 0.0]).shape, (1, 2))
+        with self.assertRaises(ValueError):
+            normalize_rows(np.zeros((1, 1, 1)))
+
+    def test_cosine_scores_match_sklearn(self):
+        scores = cosine_scores(self.candidates, normalize_rows(self.references))
+
+        np.testing.assert_allclose(scores, cosine_similarity(self.candidates, self.references), atol=1e-5)
+
+    def test_top_k_similarities(self):
+        expected = cosine_similarity(self.candidates, self.references)
+
+        scores, indices = top_k_similarities(self.candidates, normalize_rows(self.references), k=3)
+
+        self.assertEqual(scores.shape, (6, 3))
+        np.testing.assert_array_equal(indices, np.argsort(-expected, axis=1)[:, :3])
+        np.testing.assert_allclose(scores, -np.sort(-expected, axis=1)[:, :3], atol=1e-5)
+
+    def test_top_k_larger_than_references(self):
+        scores, indices = top_k_similarities([[1.0, 0.0]], normalize_rows([[0.0, 1.0], [1.0, 1.0]]), k=5)
+
+        np.testing.assert_array_equal(indices, [[1, 0]])
+        np.testing.assert_allclose(scores, [[np.sqrt(0.5), 0.0]], atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from datetime import date, timedelta
+from hypothesis import given, settings, strategies as st
+from mongomock_motor import AsyncMongoMockClient
+from services.streak_service import (
+    StreakService, add_run_day, remove_run_day, streak_state, current_streak, max_streak,
+    compute_streak, compute_max_streak
+)
+
+TODAY = date(2024, 11, 30)
+
+# Creates (True) and deletes (False) of the last entry of a day within the last 30 days
+operations = st.lists(st.tuples(st.booleans(), st.integers(min_value=0, max_value=30)), max_size=60)
+
+class TestStreakRuns(unittest.TestCase):
+
+    def test_add_run_day_merges_neighbours(self):
+        runs = add_run_day([], date(2024, 11, 1))
+        runs = add_run_day(runs, date(2024, 11, 3))
+        self.assertEqual(runs, [["2024-11-01", "2024-11-01"], ["2024-11-03", "2024-11-03"]])
+
+        runs = add_run_day(runs, date(2024, 11, 2))
+        self.assertEqual(runs, [["2024-11-01", "2024-11-03"]])
+        self.assertEqual(add_run_day(runs, date(2024, 11, 2)), runs)
+
+    def test_remove_run_day_splits_run(self):
+        runs = [["2024-11-01", "2024-11-05"]]
+
+        self.assertEqual(remove_run_day(runs, date(2024, 11, 3)), [["2024-11-01", "2024-11-02"], ["2024-11-04", "2024-11-05"]])
+        self.assertEqual(remove_run_day(runs, date(2024, 11, 1)), [["2024-11-02", "2024-11-05"]])
+        self.assertEqual(remove_run_day(runs, date(2024, 11, 5)), [["2024-11-01", "2024-11-04"]])
+        self.assertEqual(remove_run_day(runs, date(2024, 11, 9)), runs)
+
+    @settings(max_examples=300)
+    @given(operations)
+    def test_state_matches_full_recomputation(self, operations):
+        runs = []
+        days = set()
+        for create, offset in operations:
+            day = TODAY - timedelta(days=offset)
+            if create:
+                runs = add_run_day(runs, day)
+                days.add(day)
+            else:
+                runs = remove_run_day(runs, day)
+                days.discard(day)
+
+        state = streak_state(runs)
+        dates = sorted(days, reverse=True)
+        self.assertEqual(current_streak(state, TODAY), compute_streak(dates, TODAY))
+        self.assertEqual(max_streak(state), compute_max_streak(dates))
+        self.assertEqual(state["last_entry_date"], dates[0].isoformat() if dates else None)
+
+class TestStreakService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.collection = AsyncMongoMockClient()["test_db"]["users"]
+        self.service = StreakService(self.collection)
+
+    async def test_updates_user_record(self):
+        await self.collection.insert_one({"_id": "user_id", "username": "user"})
+
+        await self.service.add_day("user_id", date(2024, 11, 1))
+        await self.service.add_day("user_id", date(2024, 11, 2))
+        await self.service.remove_day("user_id", date(2024, 11, 1))
+
+        user = await self.collection.find_one({"_id": "user_id"})
+        self.assertEqual(user["streak"], {
+            "runs": [["2024-11-02", "2024-11-02"]],
+            "last_entry_date": "2024-11-02",
+            "current_run_start": "2024-11-02",
+            "max_streak": 1,
+            "version": 3,
+        })
+
+    async def test_concurrent_updates_are_not_lost(self):
+        await self.collection.insert_one({"_id": "user_id", "username": "user"})
+
+        await asyncio.gather(*(self.service.add_day("user_id", date(2024, 11, day)) for day in range(1, 6)))
+
+        user = await self.collection.find_one({"_id": "user_id"})
+        self.assertEqual(user["streak"]["runs"], [["2024-11-01", "2024-11-05"]])
+
+    async def test_rebuild(self):
+        await self.collection.insert_one({"_id": "user_id", "username": "user", "streak": streak_state([["2024-10-01", "2024-10-09"]], 4)})
+
+        state = await self.service.rebuild("user_id", [date(2024, 11, 2), date(2024, 11, 1), date(2024, 11, 4)])
+
+        self.assertEqual(state["runs"], [["2024-11-01", "2024-11-02"], ["2024-11-04", "2024-11-04"]])
+        self.assertEqual(state["max_streak"], 2)
+        self.assertEqual(state["version"], 5)
+
+    async def test_add_days_keeps_existing_runs(self):
+        await self.collection.insert_one({"_id": "user_id", "username": "user", "streak": streak_state([["2024-11-03", "2024-11-05"]], 2)})
+
+        state = await self.service.add_days("user_id", [date(2024, 11, 2), date(2024, 11, 9), date(2024, 11, 1)])
+
+        self.assertEqual(state["runs"], [["2024-11-01", "2024-11-05"], ["2024-11-09", "2024-11-09"]])
+        self.assertEqual(state["version"], 3)
+
+    async def test_missing_user(self):
+        self.assertIsNone(await self.service.add_day("missing", date(2024, 11, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from unittest.mock import MagicMock, patch
+from services.suggestion_store import SuggestionStore, normalized_vectors
+
+DOCUMENTS = [
+    {"class": "depression", "suggestions": ["Rest"], "$vector": [3.0, 4.0]},
+    {"class": "Anxiety", "suggestions": ["Breathe"], "$vector": [[1.0, 0.0], [0.0, 2.0]]},
+]
+
+class TestSuggestionStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.load_documents = MagicMock(return_value=DOCUMENTS)
+        file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        json.dump([{"class": "depression", "description": "", "suggestions": ["Fallback"]}], file)
+        file.close()
+        self.fallback_path = file.name
+        self.store = SuggestionStore(self.load_documents, fallback_path=self.fallback_path, ttl_seconds=60)
+
+    def tearDown(self):
+        os.remove(self.fallback_path)
+
+    def test_normalized_vectors(self):
+        vectors = normalized_vectors([3.0, 4.0])
+
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertTrue(vectors.flags["C_CONTIGUOUS"])
+        np.testing.assert_allclose(vectors, [[0.6, 0.8]])
+        np.testing.assert_allclose(normalized_vectors([[0.0, 0.0]]), [[0.0, 0.0]])
+        self.assertIsNone(normalized_vectors(None))
+        with self.assertRaises(ValueError):
+            normalized_vectors([[[1.0]]])
+
+    async def test_documents_are_loaded_once_and_kept_in_memory(self):
+        depression = await self.store.get("Depression")
+        anxiety = await self.store.get("anxiety")
+        await self.store.get("depression")
+
+        self.load_documents.assert_called_once()
+        self.assertEqual(depression["suggestions"], ["Rest"])
+        np.testing.assert_allclose(depression["$vector"], [[0.6, 0.8]])
+        np.testing.assert_allclose(anxiety["$vector"], [[1.0, 0.0], [0.0, 1.0]])
+        self.assertIsNone(await self.store.get("bipolar"))
+        self.assertEqual(self.store.stats()["source"], "astradb")
+        self.assertEqual(self.store.stats()["classes"], ["anxiety", "depression"])
+
+    async def test_documents_are_reloaded_after_ttl_or_invalidation(self):
+        with patch("services.suggestion_store.time.monotonic", return_value=1000):
+            await self.store.get("depression")
+            self.store.invalidate()
+            await self.store.get("depression")
+        with patch("services.suggestion_store.time.monotonic", return_value=1061):
+            await self.store.get("depression")
+
+        self.assertEqual(self.load_documents.call_count, 3)
+
+    async def test_fallback_file_is_used_when_astradb_is_unreachable(self):
+        self.load_documents.side_effect = ConnectionError("AstraDB is unreachable")
+
+        depression = await self.store.get("depression")
+
+        self.assertEqual(depression, {"suggestions": ["Fallback"], "$vector": None})
+        self.assertEqual(self.store.stats()["source"], "fallback")
+
+    async def test_documents_in_memory_are_kept_when_refresh_fails(self):
+        await self.store.refresh()
+        self.load_documents.side_effect = ConnectionError("AstraDB is unreachable")
+
+        self.assertEqual(await self.store.refresh(), "astradb")
+        self.assertEqual((await self.store.get("depression"))["suggestions"], ["Rest"])
+        # The failed refresh is retried after retry_seconds, not on every get
+        self.assertEqual(self.load_documents.call_count, 2)
+        self.assertEqual(self.store.stats()["failed_refresh_count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
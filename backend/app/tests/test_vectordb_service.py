@@ -1,85 +1,221 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock, patch
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
 from services.vectordb_service import VectoredService
 from services.openai_service import OpenAIService
+from services.advice_cache import SemanticAdviceCache
+from fastapi import HTTPException
 
-class TestVectoredService(unittest.TestCase):
+class TestGenerateAdviceCandidates(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        with patch("services.vectordb_service.SentenceTransformer") as MockTransformer:
-            self.mock_embedding_model = MockTransformer.return_value
-            self.mock_embedding_model.encode.return_value = [[0.1, 0.2, 0.3]]
-            self.service = VectoredService()
-
-    @patch("services.vectordb_service.db.get_collection")
-    def test_retrieve_related_data(self, mock_get_collection):
-        mock_collection = MagicMock()
-        mock_get_collection.return_value = mock_collection
-        sample_document = {"class": "depression", "suggestions": ["Stay positive", "Take it easy"]}
-        mock_collection.find_one.return_value = sample_document
-
-        result = self.service.retrieve_related_data("depression")
-
-        mock_get_collection.assert_called_once_with("mental_advice")
-        mock_collection.find_one.assert_called_once_with({"class": "depression"})
-        self.assertEqual(result, sample_document)
-
-    @patch.object(OpenAIService, "generate_response")
-    @patch("services.vectordb_service.cosine_similarity")
-    @patch("services.vectordb_service.db.get_collection")
-    async def test_generate_advice_successful(self, mock_get_collection, mock_cosine_similarity,
-                                              mock_generate_response):
-
-        mock_collection = MagicMock()
-        mock_get_collection.return_value = mock_collection
-        mock_collection.find_one.return_value = {
-            "class": "depression",
-            "suggestions": ["Stay positive", "Take care of yourself"]
-        }
-
-        mock_generate_response.return_value = "Take time to relax and care for yourself."
-
-        mock_cosine_similarity.return_value = [[0.7]]
-
-        advice = await self.service.generate_advice("depression", "Feeling down lately")
-
-        self.assertEqual(advice, "Take time to relax and care for yourself.")
-        mock_generate_response.assert_called()
-        mock_cosine_similarity.assert_called()
-
-    @patch.object(OpenAIService, "generate_response")
-    @patch("services.vectordb_service.cosine_similarity")
-    @patch("services.vectordb_service.db.get_collection")
-    async def test_generate_advice_fails_similarity_threshold(self, mock_get_collection, mock_cosine_similarity,
-                                                              mock_generate_response):
-
-        mock_collection = MagicMock()
-        mock_get_collection.return_value = mock_collection
-        mock_collection.find_one.return_value = {
-            "class": "depression",
-            "suggestions": ["Stay positive", "Take care of yourself"]
-        }
-
-        mock_generate_response.return_value = "Some unrelated advice."
-        mock_cosine_similarity.side_effect = [[0.3], [0.4], [0.5], [0.55],
-                                              [0.59]]
-
-        advice = await self.service.generate_advice("depression", "Feeling down lately")
-
-        self.assertEqual(advice, "Failed to generate advice that meets the required similarity threshold.")
-        self.assertEqual(mock_generate_response.call_count, 5)
-        mock_cosine_similarity.assert_called()
-
-    @patch("services.vectordb_service.db.get_collection")
-    async def test_generate_advice_no_related_data(self, mock_get_collection):
-        mock_collection = MagicMock()
-        mock_get_collection.return_value = mock_collection
-        mock_collection.find_one.return_value = None
-
-        advice = await self.service.generate_advice("unknown_label", "Feeling uncertain")
-
-        self.assertEqual(advice, "No relevant data found.")
-        mock_get_collection.assert_called_once_with("mental_advice")
+        self.service = VectoredService(candidates_per_attempt=3, max_attempts=2)
+        self.related_data = {"suggestions": ["Stay positive"], "$vector": [1.0, 0.0]}
+        self.service.suggestion_store = MagicMock(get=AsyncMock(return_value=self.related_data))
+        self.close = patch.object(OpenAIService, "close", AsyncMock())
+        self.close.start()
+
+    def tearDown(self):
+        self.close.stop()
+
+    def embeddings(self, vectors):
+        return AsyncMock(side_effect=lambda texts, **kwargs: np.array([vectors[text] for text in texts]))
+
+    async def test_candidates_are_generated_concurrently_and_embedded_together(self):
+        started = []
+        release = asyncio.Event()
+
+        async def generate(system_input, temperature):
+            started.append(system_input)
+            response = f"response {len(started)}"
+            await release.wait()
+            return response
+
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, release.set)
+        embeddings = self.embeddings({"response 1": [0.1, 1.0], "response 2": [0.2, 1.0], "response 3": [1.0, 0.1]})
+        with patch.object(OpenAIService, "generate_response_async", side_effect=generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            advice = await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(advice, "response 3")
+        self.assertEqual(len(started), 3)
+        embeddings.assert_awaited_once()
+        self.assertEqual(sorted(embeddings.await_args.args[0]), ["response 1", "response 2", "response 3"])
+
+    async def test_outstanding_candidates_are_cancelled_once_threshold_is_met(self):
+        cancelled = []
+
+        async def generate(system_input, temperature):
+            if not cancelled:
+                cancelled.append(False)
+                return "fast"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "slow"
+
+        embeddings = self.embeddings({"fast": [1.0, 0.0]})
+        with patch.object(OpenAIService, "generate_response_async", side_effect=generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            advice = await asyncio.wait_for(self.service.generate_advice("depression", "Feeling down lately"), 1)
+
+        self.assertEqual(advice, "fast")
+        self.assertEqual(cancelled, [False, True, True])
+
+    async def test_all_attempts_below_threshold(self):
+        generate = AsyncMock(return_value="unrelated")
+        embeddings = self.embeddings({"unrelated": [0.0, 1.0]})
+        with patch.object(OpenAIService, "generate_response_async", generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            advice = await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(advice, "We couldn't process your request at this time. Please try again or share more details for better advice.")
+        self.assertEqual(generate.await_count, 6)
+
+    async def test_failed_candidates_are_skipped(self):
+        generate = AsyncMock(side_effect=[Exception("API Error"), "related", Exception("API Error")])
+        embeddings = self.embeddings({"related": [1.0, 0.0]})
+        with patch.object(OpenAIService, "generate_response_async", generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            advice = await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(advice, "related")
+
+    async def test_all_candidates_failing_raises(self):
+        generate = AsyncMock(side_effect=Exception("API Error"))
+        with patch.object(OpenAIService, "generate_response_async", generate):
+            with self.assertRaises(HTTPException) as context:
+                await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(context.exception.status_code, 500)
+
+    async def test_no_related_data(self):
+        self.service.suggestion_store.get = AsyncMock(return_value=None)
+        generate = AsyncMock()
+        with patch.object(OpenAIService, "generate_response_async", generate):
+            advice = await self.service.generate_advice("unknown_label", "Feeling uncertain")
+
+        self.assertEqual(advice, "We couldn't process your request at this time. Please try again or share more details for better advice.")
+        self.service.suggestion_store.get.assert_awaited_once_with("unknown_label")
+        generate.assert_not_awaited()
+
+    async def test_candidates_are_scored_with_the_embedding_provider(self):
+        provider = MagicMock(similarity_threshold=0.5)
+        provider.reference_embeddings = AsyncMock(return_value=np.array([[0.0, 1.0]]))
+        provider.embed = AsyncMock(return_value=np.array([[0.0, 1.0]]))
+        self.service.embedding_provider = provider
+        with patch.object(OpenAIService, "generate_response_async", AsyncMock(return_value="local")):
+            advice = await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(advice, "local")
+        provider.reference_embeddings.assert_awaited_once_with(self.related_data)
+        self.service.suggestion_store.get.assert_awaited_once_with("depression")
+
+    async def test_advice_of_similar_entry_is_reused(self):
+        self.service.advice_cache = SemanticAdviceCache("test-space", radius=0.9, backend="brute-force")
+        generate = AsyncMock(return_value="related")
+        embeddings = self.embeddings({"related": [1.0, 0.0], "Feeling down lately": [0.0, 1.0],
+                                      "Feeling really down lately": [0.1, 1.0], "Great day": [1.0, 1.0]})
+        with patch.object(OpenAIService, "generate_response_async", generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            first = await self.service.generate_advice("Depression", "Feeling down lately")
+            generate.reset_mock()
+            similar = await self.service.generate_advice("depression", "Feeling really down lately")
+            generate.assert_not_awaited()
+            await self.service.generate_advice("depression", "Great day")
+            generate.assert_awaited()
+
+        self.assertEqual((first, similar), ("related", "related"))
+        self.assertEqual(self.service.advice_cache.stats()["hits"], 1)
+        self.assertEqual(self.service.advice_cache.stats()["size"], 2)
+
+    async def test_failed_content_embedding_is_a_cache_miss(self):
+        self.service.advice_cache = SemanticAdviceCache("test-space", backend="brute-force")
+
+        async def create_embeddings(texts, **kwargs):
+            if texts == ["Too long"]:
+                raise Exception("Input exceeds the maximum length")
+            return np.array([[1.0, 0.0] for _ in texts])
+
+        with patch.object(OpenAIService, "generate_response_async", AsyncMock(return_value="related")), \
+                patch.object(OpenAIService, "create_embeddings", side_effect=create_embeddings):
+            advice = await self.service.generate_advice("depression", "Too long")
+
+        self.assertEqual(advice, "related")
+        self.assertEqual(self.service.advice_cache.stats()["size"], 0)
+
+    async def test_rejected_advice_is_not_cached(self):
+        self.service.advice_cache = SemanticAdviceCache("test-space", backend="brute-force")
+        embeddings = self.embeddings({"unrelated": [0.0, 1.0], "Feeling down lately": [0.0, 1.0]})
+        with patch.object(OpenAIService, "generate_response_async", AsyncMock(return_value="unrelated")), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            await self.service.generate_advice("depression", "Feeling down lately")
+
+        self.assertEqual(self.service.advice_cache.stats()["size"], 0)
+
+
+    def streamed(self, *tokens):
+        async def stream(system_input, temperature):
+            for token in tokens:
+                yield token
+        return stream
+
+    async def collect(self, events):
+        return [event async for event in events]
+
+    async def test_stream_advice_streams_tokens_then_validation(self):
+        generate = AsyncMock()
+        embeddings = self.embeddings({"Take a walk.": [1.0, 0.1]})
+        with patch.object(OpenAIService, "stream_response_async", side_effect=self.streamed("Take", " a walk.")), \
+                patch.object(OpenAIService, "generate_response_async", generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            events = await self.collect(self.service.stream_advice("Depression", "Feeling down lately"))
+
+        self.assertEqual(events[:2], [("token", "Take"), ("token", " a walk.")])
+        event, result = events[2]
+        self.assertEqual(event, "validation")
+        self.assertAlmostEqual(result["similarity"], 0.995, places=3)
+        self.assertEqual((result["accepted"], result["cached"], result["advice"]), (True, False, "Take a walk."))
+        generate.assert_not_awaited()
+
+    async def test_stream_advice_below_threshold_runs_remaining_attempts(self):
+        generate = AsyncMock(return_value="related")
+        embeddings = self.embeddings({"unrelated": [0.0, 1.0], "related": [1.0, 0.0]})
+        with patch.object(OpenAIService, "stream_response_async", side_effect=self.streamed("unrelated")), \
+                patch.object(OpenAIService, "generate_response_async", generate), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            events = await self.collect(self.service.stream_advice("depression", "Feeling down lately"))
+
+        self.assertEqual(events[0], ("token", "unrelated"))
+        self.assertEqual(events[-1][1]["advice"], "related")
+        self.assertTrue(events[-1][1]["accepted"])
+        # The streamed candidate counts as the first of max_attempts attempts
+        self.assertEqual(generate.await_count, 3)
+        self.assertIn('The best response generated so far is: "unrelated"', generate.await_args.args[0])
+
+    async def test_stream_advice_rejected(self):
+        embeddings = self.embeddings({"unrelated": [0.0, 1.0]})
+        with patch.object(OpenAIService, "stream_response_async", side_effect=self.streamed("unrelated")), \
+                patch.object(OpenAIService, "generate_response_async", AsyncMock(return_value="unrelated")), \
+                patch.object(OpenAIService, "create_embeddings", embeddings):
+            events = await self.collect(self.service.stream_advice("depression", "Feeling down lately"))
+
+        result = events[-1][1]
+        self.assertFalse(result["accepted"])
+        self.assertEqual(result["advice"], "We couldn't process your request at this time. Please try again or share more details for better advice.")
+
+    async def test_stream_advice_no_related_data(self):
+        self.service.suggestion_store.get = AsyncMock(return_value=None)
+
+        events = await self.collect(self.service.stream_advice("depression", "Feeling down lately"))
+
+        self.assertEqual([event for event, _ in events], ["token", "validation"])
+        self.assertIsNone(events[-1][1]["similarity"])
+        self.assertFalse(events[-1][1]["accepted"])
 
 
 if __name__ == "__main__":
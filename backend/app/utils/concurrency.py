@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Model inference gets its own bounded pool so that a burst of predictions cannot
+# starve the shared threadpool used for blocking I/O (and the other way around).
+# PyTorch and onnxruntime release the GIL inside their kernels, so threads are enough
+# and the model weights are only held once per worker process.
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+    thread_name_prefix="inference"
+)
+
+async def run_inference(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(func, *args, **kwargs))
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run blocking I/O or CPU-light work (pymongo, bcrypt, HTTP SDK calls) in the
+    shared threadpool instead of on the event loop.
+    """
+    return await run_in_threadpool(func, *args, **kwargs)
+
+async def run_periodically(interval_seconds: float, job):
+    """
+    Awaits job every interval_seconds until cancelled. A failing run is logged and
+    the next one still happens.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Periodic job {getattr(job, '__name__', job)} failed: {str(e)}")
+
+def shutdown_executors():
+    inference_executor.shutdown(wait=False, cancel_futures=True)
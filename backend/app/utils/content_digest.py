@@ -0,0 +1,8 @@
+import hashlib
+
+def normalize_content(content: str) -> str:
+    # Whitespace-only edits should not count as a content change
+    return " ".join(content.split())
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
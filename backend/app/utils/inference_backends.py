@@ -0,0 +1,94 @@
+from collections import namedtuple
+import torch
+
+# Mirrors the `.logits` attribute of the Hugging Face model output so every
+# backend can be called the same way as RobertaForSequenceClassification.
+InferenceOutput = namedtuple("InferenceOutput", ["logits"])
+
+INFERENCE_BACKENDS = ("torch-eager", "torchscript", "onnxruntime")
+
+class LogitsModule(torch.nn.Module):
+    """
+    Wraps the classifier so that it takes positional tensors and returns plain logits,
+    which is the signature torch.jit.trace and torch.onnx.export expect.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+class TorchScriptBackend:
+    def __init__(self, path: str, num_threads: int | None = None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.module = torch.jit.load(path, map_location="cpu")
+        self.module.eval()
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        with torch.no_grad():
+            return InferenceOutput(self.module(input_ids, attention_mask))
+
+class OnnxRuntimeBackend:
+    def __init__(self, path: str, num_threads: int | None = None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ValueError("onnxruntime is not installed, run: pip install onnxruntime")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        logits = self.session.run(
+            ["logits"],
+            {"input_ids": input_ids.cpu().numpy(), "attention_mask": attention_mask.cpu().numpy()}
+        )[0]
+        return InferenceOutput(torch.from_numpy(logits))
+
+def _example_inputs(batch_size=2, seq_len=16):
+    input_ids = torch.ones((batch_size, seq_len), dtype=torch.long)
+    attention_mask = torch.ones((batch_size, seq_len), dtype=torch.long)
+    # Padding in the example keeps the attention mask branch in the traced graph
+    attention_mask[0, seq_len // 2:] = 0
+    return input_ids, attention_mask
+
+def export_torchscript(model, path: str):
+    with torch.no_grad():
+        traced = torch.jit.trace(LogitsModule(model).eval(), _example_inputs(), strict=False)
+    traced.save(path)
+    return path
+
+def export_onnx(model, path: str, optimize: bool = False, opset_version: int = 17):
+    with torch.no_grad():
+        # The exporter restores the wrapper's training flag afterwards, so it must start in eval mode
+        torch.onnx.export(
+            LogitsModule(model).eval(),
+            _example_inputs(),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset_version,
+            dynamo=False,
+        )
+
+    if optimize:
+        # Fuse attention, layer norm and GELU subgraphs into single ORT kernels
+        from onnxruntime.transformers import optimizer
+        optimized = optimizer.optimize_model(
+            path,
+            model_type="bert",
+            num_heads=model.config.num_attention_heads,
+            hidden_size=model.config.hidden_size,
+        )
+        optimized.save_model_to_file(path)
+    return path
@@ -0,0 +1,143 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+MAX_ROW_BYTES = 1024 * 1024
+
+async def _text(chunks):
+    # Decodes the byte stream without splitting multi-byte characters across chunks
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        try:
+            text = pending.decode("utf-8")
+            pending = b""
+        except UnicodeDecodeError as e:
+            if e.start < len(pending) - 3:
+                raise ValueError("Request body is not valid UTF-8")
+            text = pending[:e.start].decode("utf-8")
+            pending = pending[e.start:]
+        if text:
+            yield text
+    if pending:
+        raise ValueError("Request body is not valid UTF-8")
+
+def _exceeds(text: str, start: int, max_bytes: int) -> bool:
+    # A character takes 1 to 4 bytes in UTF-8, so only encode when that cannot decide
+    size = len(text) - start
+    if size > max_bytes:
+        return True
+    if size * 4 <= max_bytes:
+        return False
+    return len(text[start:].encode("utf-8")) > max_bytes
+
+async def iter_ndjson(chunks, max_row_bytes=MAX_ROW_BYTES):
+    """
+    Yields (row, value, error) for each non-empty line of an NDJSON byte stream.
+    A line that is not valid JSON yields an error and the following lines are still read.
+    A line longer than max_row_bytes ends the stream, so an unterminated line is not
+    buffered without bound.
+    """
+    buffer = ""
+    row = 0
+
+    def parse(line):
+        if _exceeds(line, 0, max_row_bytes):
+            return row, None, f"Row is larger than {max_row_bytes} bytes"
+        try:
+            return row, json.loads(line), None
+        except ValueError as e:
+            return row, None, f"Invalid JSON: {str(e)}"
+
+    async for text in _text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield parse(line)
+                row += 1
+        if _exceeds(buffer, 0, max_row_bytes):
+            yield row, None, f"Row is larger than {max_row_bytes} bytes"
+            return
+    if buffer.strip():
+        yield parse(buffer)
+
+async def iter_json_array(chunks, max_row_bytes=MAX_ROW_BYTES):
+    """
+    Yields (row, value, error) for each element of a JSON array byte stream, decoding
+    elements as soon as they are complete. Elements are separated by exactly one comma
+    and only whitespace may follow the closing bracket. A syntax error ends the stream,
+    since the position of the next element cannot be known, and so does an element
+    longer than max_row_bytes, which bounds the text decoded again while an element
+    is incomplete.
+    """
+    buffer = ""
+    position = 0
+    row = 0
+    # start: before "[", first: an element or "]", element: an element after ",",
+    # separator: "," or "]" after an element, end: after "]"
+    expected = "start"
+    stream = _text(chunks)
+    exhausted = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position == len(buffer):
+            buffer = ""
+            position = 0
+        else:
+            char = buffer[position]
+            if expected == "start":
+                if char != "[":
+                    yield row, None, "Expected a JSON array"
+                    return
+                expected = "first"
+                position += 1
+                continue
+            if expected == "end":
+                yield row, None, "Invalid JSON: unexpected data after the end of the array"
+                return
+            if expected == "separator":
+                if char not in ",]":
+                    yield row, None, "Invalid JSON: expected ',' or ']' after an element"
+                    return
+                expected = "element" if char == "," else "end"
+                position += 1
+                continue
+            if char == "]":
+                if expected == "element":
+                    yield row, None, "Invalid JSON: trailing comma before ']'"
+                    return
+                expected = "end"
+                position += 1
+                continue
+            if char == ",":
+                yield row, None, "Invalid JSON: expected an element before ','"
+                return
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except ValueError as e:
+                if exhausted:
+                    yield row, None, f"Invalid JSON: {str(e)}"
+                    return
+            else:
+                # A number at the end of the buffer may still continue in the next chunk
+                if end < len(buffer) or exhausted or not isinstance(value, (int, float)):
+                    yield row, value, None
+                    row += 1
+                    buffer = buffer[end:]
+                    position = 0
+                    expected = "separator"
+                    continue
+            if _exceeds(buffer, position, max_row_bytes):
+                yield row, None, f"Row is larger than {max_row_bytes} bytes"
+                return
+        if exhausted:
+            if expected != "end":
+                yield row, None, "Unexpected end of JSON array"
+            return
+        try:
+            buffer += await stream.__anext__()
+        except StopAsyncIteration:
+            exhausted = True
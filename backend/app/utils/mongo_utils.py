@@ -0,0 +1,38 @@
+import base64
+import json
+from pymongo import AsyncMongoClient
+
+READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+
+def create_mongo_client(atlas_uri: str, config: dict):
+    """
+    Create the async client shared by all services. One client keeps a connection
+    pool, so a single uvicorn worker can have many DB round trips in flight.
+    """
+    read_preference = config.get("MONGO_READ_PREFERENCE") or "primary"
+    if read_preference not in READ_PREFERENCES:
+        raise ValueError(f"Unsupported MONGO_READ_PREFERENCE: {read_preference}")
+    return AsyncMongoClient(
+        atlas_uri,
+        maxPoolSize=int(config.get("MONGO_MAX_POOL_SIZE") or 100),
+        minPoolSize=int(config.get("MONGO_MIN_POOL_SIZE") or 0),
+        maxIdleTimeMS=int(config.get("MONGO_MAX_IDLE_TIME_MS") or 0) or None,
+        serverSelectionTimeoutMS=int(config.get("MONGO_SERVER_SELECTION_TIMEOUT_MS") or 30000),
+        connectTimeoutMS=int(config.get("MONGO_CONNECT_TIMEOUT_MS") or 20000),
+        socketTimeoutMS=int(config.get("MONGO_SOCKET_TIMEOUT_MS") or 0) or None,
+        readPreference=read_preference,
+    )
+
+
+def encode_cursor(values):
+    # Opaque keyset cursor holding the sort key values of the last document of a page
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+def decode_cursor(cursor: str, size: int):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
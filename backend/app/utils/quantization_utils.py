@@ -0,0 +1,27 @@
+import io
+import torch
+
+QUANTIZATION_MODES = ("none", "dynamic-int8")
+
+def quantize_dynamic_int8(model):
+    """
+    Replace the nn.Linear layers with int8 dynamically quantized versions.
+    Weights are stored in int8 and activations are quantized on the fly, which suits CPU inference.
+    """
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def save_quantized(model, path: str):
+    torch.save(model.state_dict(), path)
+    return path
+
+def load_quantized(model, path: str):
+    # The quantized modules have to exist before their packed weights can be loaded
+    quantized = quantize_dynamic_int8(model)
+    quantized.load_state_dict(torch.load(path, map_location="cpu"))
+    return quantized
+
+def model_size_bytes(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
@@ -1,13 +1,32 @@
 from transformers import RobertaTokenizer, RobertaForSequenceClassification
 from dotenv import load_dotenv
 import os
+import torch
+from utils.inference_backends import INFERENCE_BACKENDS, TorchScriptBackend, OnnxRuntimeBackend
+from utils.quantization_utils import QUANTIZATION_MODES, quantize_dynamic_int8, load_quantized
 class RobertaModelUtils:
-    def __init__(self):
+    def __init__(self, backend=None, quantization=None):
         load_dotenv()
         self.model_path = os.getenv('MODEL_PATH')
         if self.model_path is None:
             raise ValueError("MODEL_PATH is not set in the .env file.")
 
+        self.backend = backend or os.getenv('INFERENCE_BACKEND', 'torch-eager')
+        if self.backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unsupported INFERENCE_BACKEND: {self.backend}. Expected one of {INFERENCE_BACKENDS}")
+        self.torchscript_path = os.getenv('TORCHSCRIPT_MODEL_PATH', os.path.join(self.model_path, 'model.torchscript.pt'))
+        self.onnx_path = os.getenv('ONNX_MODEL_PATH', os.path.join(self.model_path, 'model.onnx'))
+        self.quantization = quantization or os.getenv('MODEL_QUANTIZATION', 'none')
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported MODEL_QUANTIZATION: {self.quantization}. Expected one of {QUANTIZATION_MODES}")
+        if self.quantization != 'none' and self.backend != 'torch-eager':
+            raise ValueError("MODEL_QUANTIZATION is only supported with INFERENCE_BACKEND=torch-eager")
+        self.quantized_path = os.getenv('QUANTIZED_MODEL_PATH', os.path.join(self.model_path, 'model.int8.pt'))
+        # Identifies the served weights, e.g. in prediction cache keys
+        self.model_version = os.getenv('MODEL_VERSION') or f"{os.path.basename(os.path.normpath(self.model_path))}-{self.backend}-{self.quantization}"
+        num_threads = os.getenv('INFERENCE_NUM_THREADS')
+        self.num_threads = int(num_threads) if num_threads else None
+
         self.model = None
         self.tokenizer = None
         self.label_mapping = {
@@ -20,6 +39,22 @@ class RobertaModelUtils:
 
     def load(self):
         self.tokenizer = RobertaTokenizer.from_pretrained(self.model_path)
-        self.model = RobertaForSequenceClassification.from_pretrained(self.model_path)
-        self.model.eval()
+        if self.backend == 'torchscript':
+            self.model = TorchScriptBackend(self.torchscript_path, self.num_threads)
+        elif self.backend == 'onnxruntime':
+            self.model = OnnxRuntimeBackend(self.onnx_path, self.num_threads)
+        else:
+            self.model = self.load_eager()
         return self.model, self.tokenizer, self.label_mapping
+
+    def load_eager(self):
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        model = RobertaForSequenceClassification.from_pretrained(self.model_path)
+        model.eval()
+        if self.quantization == 'dynamic-int8':
+            # Prefer the artifact saved by scripts.quantize_model, otherwise quantize at load time
+            if os.path.exists(self.quantized_path):
+                return load_quantized(model, self.quantized_path)
+            return quantize_dynamic_int8(model)
+        return model
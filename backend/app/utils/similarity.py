@@ -0,0 +1,37 @@
+import numpy as np
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """
+    Returns embeddings as a contiguous 2D float32 matrix with L2-normalized rows.
+    A single vector becomes one row; rows of zeros stay zero.
+    """
+    matrix = np.array(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    elif matrix.ndim != 2:
+        raise ValueError("Embeddings must be 1D or 2D.")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.ascontiguousarray(matrix / np.where(norms == 0, 1, norms))
+
+def cosine_scores(candidates, references: np.ndarray) -> np.ndarray:
+    """
+    Scores every candidate against every reference with one matrix multiply.
+    references must already be normalized with normalize_rows.
+    Returns a (candidates, references) matrix.
+    """
+    return normalize_rows(candidates) @ references.T
+
+def top_k_similarities(candidates, references: np.ndarray, k: int = 1):
+    """
+    Returns (scores, indices) of the k most similar references of each candidate,
+    both shaped (candidates, k) and sorted by decreasing score.
+    """
+    scores = cosine_scores(candidates, references)
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    top_scores = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
@@ -19,6 +19,7 @@ import { Box, Typography, Paper, Modal, Button } from '@mui/material';
 
 const DiaryPage = ({ userId, onLogout }) => {
   const UNAUTHORIZED_LOGOUT_MESSAGE = "Token expired. Please log in again!";
+  const ADVICE_POLL_INTERVAL_MS = 2000;
 
   const [currentIndex, setCurrentIndex] = useState(0);
   const [diaryEntries, setDiaryEntries] = useState([]);
@@ -109,10 +110,32 @@ const DiaryPage = ({ userId, onLogout }) => {
     }
   };
 
+  const waitForAdvice = (id) => {
+    diaryEntryService.getAdvice(id).then((response) => {
+      if (response.data["advice_status"] === "pending") {
+        setTimeout(() => waitForAdvice(id), ADVICE_POLL_INTERVAL_MS);
+        return;
+      }
+      getDiaryEntries();
+      setIsLoadingResponse(false);
+    }).catch((e) => {
+      console.log(e);
+      setIsLoadingResponse(false);
+      if (e.response && e.response.status === 401) {
+        onLogout(UNAUTHORIZED_LOGOUT_MESSAGE);
+      }
+    });
+  };
+
   const saveDiaryEntry = (id, content) => {
     setIsLoadingResponse(true);
     diaryEntryService.updateDiaryEntry(id, content).then((response) => {
       getDiaryEntries();
+      if (response.data["advice_status"] === "pending") {
+        // Advice is generated in the background
+        waitForAdvice(id);
+        return;
+      }
       setIsLoadingResponse(false);
     }).catch((e) => {
       console.log(e);
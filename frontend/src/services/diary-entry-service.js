@@ -59,6 +59,15 @@ class DiaryEntryService {
     );
   }
 
+  // Get the advice of a diary entry, generated in the background after an update
+  getAdvice(id) {
+    return http.get(`/diary_entry/${id}/advice`, {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem("accessToken")}`
+      },
+    });
+  }
+
   // Get current streak of diary entries
   getStreak() {
     return http.get(